@@ -1,6 +1,16 @@
 import json
 
 
+def extract_biomarkers(genes):
+    # Typed labels stored in the payload, so the backend does not parse Text/DNA.
+    # Mutation profiles carry no diagnosis, so cancer is never confirmed from them.
+    return {
+        "cancer_confirmed": False,
+        "brca1_mutated": "BRCA1" in genes,
+        "brca2_mutated": "BRCA2" in genes
+    }
+
+
 def chunk_patients(patients):
     chunks = []
 
@@ -27,7 +37,8 @@ def chunk_patients(patients):
             "Numeric": {
                 "FGA": p.get("FGA"),
                 "Mutation_Count": p.get("Mutation_Count")
-            }
+            },
+            **extract_biomarkers(genes)
         })
 
     return chunks
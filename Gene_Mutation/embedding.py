@@ -1,3 +1,5 @@
+import os
+import sys
 import json
 import torch
 import numpy as np
@@ -5,11 +7,14 @@ import pandas as pd
 from transformers import BertTokenizer, BertModel
 import warnings
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Gene_Mutation.kmers import kmer_profiles
+
 warnings.filterwarnings("ignore")
 
 
 class MultimodalPatientEmbedder:
-    def __init__(self, device="cpu"):
+    def __init__(self, device="cpu", k=3):
         self.device = device
         print("device:", self.device)
 
@@ -17,7 +22,7 @@ class MultimodalPatientEmbedder:
         self.model = BertModel.from_pretrained("dmis-lab/biobert-v1.1").to(self.device)
         self.model.eval()
 
-        self.k = 3
+        self.k = k
         self.nucleotides = ["A", "T", "G", "C"]
         self.kmers = self._kmers(self.k)
         self.kmer_idx = {k: i for i, k in enumerate(self.kmers)}
@@ -48,28 +53,9 @@ class MultimodalPatientEmbedder:
 
         return np.vstack(vectors)
 
-    def encode_dna(self, dna_lists):
-        out = []
-
-        for seqs in dna_lists:
-            if not seqs:
-                out.append(np.zeros(len(self.kmers)))
-                continue
-
-            seq_vecs = []
-            for seq in seqs:
-                v = np.zeros(len(self.kmers))
-                for i in range(len(seq) - self.k + 1):
-                    kmer = seq[i:i + self.k]
-                    if kmer in self.kmer_idx:
-                        v[self.kmer_idx[kmer]] += 1
-                if v.sum() > 0:
-                    v /= v.sum()
-                seq_vecs.append(v)
-
-            out.append(np.mean(seq_vecs, axis=0))
-
-        return np.array(out)
+    def encode_dna(self, dna_lists, batch_size=256):
+        # Vectorized k-mer profiles (translation table, rolling codes, bincount), see kmers.py
+        return kmer_profiles(dna_lists, self.k, batch_size)
 
     def encode_pathways(self, pathways):
         all_p = sorted({p for lst in pathways for p in lst})
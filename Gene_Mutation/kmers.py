@@ -0,0 +1,116 @@
+"""
+Vectorized k-mer profiles of DNA sequences (used by MultimodalPatientEmbedder.encode_dna).
+
+A sequence is turned into a normalized k-mer frequency vector of size 4**k, and a
+patient's DNA vector is the mean of the vectors of its sequences (zeros when it has
+none). K-mers are indexed with A=0, T=1, G=2, C=3 and the first nucleotide most
+significant, i.e. in the order of embedding._kmers(k); a window containing any
+other character (N, lowercase, separator...) is not counted.
+
+Instead of slicing every window and looking it up in a dict, a batch of sequences
+is joined into one byte buffer (sequences separated by an invalid byte, so no
+window spans two sequences), mapped to nucleotide codes with a 256-entry
+translation table, turned into rolling k-mer codes with k vectorized shifts, and
+counted for the whole batch with a single weighted np.bincount over (patient, k-mer)
+bins. Patients are processed batch_size at a time, so memory is bounded by the
+batch's bases and a batch × 4**k output block, whatever the cohort size.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+NUCLEOTIDES = "ATGC"
+INVALID = 255
+
+# Byte → nucleotide code (0-3), INVALID for every other byte
+_TABLE = np.full(256, INVALID, dtype=np.uint8)
+for code, nucleotide in enumerate(NUCLEOTIDES):
+    _TABLE[ord(nucleotide)] = code
+
+def kmer_vocabulary(k: int) -> List[str]:
+    """K-mers in index order (same order as MultimodalPatientEmbedder._kmers)."""
+    kmers = [""]
+    for _ in range(k):
+        kmers = [prefix + nucleotide for prefix in kmers for nucleotide in NUCLEOTIDES]
+    return kmers
+
+def _window_codes(sequences: Sequence[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sequence index and k-mer code of every valid window of a batch of sequences."""
+    if k < 1:
+        raise ValueError(f"k must be at least 1, got {k}")
+    n = len(sequences)
+
+    # Non-ASCII characters become "?" (one byte per character), which is invalid
+    buffer = "\n".join(sequences).encode("ascii", "replace")
+    values = _TABLE[np.frombuffer(buffer, dtype=np.uint8)]
+    n_windows = len(values) - k + 1
+    if n == 0 or n_windows <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # A window is valid when it contains no invalid byte (prefix sums of the invalid mask)
+    invalid_before = np.concatenate(([0], np.cumsum(values == INVALID, dtype=np.int64)))
+    starts = np.flatnonzero(invalid_before[k:] == invalid_before[:-k])
+
+    # Rolling codes of the valid windows: code = sum(digit[start + j] * 4**(k - 1 - j))
+    codes = values[starts].astype(np.int64)
+    for j in range(1, k):
+        codes *= 4
+        codes += values[starts + j]
+
+    # Sequence of every window start (each sequence is followed by one separator byte)
+    lengths = np.fromiter((len(sequence) for sequence in sequences), dtype=np.int64, count=n)
+    sequence_ids = np.repeat(np.arange(n, dtype=np.int64), lengths + 1)[starts]
+    return sequence_ids, codes
+
+def kmer_counts(sequences: Sequence[str], k: int = 3) -> np.ndarray:
+    """
+    Count the k-mers of each sequence.
+
+    Args:
+        sequences (Sequence[str]): DNA sequences
+        k (int): K-mer length
+
+    Returns:
+        np.ndarray: (len(sequences), 4**k) counts (float64)
+    """
+    dim = 4 ** k
+    sequence_ids, codes = _window_codes(sequences, k)
+    counts = np.bincount(sequence_ids * dim + codes, minlength=len(sequences) * dim)
+    return counts.reshape(len(sequences), dim).astype(np.float64)
+
+def kmer_profiles(dna_lists: Sequence[Optional[Sequence[str]]], k: int = 3, batch_size: int = 256) -> np.ndarray:
+    """
+    Mean normalized k-mer profile of each patient's sequences.
+
+    Args:
+        dna_lists (Sequence[Optional[Sequence[str]]]): DNA sequences of each patient
+        k (int): K-mer length
+        batch_size (int): Patients counted together
+
+    Returns:
+        np.ndarray: (len(dna_lists), 4**k) profiles (float64); zeros for patients
+            without sequences
+    """
+    dim = 4 ** k
+    out = np.zeros((len(dna_lists), dim))
+
+    for start in range(0, len(dna_lists), batch_size):
+        batch = [seqs or [] for seqs in dna_lists[start:start + batch_size]]
+        sequences = [str(seq) for seqs in batch for seq in seqs]
+        sequence_ids, codes = _window_codes(sequences, k)
+        if len(codes) == 0:
+            continue
+
+        # Each window weighs 1 / (valid windows of its sequence × sequences of its patient),
+        # so summing the weights per (patient, k-mer) gives the mean of the normalized
+        # sequence profiles directly, without a sequences × 4**k matrix
+        n_seqs = np.array([len(seqs) for seqs in batch], dtype=np.int64)
+        patient_of_sequence = np.repeat(np.arange(len(batch), dtype=np.int64), n_seqs)
+        windows_per_sequence = np.bincount(sequence_ids, minlength=len(sequences))
+        patient_ids = patient_of_sequence[sequence_ids]
+        weights = 1.0 / (windows_per_sequence[sequence_ids] * n_seqs[patient_ids])
+
+        profiles = np.bincount(patient_ids * dim + codes, weights=weights, minlength=len(batch) * dim)
+        out[start:start + len(batch)] = profiles.reshape(len(batch), dim)
+
+    return out
@@ -1,53 +1,87 @@
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, PointStruct
-import uuid
+import os
+import sys
+import json
 import numpy as np
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qdrant_common.collection_profiles import collection_config
+from qdrant_common.bulk_upload import upload_records
+from qdrant_common.incremental import (
+    CONTENT_HASH_FIELD, content_hash, delete_points, diff_manifest, finish_refresh,
+    load_manifest, log_refresh, prepare_collection, unique_keys
+)
+
+load_dotenv()
 
 # Connexion à Qdrant 
 client = QdrantClient(
-    url="httpsast4-0.gcp.cloud.qdrant.io",
-    api_key="eyJhbGciOiJIUzI1NiIsILspRuz8UOL1tyMHv1Q"
+    url=os.getenv("QDRANT_URL"),
+    api_key=os.getenv("QDRANT_API_KEY"),
+    timeout=60.0
 )
 
 collection_name = "breast_cancer_genes_mutation"
+# Fichiers produits par chunking.py et embedding.py
+chunks_file = "patient_chunks.json"
+embeddings_file = "patient_embeddings.npy"
+# Manifeste (ID du point → hash du contenu) pour les mises à jour incrémentales
+manifest_file = os.getenv("MANIFEST_FILE", "genes_manifest.json")
+# FULL_REFRESH=1 : reconstruction complète dans une nouvelle génération, publiée par alias une fois prête
+full_refresh = os.getenv("FULL_REFRESH", "0") == "1"
+# Profil de stockage : default, scalar_int8, binary ou on_disk_scalar
+collection_profile = os.getenv("COLLECTION_PROFILE", "default")
 
-# Création ou réinitialisation de la collection
-# embeddings doit être défini avant : shape = (nb_points, dimension_vecteur)
-client.recreate_collection(
-    collection_name=collection_name,
-    vectors_config=VectorParams(size=embeddings.shape[1], distance="Cosine")
+# Chargement des données : les vecteurs restent sur disque (mmap) et sont lus lot par lot
+with open(chunks_file, encoding="utf-8") as f:
+    patient_chunks = json.load(f)
+embeddings = np.load(embeddings_file, mmap_mode="r")
+assert len(embeddings) == len(patient_chunks), "Nombre d'embeddings différent du nombre de patients !"
+print(f"{len(patient_chunks)} patients chargés")
+
+# Mise à jour en place via l'alias, ou nouvelle génération (premier passage ou FULL_REFRESH=1) :
+# la collection interrogée par l'API reste complète pendant toute l'ingestion
+target = prepare_collection(
+    client, collection_name, collection_config(embeddings.shape[1], collection_profile), full=full_refresh
 )
-print(f"Collection '{collection_name}' créée")
+if target != collection_name:
+    print(f"Génération '{target}' créée (profil {collection_profile})")
 
-# Préparation des points à insérer
-points = []
-for i, patient in enumerate(patient_chunks):
-    vector = embeddings[i].tolist()  # Conversion du vecteur numpy en liste
-    payload = {
+def build_payload(patient):
+    return {
         "Patient_ID": patient.get("Patient_ID"),
         "Sample_ID": patient.get("Sample_ID"),
         "Text": patient.get("Text"),
         "DNA": patient.get("DNA"),
         "Pathways": patient.get("Pathways"),
         "FGA": patient.get("Numeric", {}).get("FGA", 0.0),
-        "Mutation_Count": patient.get("Numeric", {}).get("Mutation_Count", 0)
+        "Mutation_Count": patient.get("Numeric", {}).get("Mutation_Count", 0),
+        # Labels typés calculés dans chunking.py
+        "cancer_confirmed": patient.get("cancer_confirmed", False),
+        "brca1_mutated": patient.get("brca1_mutated", False),
+        "brca2_mutated": patient.get("brca2_mutated", False)
     }
 
-    points.append(PointStruct(
-        id=str(uuid.uuid4()),  # UUID unique
-        vector=vector,
-        payload=payload
-    ))
-
-print(f"{len(points)} points prêts pour Qdrant ")
+# IDs déterministes (uuid5 du Patient_ID) et hash du payload + vecteur de chaque patient
+ids = unique_keys(collection_name, (patient.get("Patient_ID") for patient in patient_chunks))
+current = {
+    pid: content_hash(build_payload(patient), np.asarray(embeddings[i]))
+    for i, (pid, patient) in enumerate(zip(ids, patient_chunks)) if pid
+}
+manifest = load_manifest(client, collection_name, target, manifest_file)
+changed, removed = diff_manifest(manifest, current)
+log_refresh(collection_name, len(current), len(changed), len(removed))
 
-# Envoi par batch pour éviter les limites de mémoire
-batch_size = 500
-for i in range(0, len(points), batch_size):
-    batch = points[i:i+batch_size]
-    client.upsert(
-        collection_name=collection_name,
-        points=batch
-    )
-    print(f"Batch {i} → {i+len(batch)} envoyé")
+# Envoi des seuls patients nouveaux ou modifiés, par lots parallèles avec reprise en cas d'erreur
+def records():
+    for i, (pid, patient) in enumerate(zip(ids, patient_chunks)):
+        if pid in changed:
+            yield pid, embeddings[i], {**build_payload(patient), CONTENT_HASH_FIELD: current[pid]}
 
+# wait=True : les points doivent être appliqués avant la publication de la génération
+# et le changement du tampon d'ingestion (finish_refresh)
+count = upload_records(client, target, records(), total=len(changed), wait=True)
+delete_points(client, target, removed)
+finish_refresh(client, collection_name, target, manifest_file, current)
+print(f"{count} points envoyés et {len(removed)} supprimés dans '{collection_name}'")
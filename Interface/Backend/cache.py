@@ -0,0 +1,240 @@
+# backend/cache.py
+"""
+In-process caching utilities for Tawhida RAG system.
+
+Provides a thread-safe LRU cache with per-entry time-to-live, used to skip model
+inference for repeated query inputs. Entries are evicted when the cache exceeds
+its maximum size (least recently used first) or when they are older than the TTL.
+
+PersistentTTLCache adds an optional SQLite backing file so that JSON-serializable
+entries (e.g. /search responses) survive process restarts.
+"""
+
+import json
+import time
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """
+    Bounded LRU cache with time-based expiry and hit/miss counters.
+
+    Args:
+        name (str): Cache name used in logs and statistics
+        max_size (int): Maximum number of entries kept in memory
+        ttl_seconds (float): Lifetime of an entry in seconds (0 disables expiry)
+    """
+
+    def __init__(self, name: str, max_size: int = 1024, ttl_seconds: float = 3600.0):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a key, refreshing its LRU position on a hit.
+
+        Args:
+            key (Hashable): Cache key
+
+        Returns:
+            Optional[Any]: Cached value, or None on a miss or expired entry
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            value, stored_at = entry
+            if self._is_expired(stored_at, now):
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, age_seconds: float = 0.0) -> None:
+        """
+        Store a value, evicting least recently used entries beyond max_size.
+
+        Args:
+            key (Hashable): Cache key
+            value (Any): Value to cache (None is not cacheable)
+            age_seconds (float): Age already accumulated by the value (e.g. on disk)
+        """
+        if value is None or self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() - age_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return cache size and hit/miss counters.
+
+        Returns:
+            Dict[str, Any]: Size, capacity, hits, misses, hit rate, evictions and expirations
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations
+            }
+
+class PersistentTTLCache(TTLCache):
+    """
+    TTLCache with an optional SQLite write-through backing file.
+
+    Memory misses fall back to the file, and hits found there are promoted back into
+    memory with their remaining lifetime. Keys must be strings and values must be
+    JSON-serializable. Without a path this behaves exactly like TTLCache.
+
+    Args:
+        name (str): Cache name used in logs, statistics and as the SQLite table name
+        max_size (int): Maximum number of entries kept in memory
+        ttl_seconds (float): Lifetime of an entry in seconds (0 disables expiry)
+        path (Optional[str]): SQLite file backing the cache, or None for memory only
+        max_disk_entries (int): Maximum number of entries kept on disk
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int = 1024,
+        ttl_seconds: float = 3600.0,
+        path: Optional[str] = None,
+        max_disk_entries: int = 100000
+    ):
+        super().__init__(name, max_size=max_size, ttl_seconds=ttl_seconds)
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._disk_hits = 0
+        self._writes_since_prune = 0
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" '
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+            logger.info(f"Cache '{name}' backed by {path}")
+
+    def get(self, key: str) -> Optional[Any]:
+        value = super().get(key)
+        if value is not None or self._db is None:
+            return value
+
+        with self._db_lock:
+            row = self._db.execute(
+                f'SELECT value, created_at FROM "{self.name}" WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        age = time.time() - row[1]
+        if self.ttl_seconds > 0 and age > self.ttl_seconds:
+            return None
+
+        value = json.loads(row[0])
+        super().set(key, value, age_seconds=age)
+        with self._lock:
+            # The memory lookup above was counted as a miss; it was served from disk
+            self._misses -= 1
+            self._hits += 1
+            self._disk_hits += 1
+        return value
+
+    def set(self, key: str, value: Any, age_seconds: float = 0.0) -> None:
+        super().set(key, value, age_seconds=age_seconds)
+        if self._db is None or value is None:
+            return
+
+        try:
+            encoded = json.dumps(value)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Cache '{self.name}': value for key not JSON-serializable, not persisted: {str(e)}")
+            return
+
+        with self._db_lock:
+            with self._db:
+                self._db.execute(
+                    f'INSERT OR REPLACE INTO "{self.name}" (key, value, created_at) VALUES (?, ?, ?)',
+                    (key, encoded, time.time() - age_seconds)
+                )
+            self._writes_since_prune += 1
+            if self._writes_since_prune >= 1000:
+                self._prune()
+
+    def _prune(self) -> None:
+        """Drop expired rows and keep only the newest max_disk_entries (caller holds _db_lock)."""
+        self._writes_since_prune = 0
+        with self._db:
+            if self.ttl_seconds > 0:
+                self._db.execute(
+                    f'DELETE FROM "{self.name}" WHERE created_at < ?', (time.time() - self.ttl_seconds,)
+                )
+            self._db.execute(
+                f'DELETE FROM "{self.name}" WHERE key NOT IN '
+                f'(SELECT key FROM "{self.name}" ORDER BY created_at DESC LIMIT ?)',
+                (self.max_disk_entries,)
+            )
+
+    def clear(self) -> None:
+        super().clear()
+        if self._db is not None:
+            with self._db_lock:
+                with self._db:
+                    self._db.execute(f'DELETE FROM "{self.name}"')
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["persistent"] = self._db is not None
+        stats["disk_hits"] = self._disk_hits
+        return stats
+
+# Module initialization
+logger.info("Cache module initialized.")
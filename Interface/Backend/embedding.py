@@ -11,43 +11,369 @@ the exact vector dimensions used in your Qdrant collections:
 - breast_cancer_genes_mutation (844D)
 - breast_cancer_protein_profiles (384D)  
 - PathologyImage (512D)
+
+Query-time inference goes through one MicroBatcher per model: concurrent requests
+for the same model are collected for up to EMBED_BATCH_MAX_WAIT_MS milliseconds
+(or until EMBED_BATCH_MAX_SIZE items are queued) and encoded in a single batched
+forward pass. Set EMBED_MICRO_BATCHING=false to encode every request on its own.
+
+Each model has its own lazy loader, so a text-only deployment never loads CLIP.
+warmup_models() loads the selected models and runs a dummy forward pass so the
+first real request does not pay the model load time.
+
+EMBEDDING_BACKEND selects the inference runtime: "torch" (default, eager PyTorch)
+or "onnx" (ONNX Runtime, optionally int8-quantized; see onnx_backend.py).
+
+Repeated inputs skip inference entirely through bounded LRU + TTL caches: texts are
+keyed on their normalized form (whitespace collapsed, lower-cased, which is lossless
+for the uncased MiniLM model) and images on a SHA-256 of their bytes. Sizes and
+lifetimes are set with EMBED_CACHE_SIZE and EMBED_CACHE_TTL_SECONDS.
+
+Bulk workloads (batch screening) use embed_texts_384 / embed_texts_844 instead: the
+cache misses of a whole list are encoded EMBED_BULK_BATCH_SIZE texts (default 64) per
+forward pass, without going through the micro-batchers.
 """
 
 import os
+import io
+import time
+import hashlib
+import queue
 import logging
-from typing import Optional, List
+import threading
+from concurrent.futures import Future
+from typing import Any, BinaryIO, Callable, Dict, Optional, List, Sequence, Union
 from PIL import Image
 import torch
-from transformers import CLIPProcessor, CLIPModel, SentenceTransformer
+from transformers import CLIPProcessor, CLIPModel
+from sentence_transformers import SentenceTransformer
 import numpy as np
+from .cache import TTLCache
+from .metrics import STAGE_LATENCY
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global model instances - loaded once at module initialization
+# Global model instances - each loaded once, on first use or during warmup
 _model_384 = None
 _clip_model = None
 _clip_processor = None
+_text_model_lock = threading.Lock()
+_clip_model_lock = threading.Lock()
+
+# Models that have completed a warmup forward pass
+_warm_models = set()
+
+# Model names accepted by warmup_models() and reported by get_model_status()
+WARMUP_MODEL_NAMES = ("text", "image")
+
+# Inference runtime for the query-time encoders: "torch" or "onnx"
+_embedding_backend = os.getenv("EMBEDDING_BACKEND", "torch").strip().lower()
+
+def _load_text_model():
+    """
+    Lazy loading of the all-MiniLM-L6-v2 text model (gene and protein modalities).
+    """
+    global _model_384
+    
+    if _model_384 is not None:
+        return
+    with _text_model_lock:
+        if _model_384 is None:
+            logger.info("Loading SentenceTransformer (all-MiniLM-L6-v2) for 384D embeddings...")
+            _model_384 = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+            logger.info("SentenceTransformer loaded successfully.")
+
+def _load_clip_model():
+    """
+    Lazy loading of the CLIP ViT-B/32 model and processor (image modality).
+    """
+    global _clip_model, _clip_processor
+    
+    if _clip_model is not None and _clip_processor is not None:
+        return
+    with _clip_model_lock:
+        if _clip_model is None or _clip_processor is None:
+            logger.info("Loading CLIP ViT-B/32 for 512D image/text embeddings...")
+            _clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+            _clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
+            _clip_model.eval()
+            logger.info("CLIP model loaded successfully.")
+
+def _encode_texts_384(texts: List[str]) -> np.ndarray:
+    """
+    Encode a batch of texts with all-MiniLM-L6-v2 in one forward pass.
+    
+    Args:
+        texts (List[str]): Cleaned input texts
+        
+    Returns:
+        np.ndarray: Array of shape (len(texts), 384)
+    """
+    if _embedding_backend == "onnx":
+        from .onnx_backend import get_text_encoder
+        return get_text_encoder().encode(texts)
+    
+    _load_text_model()
+    return _model_384.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+def _encode_images_512(images: List[Image.Image]) -> np.ndarray:
+    """
+    Encode a batch of RGB images with CLIP ViT-B/32 in one forward pass.
+    
+    Args:
+        images (List[Image.Image]): Decoded RGB images
+        
+    Returns:
+        np.ndarray: L2-normalized array of shape (len(images), 512)
+    """
+    if _embedding_backend == "onnx":
+        from .onnx_backend import get_image_encoder
+        return get_image_encoder().encode(images)
+    
+    _load_clip_model()
+    inputs = _clip_processor(images=images, return_tensors="pt")
+    
+    # Generate embeddings with no gradient computation
+    with torch.no_grad():
+        features = _clip_model.get_image_features(**inputs)
+        # Apply L2 normalization (required for cosine similarity)
+        features = torch.nn.functional.normalize(features, p=2, dim=-1)
+    
+    return features.cpu().numpy()
 
-def _load_models():
+class MicroBatcher:
     """
-    Lazy loading of embedding models to optimize startup time.
-    Models are only loaded when first needed.
+    Dynamic micro-batching for one embedding model.
+    
+    Callers submit single items from any thread. A background worker takes the first
+    waiting item, keeps collecting until max_batch_size items are gathered or
+    max_wait_ms has elapsed, runs batch_func once on the whole batch and resolves
+    each caller's future with its own row.
+    
+    Args:
+        name (str): Model name used in logs and statistics
+        batch_func (Callable): Function mapping a list of items to a sequence of vectors
+        max_batch_size (int): Maximum number of items per forward pass
+        max_wait_ms (float): Maximum time to wait for more items once one is queued
     """
-    global _model_384, _clip_model, _clip_processor
     
-    if _model_384 is None:
-        logger.info("Loading SentenceTransformer (all-MiniLM-L6-v2) for 384D embeddings...")
-        _model_384 = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        logger.info("SentenceTransformer loaded successfully.")
+    def __init__(
+        self,
+        name: str,
+        batch_func: Callable[[List[Any]], Sequence[np.ndarray]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        self.name = name
+        self.batch_func = batch_func
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_batch_seen = 0
+        self._batch_size_counts = {}
+    
+    def submit(self, item: Any) -> Future:
+        """
+        Queue one item for the next batch.
+        
+        Args:
+            item (Any): Single model input (text or image)
+            
+        Returns:
+            Future: Future resolving to the item's embedding vector
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+    
+    def encode(self, item: Any) -> np.ndarray:
+        """
+        Encode one item through the batcher, blocking until its batch has run.
+        
+        Args:
+            item (Any): Single model input (text or image)
+            
+        Returns:
+            np.ndarray: Embedding vector for the item
+        """
+        return self.submit(item).result()
+    
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name=f"microbatch-{self.name}", daemon=True
+                )
+                self._worker.start()
+    
+    def _collect_batch(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
     
-    if _clip_model is None or _clip_processor is None:
-        logger.info("Loading CLIP ViT-B/32 for 512D image/text embeddings...")
-        _clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-        _clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-        logger.info("CLIP model loaded successfully.")
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            items = [item for item, _ in batch]
+            
+            try:
+                vectors = self.batch_func(items)
+                # zip() would silently drop the extra futures and leave their callers hanging
+                if len(vectors) != len(batch):
+                    raise ValueError(f"{self.name} returned {len(vectors)} vectors for {len(batch)} inputs")
+            except Exception as e:
+                logger.error(f"Micro-batch of {len(batch)} failed for {self.name}: {str(e)}", exc_info=True)
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+            
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._max_batch_seen = max(self._max_batch_seen, len(batch))
+                self._batch_size_counts[len(batch)] = self._batch_size_counts.get(len(batch), 0) + 1
+            logger.debug(f"{self.name}: encoded micro-batch of {len(batch)}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return queue depth and batch-size statistics.
+        
+        Returns:
+            Dict[str, Any]: Current queue depth, batch counts and batch-size distribution
+        """
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": (self._items / self._batches) if self._batches else 0.0,
+                "max_batch_size_seen": self._max_batch_seen,
+                "batch_size_counts": dict(self._batch_size_counts)
+            }
+
+_micro_batching_enabled = os.getenv("EMBED_MICRO_BATCHING", "true").strip().lower() in ("1", "true", "yes")
+_text_batcher = MicroBatcher(
+    "text_384",
+    _encode_texts_384,
+    max_batch_size=int(os.getenv("EMBED_BATCH_MAX_SIZE", "32")),
+    max_wait_ms=float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+)
+_image_batcher = MicroBatcher(
+    "image_512",
+    _encode_images_512,
+    max_batch_size=int(os.getenv("EMBED_BATCH_MAX_SIZE", "32")),
+    max_wait_ms=float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+)
 
+# Query embedding caches (text: normalized text → 384D vector, image: SHA-256 → 512D vector)
+_text_cache = TTLCache(
+    "text_384",
+    max_size=int(os.getenv("EMBED_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("EMBED_CACHE_TTL_SECONDS", "3600"))
+)
+_image_cache = TTLCache(
+    "image_512",
+    max_size=int(os.getenv("EMBED_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("EMBED_CACHE_TTL_SECONDS", "3600"))
+)
+
+def normalize_query_text(text: str) -> str:
+    """Collapse whitespace and lower-case text so equivalent queries share a cache key."""
+    return " ".join(text.split()).lower()
+
+def _embed_384(clean_text: str) -> np.ndarray:
+    """Encode one text through the cache, then the micro-batcher when enabled."""
+    key = normalize_query_text(clean_text)
+    cached = _text_cache.get(key)
+    if cached is not None:
+        logger.debug("384D embedding served from cache")
+        return cached
+    
+    if _micro_batching_enabled:
+        vector = _text_batcher.encode(key)
+    else:
+        vector = _encode_texts_384([key])[0]
+    
+    _text_cache.set(key, vector)
+    return vector
+
+def _embed_384_many(texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+    """Encode many texts through the cache, encoding the misses in large batches."""
+    keys = [normalize_query_text(text) if isinstance(text, str) and text.strip() else None for text in texts]
+    
+    vectors = {}
+    missing = []
+    for key in keys:
+        if key is None or key in vectors:
+            continue
+        vectors[key] = _text_cache.get(key)
+        if vectors[key] is None:
+            missing.append(key)
+    
+    batch_size = max(1, int(os.getenv("EMBED_BULK_BATCH_SIZE", "64")))
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        for key, vector in zip(batch, _encode_texts_384(batch)):
+            _text_cache.set(key, vector)
+            vectors[key] = vector
+    
+    if missing:
+        logger.info(f"Bulk-encoded {len(missing)} texts ({len(keys) - len(missing)} from cache or duplicates)")
+    return [None if key is None else vectors[key] for key in keys]
+
+def _embed_512(image: Image.Image) -> np.ndarray:
+    """Encode one image, through the micro-batcher when enabled."""
+    if _micro_batching_enabled:
+        return _image_batcher.encode(image)
+    return _encode_images_512([image])[0]
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Return hit/miss statistics of the query embedding caches.
+    
+    Returns:
+        Dict[str, Dict[str, Any]]: Cache name → size and hit/miss counters
+    """
+    return {
+        "text_384": _text_cache.stats(),
+        "image_512": _image_cache.stats()
+    }
+
+def get_batching_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Return micro-batching statistics for each model.
+    
+    Returns:
+        Dict[str, Dict[str, Any]]: Model name → queue depth and batch-size metrics
+    """
+    return {
+        "enabled": _micro_batching_enabled,
+        "text_384": _text_batcher.stats(),
+        "image_512": _image_batcher.stats()
+    }
+
+@STAGE_LATENCY.timed(stage="embed", modality="genes")
 def embed_text_844(text: str) -> Optional[List[float]]:
     """
     Embed gene-related text into 844-dimensional vector space.
@@ -76,15 +402,12 @@ def embed_text_844(text: str) -> Optional[List[float]]:
         return None
     
     try:
-        # Load models if not already loaded
-        _load_models()
-        
         # Clean and preprocess text
         clean_text = text.strip()
         
         # Generate 384D base embedding
         logger.debug(f"Generating 384D embedding for text: {clean_text[:50]}...")
-        vec_384 = _model_384.encode([clean_text], convert_to_numpy=True)[0]
+        vec_384 = _embed_384(clean_text)
         
         # Validate embedding quality
         if vec_384 is None or len(vec_384) != 384:
@@ -109,6 +432,7 @@ def embed_text_844(text: str) -> Optional[List[float]]:
         logger.error(f"844D embedding error for text '{text[:50]}...': {str(e)}", exc_info=True)
         return None
 
+@STAGE_LATENCY.timed(stage="embed", modality="proteins")
 def embed_text_384(text: str) -> Optional[List[float]]:
     """
     Embed protein-related text into 384-dimensional vector space.
@@ -133,15 +457,12 @@ def embed_text_384(text: str) -> Optional[List[float]]:
         return None
     
     try:
-        # Load models if not already loaded
-        _load_models()
-        
         # Clean and preprocess text
         clean_text = text.strip()
         
         # Generate 384D embedding
         logger.debug(f"Generating 384D embedding for text: {clean_text[:50]}...")
-        vec_384 = _model_384.encode([clean_text], convert_to_numpy=True)[0]
+        vec_384 = _embed_384(clean_text)
         
         # Validate embedding
         if vec_384 is None or len(vec_384) != 384:
@@ -158,7 +479,59 @@ def embed_text_384(text: str) -> Optional[List[float]]:
         logger.error(f"384D embedding error for text '{text[:50]}...': {str(e)}", exc_info=True)
         return None
 
-def embed_image_512(image_path: str) -> Optional[List[float]]:
+@STAGE_LATENCY.timed(stage="embed_batch", modality="proteins")
+def embed_texts_384(texts: Sequence[str]) -> List[Optional[List[float]]]:
+    """
+    Embed many protein texts into 384-dimensional vectors with batched forward passes.
+    
+    Args:
+        texts (Sequence[str]): Input protein texts
+        
+    Returns:
+        List[Optional[List[float]]]: One 384D vector per text, None for empty texts
+    """
+    return [None if vector is None else vector.tolist() for vector in _embed_384_many(texts)]
+
+@STAGE_LATENCY.timed(stage="embed_batch", modality="genes")
+def embed_texts_844(texts: Sequence[str]) -> List[Optional[List[float]]]:
+    """
+    Embed many gene texts into 844-dimensional vectors with batched forward passes.
+    
+    Uses the same 384D embedding + zero padding as embed_text_844.
+    
+    Args:
+        texts (Sequence[str]): Input gene texts
+        
+    Returns:
+        List[Optional[List[float]]]: One 844D vector per text, None for empty texts
+    """
+    padding = np.zeros(844 - 384)
+    return [
+        None if vector is None else np.concatenate([vector, padding]).tolist()
+        for vector in _embed_384_many(texts)
+    ]
+
+def _read_image_bytes(image: Union[str, bytes, BinaryIO]) -> Optional[bytes]:
+    """Return the encoded image bytes from a file path, an in-memory buffer or a binary stream."""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    
+    if isinstance(image, str):
+        if not os.path.exists(image):
+            logger.warning(f"Image file not found: {image}")
+            return None
+        logger.debug(f"Loading image: {image}")
+        with open(image, "rb") as f:
+            return f.read()
+    
+    if hasattr(image, "read"):
+        return image.read()
+    
+    logger.warning(f"Unsupported image input type for 512D embedding: {type(image).__name__}")
+    return None
+
+@STAGE_LATENCY.timed(stage="embed", modality="images")
+def embed_image_512(image: Union[str, bytes, BinaryIO]) -> Optional[List[float]]:
     """
     Embed pathology images into 512-dimensional vector space.
     
@@ -167,32 +540,41 @@ def embed_image_512(image_path: str) -> Optional[List[float]]:
     The model is normalized using L2 normalization for optimal cosine similarity
     performance in Qdrant.
     
+    The image is decoded straight from memory, so uploads never need to be written
+    to disk: pass the encoded bytes (or a binary stream) directly. A file path is
+    still accepted for offline use.
+    
     Args:
-        image_path (str): Path to image file (JPG, PNG, etc.)
+        image (Union[str, bytes, BinaryIO]): Encoded image (JPG, PNG, etc.) as bytes,
+            a binary stream, or a path to an image file
         
     Returns:
         Optional[List[float]]: 512-dimensional embedding vector or None if error occurs
         
     Example:
-        >>> embed_image_512("/path/to/mammogram.jpg")
+        >>> with open("/path/to/mammogram.jpg", "rb") as f:
+        ...     embed_image_512(f.read())
         [0.45, -0.23, 0.78, ...]  # 512 elements
     """
     # Input validation
-    if not image_path or not isinstance(image_path, str):
-        logger.warning("Invalid image path for 512D embedding")
-        return None
-    
-    if not os.path.exists(image_path):
-        logger.warning(f"Image file not found: {image_path}")
+    if not image:
+        logger.warning("Empty or invalid image input for 512D embedding")
         return None
     
     try:
-        # Load models if not already loaded
-        _load_models()
+        # Read the raw bytes once: they key the cache and are decoded from memory
+        image_bytes = _read_image_bytes(image)
+        if not image_bytes:
+            logger.warning("No image data for 512D embedding")
+            return None
         
-        # Open and preprocess image
-        logger.debug(f"Loading image: {image_path}")
-        image = Image.open(image_path).convert("RGB")
+        cache_key = hashlib.sha256(image_bytes).hexdigest()
+        cached = _image_cache.get(cache_key)
+        if cached is not None:
+            logger.info("512D image embedding served from cache")
+            return cached.tolist()
+        
+        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
         
         # Validate image dimensions
         width, height = image.size
@@ -200,24 +582,17 @@ def embed_image_512(image_path: str) -> Optional[List[float]]:
             logger.error(f"Invalid image dimensions: {width}x{height}")
             return None
         
-        # Process image through CLIP
+        # Process image through CLIP (L2-normalized for cosine similarity)
         logger.debug(f"Processing image ({width}x{height}) through CLIP...")
-        inputs = _clip_processor(images=image, return_tensors="pt")
-        
-        # Generate embedding with no gradient computation
-        with torch.no_grad():
-            features = _clip_model.get_image_features(**inputs)
-            # Apply L2 normalization (required for cosine similarity)
-            features = torch.nn.functional.normalize(features, p=2, dim=-1)
-        
-        # Extract first (and only) embedding
-        embedding_512 = features[0].cpu().numpy()
+        embedding_512 = _embed_512(image)
         
         # Validate embedding
         if embedding_512 is None or len(embedding_512) != 512:
             logger.error(f"Invalid 512D embedding generated: {embedding_512}")
             return None
         
+        _image_cache.set(cache_key, embedding_512)
+        
         # Convert to Python list for JSON serialization
         result = embedding_512.tolist()
         
@@ -225,9 +600,61 @@ def embed_image_512(image_path: str) -> Optional[List[float]]:
         return result
         
     except Exception as e:
-        logger.error(f"512D image embedding error for {image_path}: {str(e)}", exc_info=True)
+        logger.error(f"512D image embedding error: {str(e)}", exc_info=True)
         return None
 
+def warmup_models(models: Sequence[str] = WARMUP_MODEL_NAMES) -> Dict[str, bool]:
+    """
+    Load the selected models and run one dummy forward pass through each.
+    
+    The dummy pass bypasses the caches and micro-batchers so it neither pollutes
+    the caches nor skews batching statistics.
+    
+    Args:
+        models (Sequence[str]): Models to warm: "text" (MiniLM) and/or "image" (CLIP)
+        
+    Returns:
+        Dict[str, bool]: Model name → True if warmup succeeded
+    """
+    warmups = {
+        "text": lambda: _encode_texts_384(["BRCA1 mutation, ER positive"]),
+        "image": lambda: _encode_images_512([Image.new("RGB", (224, 224))])
+    }
+    
+    status = {}
+    for name in models:
+        if name not in warmups:
+            logger.warning(f"Unknown model '{name}' requested for warmup, skipping")
+            continue
+        try:
+            start = time.perf_counter()
+            warmups[name]()
+            _warm_models.add(name)
+            status[name] = True
+            logger.info(f"Model '{name}' warmed up in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            logger.error(f"Warmup failed for model '{name}': {str(e)}", exc_info=True)
+            status[name] = False
+    return status
+
+def get_model_status() -> Dict[str, Dict[str, Any]]:
+    """
+    Report whether each model is loaded and warmed up.
+    
+    Returns:
+        Dict[str, Dict[str, Any]]: Model name → {"loaded": ..., "warm": ..., "backend": ...}
+    """
+    if _embedding_backend == "onnx":
+        from .onnx_backend import encoder_loaded
+        text_loaded, image_loaded = encoder_loaded("text"), encoder_loaded("image")
+    else:
+        text_loaded, image_loaded = _model_384 is not None, _clip_model is not None
+    
+    return {
+        "text": {"loaded": text_loaded, "warm": "text" in _warm_models, "backend": _embedding_backend},
+        "image": {"loaded": image_loaded, "warm": "image" in _warm_models, "backend": _embedding_backend}
+    }
+
 def get_embedding_dimensions() -> dict:
     """
     Return the expected embedding dimensions for each modality.
@@ -0,0 +1,192 @@
+# backend/inference.py
+"""
+Inference executor module for Tawhida RAG system.
+Runs the CPU-bound embedding models off the event loop with bounded capacity.
+
+The /search handler is async, but MiniLM and CLIP forward passes are blocking
+PyTorch calls. Running them inline stalls every other request on the worker, so
+all model inference is submitted to a dedicated thread pool instead:
+- At most INFERENCE_WORKERS jobs run at once
+- At most INFERENCE_QUEUE_SIZE further jobs wait for a free worker
+- Anything beyond that is rejected immediately with InferenceSaturatedError,
+  which the API turns into a fast 503 rather than an ever-growing backlog
+
+Inference workers mostly wait on the per-model micro-batchers in embedding.py,
+which is what lets concurrent requests share one forward pass, so the worker count
+is larger than the number of forward passes that actually run in parallel
+(INFERENCE_COMPUTE_STREAMS, one per micro-batched model by default). PyTorch
+intra-op threads are sized so that streams × threads does not exceed the number of
+CPU cores (TORCH_INTRA_OP_THREADS overrides the computed value). With
+EMBED_MICRO_BATCHING=false every worker runs its own forward pass, so set
+INFERENCE_COMPUTE_STREAMS to INFERENCE_WORKERS.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import torch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class InferenceSaturatedError(RuntimeError):
+    """Raised when the inference executor has no free worker or queue slot."""
+
+class InferenceExecutor:
+    """
+    Thread pool for model inference with a bounded queue and fail-fast admission.
+
+    Args:
+        max_workers (int): Number of inference jobs allowed to run concurrently
+        max_queue_size (int): Number of jobs allowed to wait for a free worker
+    """
+
+    def __init__(self, max_workers: int, max_queue_size: int):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+        self._completed = 0
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """
+        Submit a blocking inference call.
+
+        Args:
+            fn (Callable): Function to run in an inference worker
+            *args: Positional arguments for fn
+
+        Returns:
+            Future: Future resolving to fn's return value
+
+        Raises:
+            InferenceSaturatedError: If all workers are busy and the queue is full
+        """
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue_size:
+                self._rejected += 1
+                raise InferenceSaturatedError(
+                    f"Inference executor saturated ({self._in_flight} jobs in flight)"
+                )
+            self._in_flight += 1
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a blocking inference call without blocking the event loop.
+
+        Args:
+            fn (Callable): Function to run in an inference worker
+            *args: Positional arguments for fn
+
+        Returns:
+            Any: fn's return value
+
+        Raises:
+            InferenceSaturatedError: If all workers are busy and the queue is full
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def _release(self, future: Optional[Future]) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if future is not None:
+                self._completed += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return current load counters for monitoring.
+
+        Returns:
+            Dict[str, int]: Workers, queue capacity, jobs in flight, rejected and completed jobs
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue_size": self.max_queue_size,
+                "in_flight": self._in_flight,
+                "rejected": self._rejected,
+                "completed": self._completed
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and release the worker threads."""
+        self._executor.shutdown(wait=wait)
+
+def configure_torch_threads(compute_streams: int) -> int:
+    """
+    Size PyTorch's thread pools so concurrent forward passes do not oversubscribe the CPU.
+
+    Args:
+        compute_streams (int): Number of forward passes that may run at the same time
+
+    Returns:
+        int: Intra-op thread count applied to PyTorch
+    """
+    cpu_count = os.cpu_count() or 1
+    intra_op_threads = int(os.getenv("TORCH_INTRA_OP_THREADS", max(1, cpu_count // compute_streams)))
+    torch.set_num_threads(intra_op_threads)
+
+    # Inter-op parallelism can only be set before PyTorch starts any parallel work
+    try:
+        torch.set_num_interop_threads(int(os.getenv("TORCH_INTER_OP_THREADS", "1")))
+    except RuntimeError as e:
+        logger.warning(f"Could not set PyTorch inter-op threads: {str(e)}")
+
+    logger.info(f"PyTorch configured with {intra_op_threads} intra-op threads "
+               f"for {compute_streams} compute streams on {cpu_count} CPUs")
+    return intra_op_threads
+
+# Global executor instance
+_inference_executor = None
+_inference_executor_lock = threading.Lock()
+
+def get_inference_executor() -> InferenceExecutor:
+    """
+    Get or create the global inference executor.
+
+    Reads INFERENCE_WORKERS (default 8), INFERENCE_QUEUE_SIZE (default 32) and
+    INFERENCE_COMPUTE_STREAMS (default 2), and configures PyTorch threading on
+    first creation.
+
+    Returns:
+        InferenceExecutor: Shared inference executor
+    """
+    global _inference_executor
+
+    with _inference_executor_lock:
+        if _inference_executor is None:
+            max_workers = int(os.getenv("INFERENCE_WORKERS", "8"))
+            max_queue_size = int(os.getenv("INFERENCE_QUEUE_SIZE", "32"))
+            configure_torch_threads(int(os.getenv("INFERENCE_COMPUTE_STREAMS", "2")))
+            _inference_executor = InferenceExecutor(max_workers, max_queue_size)
+            logger.info(f"Inference executor started: {max_workers} workers, queue size {max_queue_size}")
+
+    return _inference_executor
+
+def shutdown_inference_executor() -> None:
+    """Shut down the global inference executor. Called from the application shutdown hook."""
+    global _inference_executor
+
+    with _inference_executor_lock:
+        if _inference_executor is not None:
+            _inference_executor.shutdown(wait=False)
+            _inference_executor = None
+            logger.info("Inference executor shut down")
+
+# Module initialization
+logger.info("Inference module initialized. Executor will be created on first use.")
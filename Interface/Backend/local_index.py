@@ -0,0 +1,345 @@
+# backend/local_index.py
+"""
+In-process vector index for Tawhida RAG system.
+Alternative search backend to Qdrant Cloud for small collections, offline testing
+and edge deployments (SEARCH_BACKEND=local in qdrant_service).
+
+Each collection is stored as a bundle of two files in LOCAL_INDEX_DIR:
+- <collection>.npy: float32 matrix of vectors, one row per point
+- <collection>.jsonl: one {"id": ..., "payload": {...}} object per row
+
+Vectors are L2-normalized at load time so inner product equals cosine similarity,
+matching the Cosine distance of the Qdrant collections. The search structure is
+chosen per collection:
+- "numpy": exact brute-force search with a single matrix-vector product
+- "faiss": exact search with a FAISS flat inner-product index
+- "hnsw": approximate search with an hnswlib graph for large collections
+- "auto" (default): hnsw at or above LOCAL_INDEX_HNSW_THRESHOLD points
+  (default 50000), otherwise faiss when installed, otherwise numpy
+
+Filtered searches (see qdrant_common.payload_indexes) select the matching rows first
+and run an exact search over them, so a selective filter never loses neighbours.
+
+Command line:
+    python -m Interface.Backend.local_index build COLLECTION --vectors X.npy --payloads X.json|X.jsonl|X.csv
+    python -m Interface.Backend.local_index export COLLECTION   # dump an existing Qdrant collection
+"""
+
+import os
+import csv
+import json
+import logging
+import argparse
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+from qdrant_common.payload_indexes import payload_matches
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class LocalVectorIndex:
+    """
+    Cosine-similarity index over an in-memory matrix of vectors with payloads.
+
+    Args:
+        name (str): Collection name
+        vectors (np.ndarray): Matrix of shape (n_points, dim)
+        ids (List[Any]): Point IDs, one per row
+        payloads (List[Dict]): Point payloads, one per row
+        kind (str): "auto", "numpy", "faiss" or "hnsw"
+    """
+
+    def __init__(self, name: str, vectors: np.ndarray, ids: List[Any], payloads: List[Dict], kind: str = "auto"):
+        if len(vectors) != len(ids) or len(ids) != len(payloads):
+            raise ValueError(f"Index '{name}': {len(vectors)} vectors, {len(ids)} ids and {len(payloads)} payloads")
+
+        self.name = name
+        self.ids = ids
+        self.payloads = payloads
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        self.vectors /= np.clip(norms, 1e-12, None)
+        self.dim = self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+        self.kind = self._resolve_kind(kind)
+        self._index = None
+        self._rows_by_id = None
+
+        if self.kind == "faiss":
+            import faiss
+            self._index = faiss.IndexFlatIP(self.dim)
+            self._index.add(self.vectors)
+        elif self.kind == "hnsw":
+            import hnswlib
+            self._index = hnswlib.Index(space="ip", dim=self.dim)
+            self._index.init_index(
+                max_elements=len(self.vectors),
+                M=int(os.getenv("LOCAL_INDEX_HNSW_M", "16")),
+                ef_construction=int(os.getenv("LOCAL_INDEX_HNSW_EF_CONSTRUCT", "200"))
+            )
+            self._index.add_items(self.vectors, np.arange(len(self.vectors)))
+            self._index.set_ef(int(os.getenv("LOCAL_INDEX_HNSW_EF", "64")))
+
+        logger.info(f"Local index '{name}' ready: {len(self.vectors)} points, {self.dim}D, {self.kind}")
+
+    def _resolve_kind(self, kind: str) -> str:
+        if kind != "auto":
+            return kind
+        if len(self.vectors) >= int(os.getenv("LOCAL_INDEX_HNSW_THRESHOLD", "50000")):
+            return "hnsw"
+        try:
+            import faiss  # noqa: F401
+            return "faiss"
+        except ImportError:
+            return "numpy"
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get(self, point_id: Any) -> Optional[Dict]:
+        """
+        Return the payload of a point by ID.
+
+        Args:
+            point_id (Any): Point ID
+
+        Returns:
+            Optional[Dict]: Payload, or None if the ID is unknown
+        """
+        if self._rows_by_id is None:
+            self._rows_by_id = {str(pid): row for row, pid in enumerate(self.ids)}
+        row = self._rows_by_id.get(str(point_id))
+        return None if row is None else self.payloads[row]
+
+    def search(
+        self,
+        vector: List[float],
+        limit: int = 10,
+        score_threshold: float = 0.0,
+        conditions: Optional[Dict[str, Any]] = None
+    ) -> List[Dict]:
+        """
+        Return the nearest points by cosine similarity.
+
+        Args:
+            vector (List[float]): Query vector
+            limit (int): Maximum number of results to return
+            score_threshold (float): Minimum cosine similarity of returned points
+            conditions (Optional[Dict[str, Any]]): Payload filter conditions (field → condition)
+
+        Returns:
+            List[Dict]: Results with id, payload and score, best first (same shape as Qdrant hits)
+        """
+        if len(self.ids) == 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        k = min(limit, len(self.ids))
+
+        if conditions:
+            candidates = np.array(
+                [row for row, payload in enumerate(self.payloads) if payload_matches(payload, conditions)],
+                dtype=np.int64
+            )
+            if len(candidates) == 0:
+                return []
+            k = min(limit, len(candidates))
+            candidate_scores = self.vectors[candidates] @ query
+            order = np.argsort(-candidate_scores)[:k]
+            rows, scores = candidates[order], candidate_scores[order]
+        elif self.kind == "faiss":
+            scores, rows = self._index.search(query[None, :], k)
+            scores, rows = scores[0], rows[0]
+        elif self.kind == "hnsw":
+            rows, distances = self._index.knn_query(query[None, :], k=k)
+            rows, scores = rows[0], 1.0 - distances[0]
+        else:
+            all_scores = self.vectors @ query
+            rows = np.argpartition(-all_scores, k - 1)[:k]
+            rows = rows[np.argsort(-all_scores[rows])]
+            scores = all_scores[rows]
+
+        return [
+            {"id": self.ids[row], "payload": self.payloads[row], "score": float(score)}
+            for row, score in zip(rows, scores)
+            if row >= 0 and score >= score_threshold
+        ]
+
+    def save(self, directory: str) -> None:
+        """
+        Write the index bundle (<name>.npy and <name>.jsonl) to a directory.
+
+        Args:
+            directory (str): Output directory
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, f"{self.name}.npy"), self.vectors)
+        with open(os.path.join(directory, f"{self.name}.jsonl"), "w", encoding="utf-8") as f:
+            for point_id, payload in zip(self.ids, self.payloads):
+                f.write(json.dumps({"id": point_id, "payload": payload}, ensure_ascii=False) + "\n")
+        logger.info(f"Local index '{self.name}' saved to {directory}")
+
+    @classmethod
+    def load(cls, directory: str, name: str, kind: str = "auto") -> "LocalVectorIndex":
+        """
+        Load an index bundle written by save() or the build/export commands.
+
+        Args:
+            directory (str): Directory holding <name>.npy and <name>.jsonl
+            name (str): Collection name
+            kind (str): Search structure (see module docstring)
+
+        Returns:
+            LocalVectorIndex: Loaded index
+        """
+        vectors = np.load(os.path.join(directory, f"{name}.npy"))
+        ids, payloads = [], []
+        with open(os.path.join(directory, f"{name}.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    ids.append(record["id"])
+                    payloads.append(record.get("payload", {}))
+        return cls(name, vectors, ids, payloads, kind=kind)
+
+# Loaded indexes, one per collection: collection name → (bundle mtime at load, index)
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def _bundle_mtime(directory: str, collection_name: str) -> int:
+    """Latest modification time of a bundle's two files, in nanoseconds."""
+    return max(
+        os.stat(os.path.join(directory, f"{collection_name}{extension}")).st_mtime_ns
+        for extension in (".npy", ".jsonl")
+    )
+
+def _current_index(collection_name: str):
+    """(bundle mtime, index) of a collection, reloading the bundle when it changed on disk."""
+    directory = os.getenv("LOCAL_INDEX_DIR", "local_index")
+    with _indexes_lock:
+        cached = _indexes.get(collection_name)
+        try:
+            mtime = _bundle_mtime(directory, collection_name)
+            if cached is not None and cached[0] == mtime:
+                return cached
+            index = LocalVectorIndex.load(directory, collection_name, kind=os.getenv("LOCAL_INDEX_KIND", "auto"))
+        except (OSError, ValueError) as e:
+            # A bundle being rewritten can be missing or inconsistent for a moment:
+            # keep serving the previous index, the reload is retried on the next call
+            if cached is None:
+                raise
+            logger.warning(f"Could not reload local index '{collection_name}', keeping the loaded one: {str(e)}")
+            return cached
+        if cached is not None:
+            logger.info(f"Local index '{collection_name}' changed on disk, reloaded ({len(index)} points)")
+        _indexes[collection_name] = (mtime, index)
+        return mtime, index
+
+def get_local_index(collection_name: str) -> LocalVectorIndex:
+    """
+    Get the local index for a collection, loading it from LOCAL_INDEX_DIR on first use.
+
+    The bundle's modification time is recorded on load and checked on every call,
+    so an index rebuilt on disk (build/export commands) replaces the loaded one.
+
+    Args:
+        collection_name (str): Collection name
+
+    Returns:
+        LocalVectorIndex: Loaded index
+
+    Raises:
+        FileNotFoundError: If the collection bundle does not exist
+    """
+    return _current_index(collection_name)[1]
+
+def index_version(collection_name: str) -> str:
+    """
+    Version token of the loaded local index (point count and bundle modification time).
+
+    The token describes the index searches actually use: the bundle is reloaded
+    first if it changed, so a cached response is never stored under the version
+    of a bundle that is not loaded yet.
+
+    Args:
+        collection_name (str): Collection name
+
+    Returns:
+        str: Version token, or "unavailable" if the bundle is missing
+    """
+    try:
+        mtime, index = _current_index(collection_name)
+        return f"{len(index)}:{mtime}"
+    except (OSError, ValueError) as e:
+        logger.warning(f"Local index '{collection_name}' unavailable: {str(e)}")
+        return "unavailable"
+
+def _read_records(path: str) -> List[Dict]:
+    """Read payload records from a .json list, a .jsonl file or a .csv file."""
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+def export_collection(collection_name: str, directory: str, batch_size: int = 256) -> LocalVectorIndex:
+    """
+    Dump an existing Qdrant collection (vectors + payloads) into a local index bundle.
+
+    Args:
+        collection_name (str): Collection to export
+        directory (str): Output directory
+        batch_size (int): Points fetched per scroll request
+
+    Returns:
+        LocalVectorIndex: Index built from the exported points
+    """
+    from qdrant_client import QdrantClient
+
+    client = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"), timeout=60.0)
+    ids, payloads, vectors = [], [], []
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        for point in points:
+            ids.append(point.id if isinstance(point.id, int) else str(point.id))
+            payloads.append(point.payload or {})
+            vectors.append(point.vector)
+        if offset is None:
+            break
+
+    index = LocalVectorIndex(collection_name, np.asarray(vectors, dtype=np.float32), ids, payloads, kind="numpy")
+    index.save(directory)
+    return index
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build local vector index bundles")
+    parser.add_argument("command", choices=["build", "export"])
+    parser.add_argument("collection")
+    parser.add_argument("--vectors", help="embeddings .npy file (build)")
+    parser.add_argument("--payloads", help="payload records as .json, .jsonl or .csv (build)")
+    parser.add_argument("--out-dir", default=os.getenv("LOCAL_INDEX_DIR", "local_index"))
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_collection(args.collection, args.out_dir)
+        return
+
+    vectors = np.load(args.vectors)
+    payloads = _read_records(args.payloads)
+    index = LocalVectorIndex(args.collection, vectors, list(range(len(payloads))), payloads, kind="numpy")
+    index.save(args.out_dir)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,158 @@
 # backend/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, File, Form, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from .qdrant_service import search_all_collections
-from .rag import summarize_for_patient, summarize_for_doctor, count_cancer_cases
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from .qdrant_service import (
+    search_all_collections,
+    iter_search_results,
+    close_qdrant_client,
+    get_collection_versions,
+    health_check,
+    get_case
+)
+from .inference import get_inference_executor, shutdown_inference_executor, InferenceSaturatedError
+from .rag import (
+    summarize_for_patient,
+    summarize_for_doctor,
+    count_cancer_cases,
+    risk_level,
+    extract_gene_mutations,
+    extract_protein_biomarkers
+)
+from .embedding import (
+    WARMUP_MODEL_NAMES,
+    normalize_query_text,
+    warmup_models,
+    get_model_status,
+    get_cache_stats,
+    get_batching_stats
+)
+from .cache import PersistentTTLCache
+from .screening import SCREENING_BATCH_SIZE, read_patient_records, render_queries, screen_patients
+from .metrics import REGISTRY, MetricsMiddleware
+from qdrant_common.payload_indexes import UnsupportedFilterError, validate_filters
 import os
-import tempfile
-import shutil
+import asyncio
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Tawhida RAG API")
+# Upload limits: the image itself, and the whole multipart body (image + text fields)
+MAX_IMAGE_BYTES = int(float(os.getenv("MAX_IMAGE_UPLOAD_MB", "10")) * 1024 * 1024)
+MAX_SEARCH_BODY_BYTES = MAX_IMAGE_BYTES + 1024 * 1024
+UPLOAD_CHUNK_BYTES = 256 * 1024
+MAX_SCREENING_BYTES = int(float(os.getenv("MAX_SCREENING_UPLOAD_MB", "50")) * 1024 * 1024)
+
+# Models warmed at startup and required by /ready ("text", "image"; empty for none)
+WARMUP_MODELS = [m.strip() for m in os.getenv("WARMUP_MODELS", "text,image").split(",") if m.strip()]
+# An unknown name would never become warm and keep /ready at 503: refuse to start instead
+_unknown_models = sorted(set(WARMUP_MODELS) - set(WARMUP_MODEL_NAMES))
+if _unknown_models:
+    raise ValueError(f"Unknown WARMUP_MODELS {_unknown_models}. Expected names among {list(WARMUP_MODEL_NAMES)}")
+
+# Cache of complete /search responses. Keys include each collection's version token,
+# so re-ingesting a collection invalidates its cached responses. SEARCH_CACHE_PATH
+# enables an SQLite backing file that survives restarts; SEARCH_CACHE_SIZE=0 disables it.
+_response_cache = PersistentTTLCache(
+    "search_responses",
+    max_size=int(os.getenv("SEARCH_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "3600")),
+    path=os.getenv("SEARCH_CACHE_PATH") or None
+)
+
+async def _warmup():
+    """Warm the selected models and the Qdrant connection in the background."""
+    try:
+        await get_inference_executor().run(warmup_models, WARMUP_MODELS)
+    except Exception as e:
+        logger.error(f"Model warmup failed: {str(e)}", exc_info=True)
+    if await health_check():
+        logger.info("Qdrant connection warmed up")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the inference executor (and size PyTorch threads) before serving traffic
+    get_inference_executor()
+    # Warm models and Qdrant without delaying startup; /ready reports when done
+    warmup_task = asyncio.create_task(_warmup())
+    yield
+    warmup_task.cancel()
+    # Release pooled Qdrant connections and inference workers on shutdown
+    await close_qdrant_client()
+    shutdown_inference_executor()
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware enforcing a maximum request body size per path while the body streams in.
+    
+    Requests announcing a larger Content-Length are rejected before any byte is read;
+    chunked bodies are counted as they arrive and aborted with 413 as soon as they
+    cross the limit, so oversized uploads are never fully buffered.
+    """
+    
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+    
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                await self._reject(send, 400, "Invalid Content-Length header")
+                return
+            if declared > limit:
+                await self._reject(send, 413, f"Request body exceeds {limit} bytes")
+                return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+            return message
+        
+        await self.app(scope, limited_receive, send)
+    
+    @staticmethod
+    async def _reject(send, status: int, detail: str):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")]
+        })
+        await send({
+            "type": "http.response.body",
+            "body": json.dumps({"detail": detail}).encode("utf-8")
+        })
+
+app = FastAPI(title="Tawhida RAG API", lifespan=lifespan)
+
+# Request latency and status counts for the search endpoints (see /metrics)
+app.add_middleware(MetricsMiddleware, endpoints=["/search", "/search/stream", "/screening"])
+
+# Reject oversized uploads while they stream in
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={
+        "/search": MAX_SEARCH_BODY_BYTES,
+        "/search/stream": MAX_SEARCH_BODY_BYTES,
+        "/screening": MAX_SCREENING_BYTES + 1024 * 1024
+    }
+)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -17,12 +162,84 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/ready")
+async def readiness():
+    """
+    Readiness probe for the load balancer.
+    Returns 200 once the models listed in WARMUP_MODELS are warm and Qdrant is
+    reachable, and 503 otherwise.
+    """
+    models = get_model_status()
+    models_ready = all(models.get(name, {}).get("warm", False) for name in WARMUP_MODELS)
+    qdrant_ready = await health_check()
+    
+    body = {
+        "status": "ready" if models_ready and qdrant_ready else "warming_up",
+        "models": models,
+        "qdrant": qdrant_ready
+    }
+    return JSONResponse(status_code=200 if body["status"] == "ready" else 503, content=body)
+
+def _collect_runtime_metrics():
+    """Scrape-time metrics of the caches, micro-batchers and inference executor."""
+    caches = {"search_responses": _response_cache.stats(), **get_cache_stats()}
+    yield ("tawhida_cache_entries", "gauge", "Entries held per cache",
+           [({"cache": name}, stats["size"]) for name, stats in caches.items()])
+    yield ("tawhida_cache_hits_total", "counter", "Cache lookups served from the cache",
+           [({"cache": name}, stats["hits"]) for name, stats in caches.items()])
+    yield ("tawhida_cache_misses_total", "counter", "Cache lookups not found in the cache",
+           [({"cache": name}, stats["misses"]) for name, stats in caches.items()])
+    yield ("tawhida_cache_evictions_total", "counter", "Entries evicted to respect the cache size",
+           [({"cache": name}, stats["evictions"]) for name, stats in caches.items()])
+    
+    batching = get_batching_stats()
+    models = [name for name in batching if name != "enabled"]
+    yield ("tawhida_microbatch_queue_depth", "gauge", "Embedding requests waiting for a micro-batch",
+           [({"model": name}, batching[name]["queue_depth"]) for name in models])
+    yield ("tawhida_microbatch_batches_total", "counter", "Micro-batched forward passes",
+           [({"model": name}, batching[name]["batches"]) for name in models])
+    yield ("tawhida_microbatch_items_total", "counter", "Inputs encoded through micro-batches",
+           [({"model": name}, batching[name]["items"]) for name in models])
+    
+    executor = get_inference_executor().stats()
+    yield ("tawhida_inference_in_flight", "gauge", "Inference jobs running or queued",
+           [({}, executor["in_flight"])])
+    yield ("tawhida_inference_rejected_total", "counter", "Inference jobs rejected while saturated",
+           [({}, executor["rejected"])])
+    yield ("tawhida_inference_completed_total", "counter", "Inference jobs completed",
+           [({}, executor["completed"])])
+
+REGISTRY.register_collector(_collect_runtime_metrics)
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus scrape endpoint: per-stage and per-modality latency histograms,
+    request, error and hit counters, cache, micro-batching and executor state.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cases/{modality}/{case_id}")
+async def case_details(modality: str, case_id: str):
+    """
+    Full payload of one similar case, including the heavy fields (DNA sequences,
+    pathways) that /search leaves out. Use the modality and id from "case_refs".
+    """
+    try:
+        case = await get_case(modality, case_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if case is None:
+        raise HTTPException(status_code=404, detail=f"Case '{case_id}' not found in {modality}")
+    return case
+
 @app.post("/search")
 async def search_risk(
     role: str = Form(...),
     gene_text: str = Form(""),
     protein_text: str = Form(""),
-    report_image: UploadFile = File(None)
+    report_image: UploadFile = File(None),
+    filters: str = Form("")
 ):
     """
     Main endpoint for Tawhida RAG system
@@ -31,65 +248,312 @@ async def search_risk(
       - gene_text: genetic info (e.g., "BRCA1 mutation")
       - protein_text: protein biomarkers (e.g., "ER+, PR-")
       - report_image: pathology report image (optional)
+      - filters: JSON object of structured filters (optional),
+        e.g. {"pam50_subtype": "Luminal A", "gene_mutations.BRCA1": true}
     """
     # Validate role
     if role not in ["patient", "doctor"]:
         raise HTTPException(status_code=400, detail="Role must be 'patient' or 'doctor'")
     
-    # Save uploaded image temporarily
-    image_path = None
-    temp_dir = None
+    search_filters = _parse_filters(filters)
+    
+    # Keep the upload in memory: it is hashed for the cache and decoded directly by CLIP
+    image_bytes = None
     if report_image and report_image.filename:
-        temp_dir = tempfile.mkdtemp()
-        image_path = os.path.join(temp_dir, report_image.filename)
-        with open(image_path, "wb") as f:
-            f.write(await report_image.read())
+        image_bytes = await _read_upload(report_image, MAX_IMAGE_BYTES)
+    
+    # Serve identical submissions against unchanged collections from the cache
+    cache_key = await _search_cache_key(role, gene_text, protein_text, image_bytes, search_filters)
+    if cache_key is not None:
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Serving /search response from cache")
+            return cached
+    
+    # Search all three collections
+    try:
+        results = await search_all_collections(gene_text, protein_text, image_bytes, search_filters, role=role)
+    except InferenceSaturatedError:
+        raise HTTPException(
+            status_code=503,
+            detail="Inference capacity exhausted, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    
+    response = _build_response(role, results)
+    
+    # Degraded responses (a modality failed) are not cached
+    if cache_key is not None and not results.get("errors"):
+        _response_cache.set(cache_key, response)
+    
+    return response
 
+@app.post("/search/stream")
+async def search_risk_stream(
+    role: str = Form(...),
+    gene_text: str = Form(""),
+    protein_text: str = Form(""),
+    report_image: UploadFile = File(None),
+    filters: str = Form("")
+):
+    """
+    Streaming variant of /search, same inputs, returning NDJSON (one JSON object per line):
+      - {"event": "modality", "modality": "genes", ...} as soon as each modality completes,
+        with its hit count, cancer-confirmed count and, for doctors, its cases and
+        mutation / biomarker statistics
+      - {"event": "patients", ...} with the patient-level matches (SEARCH_MODE=patients)
+      - {"event": "error", "modality": ..., "detail": ...} for a failed modality
+      - {"event": "skipped", "modality": ..., "detail": ...} for a modality whose
+        collection does not index every filtered field
+      - {"event": "result", "response": {...}} last, with the body /search would return
+    A cached response is streamed as the "result" event alone.
+    """
+    if role not in ["patient", "doctor"]:
+        raise HTTPException(status_code=400, detail="Role must be 'patient' or 'doctor'")
+    
+    search_filters = _parse_filters(filters)
+    
+    image_bytes = None
+    if report_image and report_image.filename:
+        image_bytes = await _read_upload(report_image, MAX_IMAGE_BYTES)
+    
+    cache_key = await _search_cache_key(role, gene_text, protein_text, image_bytes, search_filters)
+    if cache_key is not None:
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Serving /search/stream response from cache")
+            return StreamingResponse(
+                iter([_ndjson({"event": "result", "response": cached})]),
+                media_type="application/x-ndjson"
+            )
+    
+    # Wait for the fastest modality before sending the status line, so a saturated
+    # executor is still reported as 503 rather than as an error event
+    outcomes = iter_search_results(gene_text, protein_text, image_bytes, search_filters, role=role)
+    try:
+        first = await outcomes.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except InferenceSaturatedError:
+        raise HTTPException(
+            status_code=503,
+            detail="Inference capacity exhausted, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    
+    return StreamingResponse(
+        _search_events(role, first, outcomes, cache_key),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/screening")
+async def screening(
+    patients: UploadFile = File(...),
+    batch_size: int = Form(SCREENING_BATCH_SIZE),
+    filters: str = Form("")
+):
+    """
+    Batch risk assessment for a screening cohort
+    Accepts:
+      - patients: CSV, JSONL or JSON list of patients, with the columns produced by
+        Proteine_Mutation/preprocessing.py and/or Gene_Mutation/preprocessing.py
+      - batch_size: patients embedded and searched together (optional)
+      - filters: JSON object of structured filters (optional), as for /search
+    Returns NDJSON, one row per patient in input order:
+      {"patient_id", "risk_level", "similar_cases_count", "cancer_confirmed_count", ...}
+    """
+    if batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size must be at least 1")
+    
+    search_filters = _parse_filters(filters)
+    data = await _read_upload(patients, MAX_SCREENING_BYTES)
+    try:
+        records = read_patient_records(data, patients.filename or "")
+        # Render every record up front: a malformed row fails here with 400, not mid-stream
+        queries = render_queries(records)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Screening {len(records)} patients in batches of {batch_size}")
+    
+    return StreamingResponse(
+        (_ndjson(row) async for row in screen_patients(records, queries, batch_size, search_filters)),
+        media_type="application/x-ndjson"
+    )
+
+async def _search_events(role, first, outcomes, cache_key):
+    """
+    Turn modality outcomes into NDJSON events, then emit the final /search response.
+    """
+    results = {"genes": [], "proteins": [], "images": [], "errors": {}, "skipped": {}}
+    try:
+        if first is not None:
+            yield _ndjson(_modality_event(role, results, *first))
+        async for outcome in outcomes:
+            yield _ndjson(_modality_event(role, results, *outcome))
+    except InferenceSaturatedError:
+        yield _ndjson({"event": "error", "detail": "Inference capacity exhausted, please retry shortly"})
+        return
+    
+    response = _build_response(role, results)
+    if cache_key is not None and not results["errors"]:
+        _response_cache.set(cache_key, response)
+    yield _ndjson({"event": "result", "response": response})
+
+def _modality_event(role, results, modality, hits, error):
+    """Record one modality outcome in results and build its stream event."""
+    if isinstance(error, UnsupportedFilterError):
+        results["skipped"][modality] = str(error)
+        return {"event": "skipped", "modality": modality, "detail": str(error)}
+    if error is not None:
+        results["errors"][modality] = str(error)
+        return {"event": "error", "modality": modality, "detail": str(error)}
+    
+    results[modality] = hits
+    if modality == "patients":
+        event = {"event": "patients", "count": len(hits)}
+        if role == "doctor":
+            event["similar_patients"] = _format_patients(hits)
+        return event
+    
+    event = {
+        "event": "modality",
+        "modality": modality,
+        "count": len(hits),
+        "cancer_confirmed_count": count_cancer_cases(hits)
+    }
+    if role == "doctor":
+        ref_modality = "patients" if "patients" in results else modality
+        event["similar_cases"] = [hit["payload"] for hit in hits]
+        event["case_refs"] = [{"modality": ref_modality, "id": hit["id"]} for hit in hits]
+        if modality == "genes":
+            event["mutations"] = extract_gene_mutations(hits)
+        elif modality == "proteins":
+            event["biomarkers"] = extract_protein_biomarkers(hits)
+    return event
+
+def _ndjson(event):
+    """Serialize one stream event as a newline-terminated JSON line."""
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+async def _read_upload(upload: UploadFile, max_bytes: int) -> bytes:
+    """
+    Read an uploaded file into memory chunk by chunk, failing with 413 once it exceeds max_bytes.
+    """
+    data = bytearray()
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        data.extend(chunk)
+        if len(data) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+    return bytes(data)
+
+def _parse_filters(filters):
+    """
+    Parse and validate the JSON filters form field. Returns None when no filter is given.
+    """
+    if not filters or not filters.strip():
+        return None
+    try:
+        parsed = json.loads(filters)
+        validate_filters(parsed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filters: {str(e)}")
+    return parsed or None
+
+async def _search_cache_key(role, gene_text, protein_text, image_bytes, filters=None):
+    """
+    Build the response cache key from the normalized inputs and collection versions.
+    Returns None when caching is disabled or the collection versions are unknown.
+    """
+    if _response_cache.max_size <= 0:
+        return None
+    
     try:
-        # Search all three collections
-        results = search_all_collections(gene_text, protein_text, image_path)
+        versions = await get_collection_versions()
+    except Exception as e:
+        logger.warning(f"Response cache bypassed, collection versions unavailable: {str(e)}")
+        return None
+    if "unavailable" in versions.values():
+        return None
+    
+    key = {
+        "role": role,
+        "gene_text": normalize_query_text(gene_text or ""),
+        "protein_text": normalize_query_text(protein_text or ""),
+        "image": hashlib.sha256(image_bytes).hexdigest() if image_bytes else "",
+        "filters": filters or {},
+        "versions": versions
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _distinct_cases(cases):
+    """Cases with duplicate point ids removed, first occurrence kept."""
+    seen = set()
+    distinct = []
+    for case in cases:
+        if case["id"] not in seen:
+            seen.add(case["id"])
+            distinct.append(case)
+    return distinct
+
+def _build_response(role, results):
+    """Build the role-specific /search response from the multi-collection results."""
+    # Extract cases by modality
+    gene_cases = results.get("genes", [])
+    protein_cases = results.get("proteins", [])
+    image_cases = results.get("images", [])
+    all_cases = gene_cases + protein_cases + image_cases
+    # In SEARCH_MODE=patients every modality hits the same patient points: count each patient once
+    if "patients" in results:
+        all_cases = _distinct_cases(all_cases)
+
+    # Generate role-specific response
+    if role == "patient":
+        explanation = summarize_for_patient(all_cases)
+        total_cases = len(all_cases)
+        cancer_count = count_cancer_cases(all_cases)
+        
+        response = {
+            "risk_level": risk_level(total_cases, cancer_count),
+            "explanation": explanation,
+            "similar_cases_count": total_cases,
+            "cancer_confirmed_count": cancer_count
+        }
+        # Modalities left out because their collection cannot apply the filters
+        if results.get("skipped"):
+            response["skipped"] = results["skipped"]
+        return response
         
-        # Extract cases by modality
-        gene_cases = results.get("genes", [])
-        protein_cases = results.get("proteins", [])
-        image_cases = results.get("images", [])
-        all_cases = gene_cases + protein_cases + image_cases
-
-        # Generate role-specific response
-        if role == "patient":
-            explanation = summarize_for_patient(all_cases)
-            total_cases = len(all_cases)
-            cancer_count = count_cancer_cases(all_cases)
-            
-            # Determine risk level
-            if total_cases == 0:
-                risk_level = "Inconnu"
-            elif cancer_count == 0:
-                risk_level = "Faible"
-            elif cancer_count / total_cases >= 0.5:
-                risk_level = "Élevé"
-            else:
-                risk_level = "Modéré"
-                
-            return {
-                "risk_level": risk_level,
-                "explanation": explanation,
-                "similar_cases_count": total_cases,
-                "cancer_confirmed_count": cancer_count
-            }
-            
-        else:  # doctor
-            explanation = summarize_for_doctor(gene_cases, protein_cases, image_cases)
-            return {
-                "explanation": explanation,
-                "similar_cases": [hit["payload"] for hit in all_cases[:10]],
-                "total_found": len(all_cases),
-                "gene_cases_count": len(gene_cases),
-                "protein_cases_count": len(protein_cases),
-                "image_cases_count": len(image_cases)
-            }
-
-    finally:
-        # Cleanup temporary files
-        if temp_dir and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir, ignore_errors=True)
+    else:  # doctor
+        explanation = summarize_for_doctor(gene_cases, protein_cases, image_cases, all_cases=all_cases)
+        # References to fetch the full payload of each similar case from /cases
+        ref_modalities = ["genes"] * len(gene_cases) + ["proteins"] * len(protein_cases) + ["images"] * len(image_cases)
+        if "patients" in results:
+            ref_modalities = ["patients"] * len(all_cases)
+        response = {
+            "explanation": explanation,
+            "similar_cases": [hit["payload"] for hit in all_cases[:10]],
+            "case_refs": [
+                {"modality": modality, "id": hit["id"]}
+                for modality, hit in zip(ref_modalities[:10], all_cases[:10])
+            ],
+            "total_found": len(all_cases),
+            "gene_cases_count": len(gene_cases),
+            "protein_cases_count": len(protein_cases),
+            "image_cases_count": len(image_cases)
+        }
+        # Patient-level matches, available when searching the consolidated patient collection
+        if "patients" in results:
+            response["similar_patients"] = _format_patients(results["patients"])
+        if results.get("skipped"):
+            response["skipped"] = results["skipped"]
+        return response
+
+def _format_patients(patients):
+    """Patient-level matches as returned to doctors."""
+    return [
+        {"patient_id": patient["payload"].get("patient_id"), "score": patient["score"], "modality_scores": patient["scores"]}
+        for patient in patients
+    ]
@@ -0,0 +1,316 @@
+# backend/metrics.py
+"""
+Metrics module for Tawhida RAG system.
+Latency histograms and counters rendered in the Prometheus text exposition format
+(served on /metrics), without a client library dependency.
+
+Pipeline stages are timed in STAGE_LATENCY with "stage" and "modality" labels:
+- embed: model inference for one query (cache lookup and micro-batching wait included)
+- search: one vector search round-trip (Qdrant or local index) for one modality
+- embed_batch / search_batch: the batched equivalents used by /screening
+- summarize_patient / summarize_doctor: rag.py summaries (modality "all")
+
+REQUEST_LATENCY times whole requests per endpoint, until the last byte is sent
+(the final event for streaming endpoints), and REQUESTS counts them by status.
+ERRORS counts failures per stage and modality, and SEARCH_HITS the number of hits
+returned per modality.
+
+State owned by other modules (caches, micro-batchers, inference executor) is read
+at scrape time by collectors registered with REGISTRY.register_collector().
+
+Latency buckets default to LATENCY_BUCKETS (5 ms to 10 s); METRICS_LATENCY_BUCKETS
+overrides them with a comma-separated list of seconds.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import functools
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# A collector returns metric families: (name, type, help, [(labels, value), ...])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Sequence[Tuple[str, Any]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _header(name: str, kind: str, documentation: str) -> List[str]:
+    return [f"# HELP {name} {_escape(documentation)}", f"# TYPE {name} {kind}"]
+
+class Counter:
+    """
+    Monotonically increasing counter with labels.
+
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labelnames (Sequence[str]): Label names, all required when incrementing
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        """Add amount to the counter of the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        """Current value for the given label values."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = _header(self.name, "counter", self.documentation)
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """
+    Histogram of observed values (latencies in seconds) with labels.
+
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labelnames (Sequence[str]): Label names, all required when observing
+        buckets (Sequence[float]): Upper bounds of the buckets, ascending
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """Record one observation for the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["buckets"][bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels: Any):
+        """Context manager observing the duration of its block, including when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels: Any) -> Callable:
+        """Decorator observing the duration of every call of a function or coroutine function."""
+        def decorator(func: Callable) -> Callable:
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.time(**labels):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self, **labels: Any) -> Dict[str, Any]:
+        """Per-bucket counts, sum and count for the given label values (zeros if never observed)."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if series is None:
+                return {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            return {"buckets": list(series["buckets"]), "sum": series["sum"], "count": series["count"]}
+
+    def render(self) -> List[str]:
+        lines = _header(self.name, "histogram", self.documentation)
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = list(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series["buckets"]):
+                    cumulative += count
+                    lines.append(
+                        f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(float(bound)))])} {cumulative}"
+                    )
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+        return lines
+
+class MetricsRegistry:
+    """Set of metrics and scrape-time collectors rendered together on /metrics."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create and register a Counter."""
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        """Create and register a Histogram."""
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """
+        Register a function called at every scrape.
+
+        Args:
+            collector (Callable): Returns metric families as
+                (name, "gauge" or "counter", help, [(labels, value), ...])
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format (version 0.0.4).
+
+        Returns:
+            str: Exposition text, newline-terminated
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {str(e)}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.extend(_header(name, kind, documentation))
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+def _latency_buckets() -> Sequence[float]:
+    configured = os.getenv("METRICS_LATENCY_BUCKETS")
+    if not configured:
+        return LATENCY_BUCKETS
+    return tuple(float(bound) for bound in configured.split(",") if bound.strip())
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "tawhida_request_duration_seconds",
+    "End-to-end request latency, until the last response byte is sent",
+    ["endpoint"],
+    buckets=_latency_buckets()
+)
+REQUESTS = REGISTRY.counter(
+    "tawhida_requests_total",
+    "Requests handled, by endpoint and HTTP status",
+    ["endpoint", "status"]
+)
+STAGE_LATENCY = REGISTRY.histogram(
+    "tawhida_stage_duration_seconds",
+    "Latency of one pipeline stage (embed, search, summarize)",
+    ["stage", "modality"],
+    buckets=_latency_buckets()
+)
+ERRORS = REGISTRY.counter(
+    "tawhida_errors_total",
+    "Pipeline failures, by stage and modality",
+    ["stage", "modality"]
+)
+SEARCH_HITS = REGISTRY.counter(
+    "tawhida_search_hits_total",
+    "Hits returned by vector searches, by modality",
+    ["modality"]
+)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording REQUEST_LATENCY and REQUESTS for a fixed set of paths.
+
+    Only the listed paths are recorded, so parameterized routes such as /cases/{id}
+    do not create one series per URL.
+
+    Args:
+        app: Wrapped ASGI application
+        endpoints (Iterable[str]): Paths to record
+    """
+
+    def __init__(self, app, endpoints: Iterable[str]):
+        self.app = app
+        self.endpoints = set(endpoints)
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path") if scope["type"] == "http" else None
+        if path not in self.endpoints:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, recording_send)
+        finally:
+            REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=path)
+            REQUESTS.inc(endpoint=path, status=status)
@@ -0,0 +1,399 @@
+# backend/onnx_backend.py
+"""
+ONNX Runtime inference backend for Tawhida RAG system.
+CPU-optimized alternative to eager PyTorch for the two query-time encoders:
+- all-MiniLM-L6-v2 text encoder (384D, gene and protein modalities)
+- CLIP ViT-B/32 vision tower + projection (512D, image modality)
+
+Models are exported once with torch.onnx.export and can optionally be quantized
+with dynamic int8 quantization. The encoders reproduce the PyTorch pipelines
+exactly (MiniLM mean pooling + L2 normalization, CLIP image features + L2
+normalization), so the vectors stay compatible with the existing collections.
+
+Enable with EMBEDDING_BACKEND=onnx (see embedding.py). Configuration:
+- ONNX_MODEL_DIR: directory holding the exported models (default "onnx_models")
+- ONNX_QUANTIZED: "true" to load the int8-quantized models
+- ONNX_INTRA_OP_THREADS: ONNX Runtime intra-op threads (default: runtime decides)
+
+Command line:
+    python -m Interface.Backend.onnx_backend export [--quantize]
+    python -m Interface.Backend.onnx_backend check [--quantized]
+"""
+
+import os
+import time
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+import onnxruntime as ort
+from PIL import Image
+from transformers import AutoTokenizer, CLIPProcessor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TEXT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+TEXT_MAX_LENGTH = 256  # all-MiniLM-L6-v2 max_seq_length
+ONNX_OPSET = 14
+
+TEXT_ONNX_FILE = "minilm_text.onnx"
+CLIP_ONNX_FILE = "clip_vision.onnx"
+
+def _model_dir() -> str:
+    return os.getenv("ONNX_MODEL_DIR", "onnx_models")
+
+def _use_quantized() -> bool:
+    return os.getenv("ONNX_QUANTIZED", "false").strip().lower() in ("1", "true", "yes")
+
+def _quantized_path(path: str) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.int8{ext}"
+
+def _session(path: str) -> ort.InferenceSession:
+    """Create a CPU inference session with full graph optimizations."""
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    intra_op_threads = os.getenv("ONNX_INTRA_OP_THREADS")
+    if intra_op_threads:
+        options.intra_op_num_threads = int(intra_op_threads)
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+def _l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+# ==================== Export ====================
+
+def export_text_model(output_dir: str) -> str:
+    """
+    Export the MiniLM transformer (token embeddings) to ONNX.
+    Pooling and normalization are done in NumPy by OnnxTextEncoder.
+
+    Args:
+        output_dir (str): Directory to write the model and tokenizer files into
+
+    Returns:
+        str: Path of the exported ONNX model
+    """
+    import torch
+    from transformers import AutoModel
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, TEXT_ONNX_FILE)
+
+    tokenizer = AutoTokenizer.from_pretrained(TEXT_MODEL_NAME)
+    model = AutoModel.from_pretrained(TEXT_MODEL_NAME)
+    model.eval()
+
+    sample = tokenizer(["BRCA1 mutation detected"], return_tensors="pt")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_type_ids": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"}
+            },
+            opset_version=ONNX_OPSET
+        )
+
+    tokenizer.save_pretrained(os.path.join(output_dir, "minilm_tokenizer"))
+    logger.info(f"MiniLM text encoder exported to {path}")
+    return path
+
+def export_clip_vision(output_dir: str) -> str:
+    """
+    Export the CLIP ViT-B/32 vision tower and projection (get_image_features) to ONNX.
+
+    Args:
+        output_dir (str): Directory to write the model and processor files into
+
+    Returns:
+        str: Path of the exported ONNX model
+    """
+    import torch
+    from transformers import CLIPModel
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, CLIP_ONNX_FILE)
+
+    model = CLIPModel.from_pretrained(CLIP_MODEL_NAME)
+    model.eval()
+    processor = CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+
+    class _ImageFeatures(torch.nn.Module):
+        def __init__(self, clip_model):
+            super().__init__()
+            self.clip_model = clip_model
+
+        def forward(self, pixel_values):
+            return self.clip_model.get_image_features(pixel_values=pixel_values)
+
+    pixel_values = processor(images=[Image.new("RGB", (224, 224))], return_tensors="pt")["pixel_values"]
+    with torch.no_grad():
+        torch.onnx.export(
+            _ImageFeatures(model),
+            (pixel_values,),
+            path,
+            input_names=["pixel_values"],
+            output_names=["image_embeds"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+            opset_version=ONNX_OPSET
+        )
+
+    processor.save_pretrained(os.path.join(output_dir, "clip_processor"))
+    logger.info(f"CLIP vision encoder exported to {path}")
+    return path
+
+def quantize_model(path: str) -> str:
+    """
+    Apply dynamic int8 quantization (weights int8, activations quantized at runtime).
+
+    Args:
+        path (str): Path of an fp32 ONNX model
+
+    Returns:
+        str: Path of the quantized model (same name with an .int8 suffix)
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    output_path = _quantized_path(path)
+    quantize_dynamic(path, output_path, weight_type=QuantType.QInt8)
+    logger.info(f"Quantized {path} → {output_path}")
+    return output_path
+
+# ==================== Encoders ====================
+
+class OnnxTextEncoder:
+    """
+    all-MiniLM-L6-v2 on ONNX Runtime: tokenizer → transformer → mean pooling → L2 norm.
+
+    Args:
+        model_dir (str): Directory containing the exported model and tokenizer
+        quantized (bool): Load the int8-quantized model instead of fp32
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False):
+        path = os.path.join(model_dir, TEXT_ONNX_FILE)
+        if quantized:
+            path = _quantized_path(path)
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.join(model_dir, "minilm_tokenizer"))
+        self.session = _session(path)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(f"ONNX text encoder loaded from {path}")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts into L2-normalized 384D vectors.
+
+        Args:
+            texts (List[str]): Input texts
+
+        Returns:
+            np.ndarray: Array of shape (len(texts), 384)
+        """
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=TEXT_MAX_LENGTH,
+            return_tensors="np"
+        )
+        feeds = {name: tokens[name].astype(np.int64) for name in self.input_names}
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over non-padding tokens
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return _l2_normalize(pooled)
+
+class OnnxClipImageEncoder:
+    """
+    CLIP ViT-B/32 image features on ONNX Runtime: processor → vision tower → L2 norm.
+
+    Args:
+        model_dir (str): Directory containing the exported model and processor
+        quantized (bool): Load the int8-quantized model instead of fp32
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False):
+        path = os.path.join(model_dir, CLIP_ONNX_FILE)
+        if quantized:
+            path = _quantized_path(path)
+        self.processor = CLIPProcessor.from_pretrained(os.path.join(model_dir, "clip_processor"))
+        self.session = _session(path)
+        logger.info(f"ONNX CLIP image encoder loaded from {path}")
+
+    def encode(self, images: List[Image.Image]) -> np.ndarray:
+        """
+        Encode RGB images into L2-normalized 512D vectors.
+
+        Args:
+            images (List[Image.Image]): Decoded RGB images
+
+        Returns:
+            np.ndarray: Array of shape (len(images), 512)
+        """
+        pixel_values = self.processor(images=images, return_tensors="np")["pixel_values"]
+        features = self.session.run(None, {"pixel_values": pixel_values.astype(np.float32)})[0]
+        return _l2_normalize(features)
+
+# Global encoder instances, loaded on first use
+_text_encoder = None
+_image_encoder = None
+_encoder_lock = threading.Lock()
+
+def get_text_encoder() -> OnnxTextEncoder:
+    """Get or create the shared ONNX text encoder (ONNX_MODEL_DIR, ONNX_QUANTIZED)."""
+    global _text_encoder
+
+    with _encoder_lock:
+        if _text_encoder is None:
+            _text_encoder = OnnxTextEncoder(_model_dir(), quantized=_use_quantized())
+    return _text_encoder
+
+def get_image_encoder() -> OnnxClipImageEncoder:
+    """Get or create the shared ONNX CLIP image encoder (ONNX_MODEL_DIR, ONNX_QUANTIZED)."""
+    global _image_encoder
+
+    with _encoder_lock:
+        if _image_encoder is None:
+            _image_encoder = OnnxClipImageEncoder(_model_dir(), quantized=_use_quantized())
+    return _image_encoder
+
+def encoder_loaded(name: str) -> bool:
+    """Return True if the "text" or "image" ONNX encoder has been loaded."""
+    return (_text_encoder if name == "text" else _image_encoder) is not None
+
+# ==================== Parity & latency check ====================
+
+def _cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (_l2_normalize(a) * _l2_normalize(b)).sum(axis=1)
+
+def _time_ms(func, repeats: int) -> float:
+    func()  # warm-up run, excluded from timing
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+def compare_backends(
+    texts: List[str],
+    images: List[Image.Image],
+    model_dir: str,
+    quantized: bool = False,
+    repeats: int = 5
+) -> Dict[str, Dict[str, float]]:
+    """
+    Compare ONNX vectors and latency against the PyTorch reference encoders.
+
+    Args:
+        texts (List[str]): Sample texts encoded as one batch
+        images (List[Image.Image]): Sample images encoded as one batch
+        model_dir (str): Directory containing the exported ONNX models
+        quantized (bool): Compare the int8-quantized models instead of fp32
+        repeats (int): Timed repetitions per backend
+
+    Returns:
+        Dict[str, Dict[str, float]]: Per encoder: min/mean cosine similarity to PyTorch,
+            PyTorch and ONNX batch latency in milliseconds, and the speedup
+    """
+    import torch
+    from transformers import CLIPModel
+    from sentence_transformers import SentenceTransformer
+
+    report = {}
+
+    # Text encoder
+    st_model = SentenceTransformer(TEXT_MODEL_NAME)
+    onnx_text = OnnxTextEncoder(model_dir, quantized=quantized)
+    torch_vectors = st_model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+    onnx_vectors = onnx_text.encode(texts)
+    cosine = _cosine_rows(torch_vectors, onnx_vectors)
+    torch_ms = _time_ms(lambda: st_model.encode(texts, batch_size=len(texts), convert_to_numpy=True), repeats)
+    onnx_ms = _time_ms(lambda: onnx_text.encode(texts), repeats)
+    report["text_384"] = {
+        "cosine_min": float(cosine.min()),
+        "cosine_mean": float(cosine.mean()),
+        "torch_ms": torch_ms,
+        "onnx_ms": onnx_ms,
+        "speedup": torch_ms / onnx_ms
+    }
+
+    # Image encoder
+    clip_model = CLIPModel.from_pretrained(CLIP_MODEL_NAME)
+    clip_model.eval()
+    clip_processor = CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+    onnx_image = OnnxClipImageEncoder(model_dir, quantized=quantized)
+
+    def torch_images():
+        inputs = clip_processor(images=images, return_tensors="pt")
+        with torch.no_grad():
+            features = clip_model.get_image_features(**inputs)
+        return torch.nn.functional.normalize(features, p=2, dim=-1).numpy()
+
+    cosine = _cosine_rows(torch_images(), onnx_image.encode(images))
+    torch_ms = _time_ms(torch_images, repeats)
+    onnx_ms = _time_ms(lambda: onnx_image.encode(images), repeats)
+    report["image_512"] = {
+        "cosine_min": float(cosine.min()),
+        "cosine_mean": float(cosine.mean()),
+        "torch_ms": torch_ms,
+        "onnx_ms": onnx_ms,
+        "speedup": torch_ms / onnx_ms
+    }
+
+    return report
+
+def _sample_inputs(data_dir: str, count: int):
+    """Load sample OCR report texts and pathology images from the shipped dataset."""
+    text_dir = os.path.join(data_dir, "ocr_text")
+    image_dir = os.path.join(data_dir, "images")
+
+    texts = []
+    for name in sorted(os.listdir(text_dir))[:count]:
+        with open(os.path.join(text_dir, name), encoding="utf-8") as f:
+            texts.append(f.read())
+    images = [
+        Image.open(os.path.join(image_dir, name)).convert("RGB")
+        for name in sorted(os.listdir(image_dir))[:count]
+    ]
+    return texts, images
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export and validate ONNX encoders")
+    parser.add_argument("command", choices=["export", "check"])
+    parser.add_argument("--model-dir", default=_model_dir())
+    parser.add_argument("--quantize", action="store_true", help="also write int8-quantized models (export)")
+    parser.add_argument("--quantized", action="store_true", help="check the int8-quantized models (check)")
+    parser.add_argument("--data-dir", default="Pathology_Report/data/breast_dataset")
+    parser.add_argument("--samples", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        paths = [export_text_model(args.model_dir), export_clip_vision(args.model_dir)]
+        if args.quantize:
+            for path in paths:
+                quantize_model(path)
+        return
+
+    texts, images = _sample_inputs(args.data_dir, args.samples)
+    report = compare_backends(texts, images, args.model_dir, quantized=args.quantized)
+    precision = "int8" if args.quantized else "fp32"
+    for encoder, stats in report.items():
+        print(f"{encoder} ({precision}, batch of {args.samples}): "
+              f"cosine min {stats['cosine_min']:.4f} / mean {stats['cosine_mean']:.4f}, "
+              f"torch {stats['torch_ms']:.1f} ms, onnx {stats['onnx_ms']:.1f} ms, "
+              f"speedup x{stats['speedup']:.2f}")
+
+if __name__ == "__main__":
+    main()
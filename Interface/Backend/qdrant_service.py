@@ -8,72 +8,238 @@ Handles searching across three distinct collections with different vector dimens
 
 This module provides a unified interface to search all collections simultaneously
 while respecting their individual embedding requirements and payload structures.
+
+All Qdrant I/O goes through a single AsyncQdrantClient so that concurrent /search
+requests overlap their vector-DB round-trips instead of blocking the event loop.
+Transport and connection pooling are configured through environment variables:
+- QDRANT_PREFER_GRPC: "true" to use gRPC (HTTP/2, multiplexed) instead of REST
+- QDRANT_GRPC_PORT: gRPC port (default 6334)
+- QDRANT_TIMEOUT: per-operation timeout in seconds (default 30)
+- QDRANT_MAX_CONNECTIONS: REST connection pool size (default 100)
+- QDRANT_MAX_KEEPALIVE_CONNECTIONS: idle REST connections kept open (default 20)
+- QDRANT_KEEPALIVE_EXPIRY: seconds an idle REST connection is kept alive (default 30)
+- QDRANT_HTTP2: "true" to negotiate HTTP/2 on the REST transport
+
+SEARCH_BACKEND selects where vector search runs:
+- "qdrant" (default): the Qdrant server configured above
+- "local": in-process indexes loaded from LOCAL_INDEX_DIR (see local_index.py),
+  for offline testing and edge deployments without network access
+
+Searches accept structured filters on the payload fields indexed at ingestion
+(qdrant_common.payload_indexes). The conditions are pushed down into the search of
+every collection that indexes all the filtered fields; a collection missing one of
+them is not searched, and is reported under "skipped" instead of contributing
+unfiltered neighbours.
+
+Collections created with a quantized storage profile (qdrant_common.collection_profiles)
+are searched with rescoring and oversampling; SEARCH_PROFILE selects the profile for
+all collections and SEARCH_PROFILE_<COLLECTION> overrides it for one collection.
+SEARCH_OVERSAMPLING overrides the profile's oversampling factor.
+
+SEARCH_MODE selects how the modalities are searched:
+- "collections" (default): one query per modality collection
+- "patients": one search_batch request against the consolidated patient collection
+  (qdrant_common.patient_collection), querying one named vector per modality; the
+  results also include patient-level matches fused across modalities
+
+Searches only return the payload fields their role needs (PAYLOAD_PROJECTIONS), so
+Qdrant does not serialize DNA sequence lists and pathway arrays for every hit. Full
+payloads are fetched on demand, one case at a time, with get_case().
+
+iter_search_results() yields each modality as soon as its pipeline completes, so
+streaming endpoints can forward the fastest modality without waiting for the others;
+search_all_collections() collects the same outcomes into a single dictionary.
+
+search_collection_batch() runs many queries against one collection in a single
+search_batch request, for bulk workloads such as batch screening.
 """
 
 import os
+import asyncio
 import logging
-from typing import Dict, List, Optional
-from qdrant_client import QdrantClient
-from qdrant_client.models import SearchRequest, VectorParams, Distance
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+import grpc
+import httpx
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant_client.models import NamedVector, PayloadSelectorExclude, PayloadSelectorInclude, SearchRequest
 from .embedding import (
     embed_text_844, 
     embed_text_384, 
     embed_image_512,
     validate_embedding_dimension
 )
+from .inference import get_inference_executor, InferenceSaturatedError
+from .local_index import get_local_index, index_version
+from .metrics import ERRORS, SEARCH_HITS, STAGE_LATENCY
+from qdrant_common.payload_indexes import (
+    BIOMARKER_FIELDS,
+    UnsupportedFilterError,
+    build_filter,
+    conditions_for,
+    unsupported_fields
+)
+from qdrant_common.collection_profiles import profile_for, search_params
+from qdrant_common.patient_collection import PATIENT_COLLECTION
+from qdrant_common.ingestion_stamps import STAMP_COLLECTION, stamp_point_id
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global Qdrant client instance
+# Global async Qdrant client instance, guarded by a lock so concurrent
+# first requests do not race to create several clients
 _qdrant_client = None
+_qdrant_client_lock = asyncio.Lock()
+
+# Collections searched by /search, keyed by modality (aliases of the live
+# generations when ingested blue/green, see qdrant_common.aliases)
+COLLECTION_NAMES = {
+    "genes": "breast_cancer_genes_mutation",
+    "proteins": "breast_cancer_protein_profiles",
+    "images": "PathologyImage"
+}
+
+# Payload fields returned by searches, per role:
+# - patient: only what count_cancer_cases reads (typed labels, plus the cancer flag
+#   and texts for legacy points)
+# - doctor: everything the summary and the similar cases show, without the heavy
+#   DNA sequence lists and pathway arrays (available through get_case)
+PAYLOAD_PROJECTIONS = {
+    "patient": {"include": [*BIOMARKER_FIELDS, "cancer", "Text", "chunk_text"]},
+    "doctor": {"exclude": ["DNA", "Pathways"]}
+}
+
+# Cached collection version tokens: (monotonic fetch time, {collection: token})
+_collection_versions = None
+_collection_versions_lock = asyncio.Lock()
 
-def _get_qdrant_client() -> QdrantClient:
+def _use_local_backend() -> bool:
+    """Whether searches run against in-process indexes instead of Qdrant (SEARCH_BACKEND=local)."""
+    return os.getenv("SEARCH_BACKEND", "qdrant").lower() == "local"
+
+def _use_patient_collection() -> bool:
+    """Whether searches go to the consolidated patient collection (SEARCH_MODE=patients)."""
+    if os.getenv("SEARCH_MODE", "collections").lower() != "patients":
+        return False
+    if _use_local_backend():
+        logger.warning("SEARCH_MODE=patients is not supported by the local backend, searching collections")
+        return False
+    return True
+
+def _payload_selector(projection: Optional[Dict[str, List[str]]]):
+    """Translate a projection ({"include": [...]} or {"exclude": [...]}) into Qdrant's with_payload."""
+    if not projection:
+        return True
+    if "include" in projection:
+        return PayloadSelectorInclude(include=projection["include"])
+    return PayloadSelectorExclude(exclude=projection["exclude"])
+
+def _project_payload(payload: Dict[str, Any], projection: Optional[Dict[str, List[str]]]) -> Dict[str, Any]:
+    """Apply a projection to a payload in process (local backend)."""
+    if not projection:
+        return payload
+    if "include" in projection:
+        return {key: value for key, value in payload.items() if key in projection["include"]}
+    return {key: value for key, value in payload.items() if key not in projection["exclude"]}
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean environment variable ("1", "true", "yes" are truthy)."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes")
+
+def _client_kwargs() -> Dict[str, Any]:
     """
-    Get or create the global Qdrant client instance.
-    Ensures only one client is created per application lifecycle.
+    Build the AsyncQdrantClient keyword arguments from environment variables.
     
     Returns:
-        QdrantClient: Configured Qdrant client instance
+        Dict[str, Any]: Connection, transport and pooling settings
         
     Raises:
         ValueError: If QDRANT_URL or QDRANT_API_KEY environment variables are missing
     """
-    global _qdrant_client
+    qdrant_url = os.getenv("QDRANT_URL")
+    qdrant_api_key = os.getenv("QDRANT_API_KEY")
     
-    if _qdrant_client is None:
-        # Validate required environment variables
-        qdrant_url = os.getenv("QDRANT_URL")
-        qdrant_api_key = os.getenv("QDRANT_API_KEY")
-        
-        if not qdrant_url:
-            raise ValueError("QDRANT_URL environment variable is required")
-        if not qdrant_api_key:
-            raise ValueError("QDRANT_API_KEY environment variable is required")
-            
-        logger.info(f"Initializing Qdrant client with URL: {qdrant_url}")
-        _qdrant_client = QdrantClient(
-            url=qdrant_url,
-            api_key=qdrant_api_key,
-            timeout=30.0  # 30 second timeout for operations
+    if not qdrant_url:
+        raise ValueError("QDRANT_URL environment variable is required")
+    if not qdrant_api_key:
+        raise ValueError("QDRANT_API_KEY environment variable is required")
+    
+    return {
+        "url": qdrant_url,
+        "api_key": qdrant_api_key,
+        "timeout": float(os.getenv("QDRANT_TIMEOUT", "30")),
+        "prefer_grpc": _env_flag("QDRANT_PREFER_GRPC"),
+        "grpc_port": int(os.getenv("QDRANT_GRPC_PORT", "6334")),
+        "http2": _env_flag("QDRANT_HTTP2"),
+        # REST connection pool with keep-alive (the gRPC channel is a single persistent connection)
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv("QDRANT_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("QDRANT_MAX_KEEPALIVE_CONNECTIONS", "20")),
+            keepalive_expiry=float(os.getenv("QDRANT_KEEPALIVE_EXPIRY", "30"))
         )
+    }
+
+async def _get_qdrant_client() -> AsyncQdrantClient:
+    """
+    Get or create the global async Qdrant client instance.
+    Ensures only one client (and therefore one connection pool) is created per
+    application lifecycle.
+    
+    Returns:
+        AsyncQdrantClient: Configured async Qdrant client instance
         
-        # Verify connection
-        try:
-            collections = _qdrant_client.get_collections()
-            logger.info(f"Successfully connected to Qdrant. Available collections: {[c.name for c in collections.collections]}")
-        except Exception as e:
-            logger.error(f"Failed to connect to Qdrant: {str(e)}")
-            raise
-        
+    Raises:
+        ValueError: If QDRANT_URL or QDRANT_API_KEY environment variables are missing
+    """
+    global _qdrant_client
+    
+    if _qdrant_client is not None:
+        return _qdrant_client
+    
+    async with _qdrant_client_lock:
+        if _qdrant_client is None:
+            kwargs = _client_kwargs()
+            logger.info(f"Initializing async Qdrant client with URL: {kwargs['url']} "
+                       f"(transport: {'gRPC' if kwargs['prefer_grpc'] else 'REST'})")
+            client = AsyncQdrantClient(**kwargs)
+            
+            # Verify connection
+            try:
+                collections = await client.get_collections()
+                logger.info(f"Successfully connected to Qdrant. Available collections: {[c.name for c in collections.collections]}")
+            except Exception as e:
+                logger.error(f"Failed to connect to Qdrant: {str(e)}")
+                await client.close()
+                raise
+            
+            _qdrant_client = client
+    
     return _qdrant_client
 
-def _search_collection(
+async def close_qdrant_client() -> None:
+    """
+    Close the global Qdrant client and release its pooled connections.
+    Called from the application shutdown hook.
+    """
+    global _qdrant_client
+    
+    if _qdrant_client is not None:
+        await _qdrant_client.close()
+        _qdrant_client = None
+        logger.info("Qdrant client closed")
+
+async def _search_collection(
     collection_name: str,
     vector: List[float],
     expected_dim: int,
-    limit: int = 10
+    limit: int = 10,
+    filters: Optional[Dict[str, Any]] = None,
+    profile: Optional[str] = None,
+    projection: Optional[Dict[str, List[str]]] = None
 ) -> List[Dict]:
     """
     Search a single Qdrant collection with proper error handling and validation.
@@ -83,29 +249,52 @@ def _search_collection(
         vector (List[float]): Query vector
         expected_dim (int): Expected vector dimension for validation
         limit (int): Maximum number of results to return
+        filters (Optional[Dict[str, Any]]): Structured filters, on fields this collection indexes
+        profile (Optional[str]): Storage profile the collection was created with,
+            defaulting to SEARCH_PROFILE_<COLLECTION> / SEARCH_PROFILE
+        projection (Optional[Dict[str, List[str]]]): Payload fields to return
+            ({"include": [...]} or {"exclude": [...]}), or None for the full payload
         
     Returns:
         List[Dict]: List of search results with id and payload
         
     Raises:
         ValueError: If vector dimension doesn't match expected dimension
+        UnsupportedFilterError: If the collection does not index every filtered field
         Exception: If Qdrant search fails
     """
-    client = _get_qdrant_client()
-    
     # Validate vector dimension
     if not validate_embedding_dimension(vector, expected_dim):
         raise ValueError(f"Vector dimension mismatch for {collection_name}: expected {expected_dim}, got {len(vector)}")
     
+    conditions = conditions_for(collection_name, filters)
+    
+    if _use_local_backend():
+        results = get_local_index(collection_name).search(
+            vector, limit=limit, score_threshold=0.0, conditions=conditions
+        )
+        for result in results:
+            result["payload"] = _project_payload(result["payload"], projection)
+        logger.info(f"Found {len(results)} results in local index '{collection_name}'")
+        return results
+    
+    client = await _get_qdrant_client()
+    profile = profile or profile_for(collection_name)
+    oversampling = os.getenv("SEARCH_OVERSAMPLING")
+    params = search_params(profile, float(oversampling) if oversampling else None)
+    
     try:
-        logger.debug(f"Searching collection '{collection_name}' with {expected_dim}D vector, limit={limit}")
+        logger.debug(f"Searching collection '{collection_name}' with {expected_dim}D vector, limit={limit}, "
+                     f"filters={conditions}, profile={profile}")
         
-        # Perform search
-        hits = client.search(
+        # Perform search, with the filter evaluated inside Qdrant's payload indexes
+        hits = await client.search(
             collection_name=collection_name,
             query_vector=vector,
+            query_filter=build_filter(conditions),
+            search_params=params,  # Rescore quantized candidates with the original vectors
             limit=limit,
-            with_payload=True,
+            with_payload=_payload_selector(projection),  # Only the fields the role needs
             with_vectors=False,  # Don't return vectors to save bandwidth
             score_threshold=0.0  # Return all results above minimum similarity
         )
@@ -127,122 +316,546 @@ def _search_collection(
         logger.error(f"Search failed for collection '{collection_name}': {str(e)}", exc_info=True)
         raise
 
-def search_all_collections(
+async def search_collection_batch(
+    collection_name: str,
+    vectors: List[Optional[List[float]]],
+    expected_dim: int,
+    limit: int = 10,
+    filters: Optional[Dict[str, Any]] = None,
+    projection: Optional[Dict[str, List[str]]] = None
+) -> List[List[Dict]]:
+    """
+    Search one collection with many query vectors in a single round-trip.
+    
+    Args:
+        collection_name (str): Name of the collection to search
+        vectors (List[Optional[List[float]]]): Query vectors; None entries are skipped
+        expected_dim (int): Expected vector dimension for validation
+        limit (int): Maximum number of results per query
+        filters (Optional[Dict[str, Any]]): Structured filters, applied to every query
+        projection (Optional[Dict[str, List[str]]]): Payload fields to return
+        
+    Returns:
+        List[List[Dict]]: Results with id, payload and score for each query vector
+            (empty for None vectors), in input order
+        
+    Raises:
+        ValueError: If a vector dimension doesn't match expected dimension
+        UnsupportedFilterError: If the collection does not index every filtered field
+        Exception: If the Qdrant batch search fails
+    """
+    queries = [i for i, vector in enumerate(vectors) if vector is not None]
+    for i in queries:
+        if not validate_embedding_dimension(vectors[i], expected_dim):
+            raise ValueError(f"Vector dimension mismatch for {collection_name}: expected {expected_dim}, got {len(vectors[i])}")
+    
+    results = [[] for _ in vectors]
+    if not queries:
+        return results
+    
+    conditions = conditions_for(collection_name, filters)
+    
+    if _use_local_backend():
+        index = get_local_index(collection_name)
+        for i in queries:
+            results[i] = index.search(vectors[i], limit=limit, score_threshold=0.0, conditions=conditions)
+            for result in results[i]:
+                result["payload"] = _project_payload(result["payload"], projection)
+        logger.info(f"Batch of {len(queries)} queries searched in local index '{collection_name}'")
+        return results
+    
+    client = await _get_qdrant_client()
+    oversampling = os.getenv("SEARCH_OVERSAMPLING")
+    params = search_params(profile_for(collection_name), float(oversampling) if oversampling else None)
+    query_filter = build_filter(conditions)
+    
+    try:
+        batches = await client.search_batch(
+            collection_name=collection_name,
+            requests=[
+                SearchRequest(
+                    vector=vectors[i],
+                    filter=query_filter,
+                    params=params,
+                    limit=limit,
+                    with_payload=_payload_selector(projection),
+                    with_vector=False,
+                    score_threshold=0.0
+                )
+                for i in queries
+            ]
+        )
+    except Exception as e:
+        logger.error(f"Batch search failed for collection '{collection_name}': {str(e)}", exc_info=True)
+        raise
+    
+    for i, hits in zip(queries, batches):
+        results[i] = [{"id": hit.id, "payload": hit.payload, "score": float(hit.score)} for hit in hits]
+    logger.info(f"Batch of {len(queries)} queries searched in collection '{collection_name}'")
+    return results
+
+async def _search_modality(
+    modality: str,
+    embed_func: Callable[[Any], Optional[List[float]]],
+    query: Union[str, bytes],
+    collection_name: str,
+    expected_dim: int,
+    limit: int = 10,
+    filters: Optional[Dict[str, Any]] = None,
+    projection: Optional[Dict[str, List[str]]] = None
+) -> List[Dict]:
+    """
+    Run one modality pipeline end to end: embed the query, then search its collection.
+    
+    The embedding step is blocking model inference and runs on the shared inference
+    executor; the search itself is awaited on the async Qdrant client.
+    
+    Args:
+        modality (str): Modality name used in logs ("genes", "proteins" or "images")
+        embed_func (Callable): Embedding function for this modality
+        query (Union[str, bytes]): Text, image bytes or image path to embed
+        collection_name (str): Name of the collection to search
+        expected_dim (int): Expected vector dimension for validation
+        limit (int): Maximum number of results to return
+        filters (Optional[Dict[str, Any]]): Structured payload filters
+        projection (Optional[Dict[str, List[str]]]): Payload fields to return
+        
+    Returns:
+        List[Dict]: Search results, empty if the embedding could not be generated
+        
+    Raises:
+        InferenceSaturatedError: If the inference executor cannot accept more work
+        Exception: Propagates embedding or Qdrant failures to the caller
+    """
+    logger.info(f"Processing {modality} input")
+    vector = await get_inference_executor().run(embed_func, query)
+    if not vector:
+        logger.warning(f"Failed to generate {modality} embedding, skipping {collection_name} collection")
+        ERRORS.inc(stage="embed", modality=modality)
+        return []
+    
+    try:
+        with STAGE_LATENCY.time(stage="search", modality=modality):
+            results = await _search_collection(
+                collection_name=collection_name,
+                vector=vector,
+                expected_dim=expected_dim,
+                limit=limit,
+                filters=filters,
+                projection=projection
+            )
+    except Exception:
+        ERRORS.inc(stage="search", modality=modality)
+        raise
+    
+    SEARCH_HITS.inc(len(results), modality=modality)
+    return results
+
+async def _search_patients(
+    pipelines: Dict[str, tuple],
+    results: Dict[str, Any],
+    filters: Optional[Dict[str, Any]] = None,
+    limit: int = 10,
+    projection: Optional[Dict[str, List[str]]] = None
+) -> None:
+    """
+    Search the consolidated patient collection with one named vector per modality.
+    
+    All modality queries are sent in a single search_batch request, and the filter
+    applies to every modality since the patient payload carries all structured fields.
+    Fills the modality slots of results as search_all_collections does, plus a
+    "patients" slot ranking patients by their mean score over the matched modalities.
+    
+    Args:
+        pipelines (Dict[str, tuple]): Modality → (embed_func, query, collection_name, expected_dim)
+        results (Dict[str, Any]): Result dictionary to fill
+        filters (Optional[Dict[str, Any]]): Structured payload filters
+        limit (int): Maximum number of results per modality
+        projection (Optional[Dict[str, List[str]]]): Payload fields to return
+        
+    Raises:
+        InferenceSaturatedError: If the inference executor cannot accept more work
+    """
+    modalities = list(pipelines)
+    vectors = await asyncio.gather(
+        *(get_inference_executor().run(embed_func, query) for embed_func, query, _, _ in pipelines.values()),
+        return_exceptions=True
+    )
+    
+    for vector in vectors:
+        if isinstance(vector, InferenceSaturatedError):
+            raise vector
+    
+    query_filter = build_filter(conditions_for(PATIENT_COLLECTION, filters))
+    params = search_params(profile_for(PATIENT_COLLECTION))
+    requests = {}
+    for modality, vector in zip(modalities, vectors):
+        expected_dim = pipelines[modality][3]
+        if isinstance(vector, Exception):
+            logger.error(f"Embedding failed for {modality}: {str(vector)}", exc_info=vector)
+            ERRORS.inc(stage="embed", modality=modality)
+            results["errors"][modality] = str(vector)
+        elif not vector:
+            logger.warning(f"Failed to generate {modality} embedding, skipping {modality} vector")
+            ERRORS.inc(stage="embed", modality=modality)
+        elif not validate_embedding_dimension(vector, expected_dim):
+            results["errors"][modality] = f"Vector dimension mismatch for {modality}: expected {expected_dim}, got {len(vector)}"
+        else:
+            requests[modality] = SearchRequest(
+                vector=NamedVector(name=modality, vector=vector),
+                filter=query_filter,
+                params=params,
+                limit=limit,
+                with_payload=_payload_selector(projection),
+                with_vector=False,
+                score_threshold=0.0
+            )
+    
+    if not requests:
+        return
+    
+    client = await _get_qdrant_client()
+    try:
+        with STAGE_LATENCY.time(stage="search", modality="patients"):
+            batches = await client.search_batch(collection_name=PATIENT_COLLECTION, requests=list(requests.values()))
+    except Exception as e:
+        logger.error(f"Batch search failed for collection '{PATIENT_COLLECTION}': {str(e)}", exc_info=True)
+        for modality in requests:
+            ERRORS.inc(stage="search", modality=modality)
+            results["errors"][modality] = str(e)
+        return
+    
+    patients = {}
+    for modality, hits in zip(requests, batches):
+        SEARCH_HITS.inc(len(hits), modality=modality)
+        results[modality] = [
+            {"id": hit.id, "payload": hit.payload, "score": float(hit.score)}
+            for hit in hits
+        ]
+        for hit in hits:
+            patient = patients.setdefault(hit.id, {"id": hit.id, "payload": hit.payload, "scores": {}})
+            patient["scores"][modality] = float(hit.score)
+    
+    for patient in patients.values():
+        patient["score"] = sum(patient["scores"].values()) / len(patient["scores"])
+    results["patients"] = sorted(patients.values(), key=lambda patient: patient["score"], reverse=True)[:limit]
+    logger.info(f"Patient search matched {len(patients)} patients across {list(requests)}")
+
+def _collect_pipelines(
+    gene_text: str,
+    protein_text: str,
+    image: Optional[Union[bytes, str]]
+) -> Dict[str, tuple]:
+    """Modality → (embed_func, query, collection_name, expected_dim) for each input that was provided."""
+    pipelines = {}
+    if gene_text and gene_text.strip():
+        pipelines["genes"] = (embed_text_844, gene_text, "breast_cancer_genes_mutation", 844)
+    else:
+        logger.debug("No gene text provided, skipping genes collection")
+    
+    if protein_text and protein_text.strip():
+        pipelines["proteins"] = (embed_text_384, protein_text, "breast_cancer_protein_profiles", 384)
+    else:
+        logger.debug("No protein text provided, skipping proteins collection")
+    
+    if isinstance(image, (bytes, bytearray)) and image:
+        pipelines["images"] = (embed_image_512, bytes(image), "PathologyImage", 512)
+    elif isinstance(image, str) and image and os.path.exists(image):
+        pipelines["images"] = (embed_image_512, image, "PathologyImage", 512)
+    else:
+        if image:
+            logger.warning(f"Image path does not exist: {image}")
+        logger.debug("No valid image provided, skipping images collection")
+    
+    return pipelines
+
+async def iter_search_results(
     gene_text: str = "",
     protein_text: str = "",
-    image_path: str = ""
+    image: Optional[Union[bytes, str]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    role: Optional[str] = None
+) -> AsyncIterator[Tuple[str, List[Dict], Optional[Exception]]]:
+    """
+    Search the collections like search_all_collections, yielding each modality as soon as it completes.
+    
+    The modality pipelines run concurrently; outcomes are yielded in completion order,
+    so the first one arrives after the fastest modality rather than the slowest.
+    In SEARCH_MODE=patients all modalities come back from one search_batch request:
+    the fused "patients" outcome is yielded first, followed by each modality.
+    If the consumer stops iterating (e.g. the client disconnected), the pipelines
+    still running are cancelled. A modality whose collection cannot honour every
+    filtered field is not embedded nor searched: it is yielded first, with an
+    UnsupportedFilterError.
+    
+    Args:
+        gene_text (str): Genetic information text
+        protein_text (str): Protein biomarker text
+        image (Optional[Union[bytes, str]]): Encoded pathology report image bytes, or an image path
+        filters (Optional[Dict[str, Any]]): Structured payload filters
+        role (Optional[str]): "patient" or "doctor" to project payloads (PAYLOAD_PROJECTIONS)
+        
+    Yields:
+        Tuple[str, List[Dict], Optional[Exception]]: (modality, hits, error); hits is
+            empty and error is set when the modality pipeline failed or was skipped
+            
+    Raises:
+        InferenceSaturatedError: If the inference executor is saturated
+    """
+    pipelines = _collect_pipelines(gene_text, protein_text, image)
+    projection = PAYLOAD_PROJECTIONS.get(role)
+    
+    if not _use_patient_collection():
+        for modality, (_, _, collection_name, _) in list(pipelines.items()):
+            missing = unsupported_fields(collection_name, filters)
+            if missing:
+                logger.info(f"Skipping {modality}: '{collection_name}' does not index filter fields {missing}")
+                del pipelines[modality]
+                yield modality, [], UnsupportedFilterError(collection_name, missing)
+    
+    if _use_patient_collection():
+        results = {"genes": [], "proteins": [], "images": [], "errors": {}}
+        await _search_patients(pipelines, results, filters, projection=projection)
+        if "patients" in results:
+            yield "patients", results["patients"], None
+        for modality in pipelines:
+            error = results["errors"].get(modality)
+            yield modality, results[modality], RuntimeError(error) if error else None
+        return
+    
+    tasks = {
+        asyncio.ensure_future(
+            _search_modality(
+                modality, embed_func, query, collection_name, expected_dim,
+                filters=filters, projection=projection
+            )
+        ): modality
+        for modality, (embed_func, query, collection_name, expected_dim) in pipelines.items()
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Keep the input order among pipelines that finished together
+            done = sorted(done, key=lambda task: list(pipelines).index(tasks[task]))
+            errors = {task: task.exception() for task in done}
+            
+            # Saturation is a load-shedding signal for the whole request, not a modality failure
+            for error in errors.values():
+                if isinstance(error, InferenceSaturatedError):
+                    logger.warning(f"Rejecting search: {str(error)}")
+                    raise error
+            
+            for task in done:
+                modality, error = tasks[task], errors[task]
+                if error is not None:
+                    logger.error(f"Search pipeline failed for {modality}: {str(error)}", exc_info=error)
+                    yield modality, [], error
+                else:
+                    yield modality, task.result(), None
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def search_all_collections(
+    gene_text: str = "",
+    protein_text: str = "",
+    image: Optional[Union[bytes, str]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    role: Optional[str] = None
 ) -> Dict[str, List[Dict]]:
     """
-    Search all three Qdrant collections simultaneously based on provided inputs.
+    Search all three Qdrant collections concurrently based on provided inputs.
     
     This function intelligently routes inputs to the appropriate collections:
     - gene_text → breast_cancer_genes_mutation (844D)
     - protein_text → breast_cancer_protein_profiles (384D)
-    - image_path → PathologyImage (512D)
+    - image → PathologyImage (512D)
+    
+    Each modality pipeline (embedding + search) runs as its own task, so the overall
+    latency is bounded by the slowest modality rather than the sum of all three.
+    A failing modality only loses its own results: its error message is reported in
+    the "errors" slot and the other modalities are returned normally. A modality
+    whose collection does not index every filtered field is reported in the
+    "skipped" slot, without results.
     
     Args:
         gene_text (str): Genetic information text (e.g., "BRCA1 mutation")
         protein_text (str): Protein biomarker text (e.g., "ER positive, HER2 negative")
-        image_path (str): Path to pathology report image file
+        image (Optional[Union[bytes, str]]): Encoded pathology report image bytes
+            (decoded in memory), or a path to an image file
+        filters (Optional[Dict[str, Any]]): Structured payload filters, e.g.
+            {"pam50_subtype": "Luminal A", "gene_mutations.BRCA1": True}
+        role (Optional[str]): "patient" or "doctor" to return only the payload fields
+            that role uses (PAYLOAD_PROJECTIONS), or None for full payloads
         
     Returns:
         Dict[str, List[Dict]]: Dictionary containing results from all collections:
             {
                 "genes": [...],      # Results from breast_cancer_genes_mutation
                 "proteins": [...],   # Results from breast_cancer_protein_profiles  
-                "images": [...]      # Results from PathologyImage
+                "images": [...],     # Results from PathologyImage
+                "errors": {...},     # Modality name → error message for failed pipelines
+                "skipped": {...},    # Modality name → reason, for collections that cannot apply the filters
+                "patients": [...]    # SEARCH_MODE=patients only: patients fused across modalities
             }
             
+    Raises:
+        InferenceSaturatedError: If the inference executor is saturated, so the API
+            can shed load instead of returning partial results
+            
     Example:
-        >>> results = search_all_collections(
+        >>> results = await search_all_collections(
         ...     gene_text="BRCA1 mutation",
         ...     protein_text="ER positive",
-        ...     image_path="/tmp/report.jpg"
+        ...     image=uploaded_bytes
         ... )
         >>> len(results["genes"])  # Number of gene matches
         >>> len(results["proteins"])  # Number of protein matches
         >>> len(results["images"])  # Number of image matches
     """
     logger.info("Starting multi-collection search")
-    logger.debug(f"Inputs - gene_text: {bool(gene_text)}, protein_text: {bool(protein_text)}, image_path: {bool(image_path)}")
+    logger.debug(f"Inputs - gene_text: {bool(gene_text)}, protein_text: {bool(protein_text)}, image: {bool(image)}")
     
     results = {
         "genes": [],
         "proteins": [],
-        "images": []
+        "images": [],
+        "errors": {},
+        "skipped": {}
     }
     
-    try:
-        # 1. Search genes collection (844D)
-        if gene_text and gene_text.strip():
-            logger.info("Processing gene text input")
-            gene_vector = embed_text_844(gene_text)
-            if gene_vector:
-                results["genes"] = _search_collection(
-                    collection_name="breast_cancer_genes_mutation",
-                    vector=gene_vector,
-                    expected_dim=844,
-                    limit=10
-                )
-            else:
-                logger.warning("Failed to generate gene embedding, skipping genes collection")
-        else:
-            logger.debug("No gene text provided, skipping genes collection")
-        
-        # 2. Search proteins collection (384D)
-        if protein_text and protein_text.strip():
-            logger.info("Processing protein text input")
-            protein_vector = embed_text_384(protein_text)
-            if protein_vector:
-                results["proteins"] = _search_collection(
-                    collection_name="breast_cancer_protein_profiles",
-                    vector=protein_vector,
-                    expected_dim=384,
-                    limit=10
-                )
-            else:
-                logger.warning("Failed to generate protein embedding, skipping proteins collection")
+    # Each modality fills its own result/error slot as it completes
+    async for modality, hits, error in iter_search_results(gene_text, protein_text, image, filters, role=role):
+        if isinstance(error, UnsupportedFilterError):
+            results["skipped"][modality] = str(error)
+        elif error is not None:
+            results["errors"][modality] = str(error)
         else:
-            logger.debug("No protein text provided, skipping proteins collection")
-        
-        # 3. Search pathology images collection (512D)
-        if image_path and os.path.exists(image_path):
-            logger.info(f"Processing image input: {image_path}")
-            image_vector = embed_image_512(image_path)
-            if image_vector:
-                results["images"] = _search_collection(
-                    collection_name="PathologyImage",
-                    vector=image_vector,
-                    expected_dim=512,
-                    limit=10
-                )
-            else:
-                logger.warning("Failed to generate image embedding, skipping images collection")
-        else:
-            if image_path:
-                logger.warning(f"Image path does not exist: {image_path}")
-            logger.debug("No valid image path provided, skipping images collection")
+            results[modality] = hits
+    
+    # Log final results summary
+    total_results = len(results["genes"]) + len(results["proteins"]) + len(results["images"])
+    logger.info(f"Multi-collection search completed. Total results: {total_results} "
+               f"(genes: {len(results['genes'])}, proteins: {len(results['proteins'])}, images: {len(results['images'])}, "
+               f"failed: {list(results['errors'])}, skipped: {list(results['skipped'])})")
+    
+    return results
+
+def _parse_point_id(case_id: str) -> Union[int, str]:
+    """Point IDs are unsigned integers or UUID strings."""
+    return int(case_id) if case_id.isdigit() else case_id
+
+async def get_case(modality: str, case_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch the full payload of one case, including the fields left out of search results.
+    
+    Args:
+        modality (str): "genes", "proteins", "images", or "patients" for the
+            consolidated patient collection
+        case_id (str): Point ID as returned in search results
         
-        # Log final results summary
-        total_results = len(results["genes"]) + len(results["proteins"]) + len(results["images"])
-        logger.info(f"Multi-collection search completed. Total results: {total_results} "
-                   f"(genes: {len(results['genes'])}, proteins: {len(results['proteins'])}, images: {len(results['images'])})")
+    Returns:
+        Optional[Dict[str, Any]]: Case with id, modality and full payload, or None if not found
         
-        return results
+    Raises:
+        ValueError: If the modality is unknown
+    """
+    if modality == "patients":
+        collection_name = PATIENT_COLLECTION
+    elif modality in COLLECTION_NAMES:
+        collection_name = COLLECTION_NAMES[modality]
+    else:
+        raise ValueError(f"Unknown modality '{modality}'. Expected one of {list(COLLECTION_NAMES) + ['patients']}")
+    
+    point_id = _parse_point_id(case_id)
+    if _use_local_backend():
+        payload = get_local_index(collection_name).get(point_id)
+        return None if payload is None else {"id": point_id, "modality": modality, "payload": payload}
+    
+    client = await _get_qdrant_client()
+    points = await client.retrieve(collection_name=collection_name, ids=[point_id], with_payload=True, with_vectors=False)
+    if not points:
+        return None
+    return {"id": points[0].id, "modality": modality, "payload": points[0].payload}
+
+async def _fetch_ingestion_stamps(client: AsyncQdrantClient, names: List[str]) -> Dict[str, str]:
+    """Read the ingestion stamps of collections (see qdrant_common.ingestion_stamps)."""
+    try:
+        points = await client.retrieve(
+            collection_name=STAMP_COLLECTION,
+            ids=[stamp_point_id(name) for name in names],
+            with_payload=True,
+            with_vectors=False
+        )
+    except UnexpectedResponse as e:
+        # No ingestion has stamped a collection yet (REST transport)
+        if e.status_code == 404:
+            return {}
+        raise
+    except grpc.RpcError as e:
+        # Same over gRPC (QDRANT_PREFER_GRPC)
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            return {}
+        raise
+    return {point.payload["collection"]: point.payload["stamp"] for point in points}
+
+async def get_collection_versions() -> Dict[str, str]:
+    """
+    Get a version token for each searched collection.
+    
+    A token is the collection's alias target and its ingestion stamp, which the
+    ingestion scripts bump after every refresh or rebuild (see
+    qdrant_common.ingestion_stamps), so it changes whenever a collection is
+    re-ingested, in place or into a new generation, or rolled back (see
+    qdrant_common.aliases). It can therefore be folded into cache keys to invalidate
+    cached search responses automatically. Tokens are refreshed at most every
+    COLLECTION_VERSION_TTL_SECONDS seconds (default 5) to keep this off the hot path.
+    A collection never stamped gets the stamp "unstamped"; when the stamps cannot be
+    read, every token is "unavailable".
+    
+    Returns:
+        Dict[str, str]: Collection name → version token
+    """
+    global _collection_versions
+    
+    ttl = float(os.getenv("COLLECTION_VERSION_TTL_SECONDS", "5"))
+    now = asyncio.get_running_loop().time()
+    if _collection_versions is not None and now - _collection_versions[0] < ttl:
+        return _collection_versions[1]
+    
+    async with _collection_versions_lock:
+        if _collection_versions is not None and now - _collection_versions[0] < ttl:
+            return _collection_versions[1]
         
-    except Exception as e:
-        logger.error(f"Multi-collection search failed: {str(e)}", exc_info=True)
-        # Return empty results on failure to maintain API contract
-        return {"genes": [], "proteins": [], "images": []}
+        names = [PATIENT_COLLECTION] if _use_patient_collection() else list(COLLECTION_NAMES.values())
+        if _use_local_backend():
+            tokens = [index_version(name) for name in names]
+        else:
+            client = await _get_qdrant_client()
+            try:
+                targets = {alias.alias_name: alias.collection_name for alias in (await client.get_aliases()).aliases}
+            except Exception as e:
+                logger.warning(f"Could not read collection aliases: {str(e)}")
+                targets = {}
+            try:
+                stamps = await _fetch_ingestion_stamps(client, names)
+                tokens = [f"{targets.get(name, name)}:{stamps.get(name, 'unstamped')}" for name in names]
+            except Exception as e:
+                logger.warning(f"Could not read ingestion stamps: {str(e)}")
+                tokens = ["unavailable"] * len(names)
+        versions = dict(zip(names, tokens))
+        _collection_versions = (asyncio.get_running_loop().time(), versions)
+        logger.debug(f"Collection versions refreshed: {versions}")
+        return versions
 
-def get_collection_info() -> Dict[str, Dict]:
+async def get_collection_info() -> Dict[str, Dict]:
     """
     Get information about all configured collections.
     
     Returns:
         Dict[str, Dict]: Collection information including vector dimensions and status
     """
-    client = _get_qdrant_client()
     collections_info = {}
     
     expected_collections = {
@@ -251,9 +864,31 @@ def get_collection_info() -> Dict[str, Dict]:
         "PathologyImage": 512
     }
     
+    if _use_local_backend():
+        for collection_name, expected_dim in expected_collections.items():
+            try:
+                index = get_local_index(collection_name)
+                collections_info[collection_name] = {
+                    "exists": True,
+                    "vector_size": index.dim,
+                    "distance": "Cosine",
+                    "points_count": len(index),
+                    "index_kind": index.kind,
+                    "expected_dim": expected_dim,
+                    "dimension_match": index.dim == expected_dim
+                }
+            except Exception as e:
+                collections_info[collection_name] = {
+                    "exists": False,
+                    "error": str(e),
+                    "expected_dim": expected_dim
+                }
+        return collections_info
+    
+    client = await _get_qdrant_client()
     for collection_name, expected_dim in expected_collections.items():
         try:
-            collection_info = client.get_collection(collection_name)
+            collection_info = await client.get_collection(collection_name)
             collections_info[collection_name] = {
                 "exists": True,
                 "vector_size": collection_info.config.params.vectors.size,
@@ -270,16 +905,22 @@ def get_collection_info() -> Dict[str, Dict]:
     
     return collections_info
 
-def health_check() -> bool:
+async def health_check() -> bool:
     """
     Perform a health check on the Qdrant connection.
     
+    With SEARCH_BACKEND=local, checks that every local index can be loaded instead.
+    
     Returns:
         bool: True if connection is healthy, False otherwise
     """
     try:
-        client = _get_qdrant_client()
-        client.get_collections()
+        if _use_local_backend():
+            for collection_name in COLLECTION_NAMES.values():
+                get_local_index(collection_name)
+            return True
+        client = await _get_qdrant_client()
+        await client.get_collections()
         return True
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
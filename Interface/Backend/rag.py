@@ -8,6 +8,17 @@ This module processes results from three distinct collections:
 - breast_cancer_protein_profiles: Contains French clinical text in 'chunk_text' field  
 - PathologyImage: Contains structured JSON with direct 'cancer' boolean field
 
+Points ingested by the current pipelines also carry typed biomarker labels
+(cancer_confirmed, er_positive, pr_positive, her2_positive, ki67_high,
+brca1_mutated, brca2_mutated) computed once at ingestion. They are read directly;
+text parsing is only a fallback for legacy points that have none of these labels.
+
+Text parsing goes through a single precompiled scanner: all cancer-keyword,
+biomarker and mutation patterns are combined into one regular expression, so each
+text is read once and every flag is returned at the same time. Scan results are
+memoized per text (SCAN_CACHE_SIZE, default 4096), since the same historical cases
+come back across requests.
+
 All outputs are designed to be:
 - Non-diagnostic (no probabilities or medical advice)
 - Explainable (based on actual similar cases)
@@ -15,23 +26,147 @@ All outputs are designed to be:
 - Multilingual (handles French clinical terminology)
 """
 
+import os
 import logging
 import re
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from functools import lru_cache
+from typing import List, Dict, Any, FrozenSet, Optional, Tuple
+from qdrant_common.payload_indexes import BIOMARKER_FIELDS
+from .metrics import STAGE_LATENCY
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Patterns matched against lowercased payload text, grouped by the flag they raise.
+# Every pattern starts with a literal character, and patterns of different flags never
+# match at the same position, so the combined scanner reports exactly the flags that
+# separate re.search calls would.
+SCAN_PATTERNS = {
+    # Cancer-related terms and confirmation terms (both needed to count a case)
+    "cancer_term": [re.escape(k) for k in ['cancer', 'carcinome', 'tumeur maligne', 'néoplasie', 'malignant']],
+    "cancer_confirmation": [re.escape(k) for k in ['infiltrant', 'invasif', 'confirmé', 'confirmed']],
+    # Protein biomarkers (French, English and abbreviations)
+    "er_positive": [
+        r'er\s*\+', r'er\s*positif', r'er\s*positive',
+        r'récepteur\s*œstrogène\s*positif', r'estrogen\s*receptor\s*positive',
+        r'œstrogène\s*positif', r'oestrogen\s*receptor\s*positive'
+    ],
+    "pr_positive": [
+        r'pr\s*\+', r'pr\s*positif', r'pr\s*positive',
+        r'récepteur\s*progestérone\s*positif', r'progesterone\s*receptor\s*positive',
+        r'progestérone\s*positif'
+    ],
+    "her2_positive": [
+        r'her2\s*\+', r'her-2\s*\+', r'her2\s*positif', r'her-2\s*positif',
+        r'her2\s*positive', r'her-2\s*positive',
+        r'human\s*epidermal\s*growth\s*factor\s*receptor\s*2\s*positive'
+    ],
+    "ki67": [r'ki67', r'ki-67', r'k.i.67'],
+    "ki67_high": [
+        r'élevé', r'high', r'fort', r'élevée', r'highly', r'grade\s*[23]', r'grade\s*ii', r'grade\s*iii'
+    ],
+    # Genes and mutation indicators
+    "brca1": [r'brca1', r'breast\s*cancer\s*1'],
+    "brca2": [r'brca2', r'breast\s*cancer\s*2'],
+    "mutation": [re.escape(k) for k in [
+        'mutation', 'mutated', 'muté', 'positif', 'positive',
+        'anormal', 'abnormal', 'défectueux', 'defective'
+    ]]
+}
+
+def _compile_scanner(patterns: Dict[str, List[str]]) -> Tuple["re.Pattern", List[Optional[str]]]:
+    """
+    Compile flag patterns into one alternation factored by first character.
+    
+    Each pattern becomes "<first char>(<rest>)": the leading literals let the regex
+    engine skip non-matching branches and positions cheaply, and the index of the
+    capture group that matched maps back to the flag.
+    
+    Args:
+        patterns (Dict[str, List[str]]): Flag → regular expressions
+        
+    Returns:
+        Tuple[re.Pattern, List[Optional[str]]]: Compiled scanner and group index → flag
+    """
+    branches = defaultdict(list)
+    for flag, flag_patterns in patterns.items():
+        for pattern in flag_patterns:
+            split = 2 if pattern.startswith("\\") else 1
+            branches[pattern[:split]].append((pattern[split:], flag))
+    
+    group_flags = [None]
+    alternatives = []
+    for first, rests in branches.items():
+        alternatives.append(first + "(?:" + "|".join(f"({rest})" for rest, _ in rests) + ")")
+        group_flags.extend(flag for _, flag in rests)
+    return re.compile("|".join(alternatives)), group_flags
+
+_TEXT_SCANNER, _TEXT_SCANNER_FLAGS = _compile_scanner(SCAN_PATTERNS)
+_GENE_SCANNER, _GENE_SCANNER_FLAGS = _compile_scanner({flag: SCAN_PATTERNS[flag] for flag in ("brca1", "brca2")})
+
+def _scan(scanner: "re.Pattern", group_flags: List[Optional[str]], text: str) -> FrozenSet[str]:
+    """Collect the flags of every pattern occurring in text, including overlapping matches."""
+    found = set()
+    search = scanner.search
+    match = search(text)
+    while match is not None:
+        found.add(group_flags[match.lastindex])
+        # Resume right after the match start so overlapping patterns are still seen
+        match = search(text, match.start() + 1)
+    return frozenset(found)
+
+@lru_cache(maxsize=int(os.getenv("SCAN_CACHE_SIZE", "4096")))
+def scan_text(text: str) -> FrozenSet[str]:
+    """
+    Scan a payload text once and return every flag whose pattern it contains.
+    
+    Args:
+        text (str): Payload text (Text or chunk_text), in any case
+        
+    Returns:
+        FrozenSet[str]: Flags from SCAN_PATTERNS found in the text
+        
+    Example:
+        >>> sorted(scan_text("Carcinome infiltrant, HER2 positif, Ki-67 élevé"))
+        ['cancer_confirmation', 'cancer_term', 'her2_positive', 'ki67', 'ki67_high', 'mutation']
+    """
+    return _scan(_TEXT_SCANNER, _TEXT_SCANNER_FLAGS, text.lower())
+
+def has_typed_labels(payload: Dict[str, Any]) -> bool:
+    """
+    Check whether a payload carries the typed biomarker labels computed at ingestion.
+    
+    Args:
+        payload (Dict[str, Any]): Point payload
+        
+    Returns:
+        bool: True if at least one typed label is present (the point is not legacy)
+    """
+    return any(isinstance(payload.get(field), bool) for field in BIOMARKER_FIELDS)
+
 def count_cancer_cases(cases: List[Dict[str, Any]]) -> int:
     """
     Count confirmed cancer cases across all three collection types.
     
     This function handles the different payload structures:
+    - Typed 'cancer_confirmed' label computed at ingestion (all current points)
     - PathologyImage: Direct 'cancer' boolean field
     - Genes collection: 'Text' field containing cancer-related terms
     - Proteins collection: 'chunk_text' field with French clinical descriptions
     
+    The typed label means a confirmed invasive cancer:
+    - PathologyImage: the structured 'cancer' field
+    - Genes: always False, a mutation profile carries no diagnosis
+    - Proteins: the detailed cancer type is an invasive carcinoma; in situ types
+      (DCIS, non-invasive) and "Unknown" are not counted
+    On TCGA-BRCA every protein profile is an "Invasive Breast Carcinoma", so every
+    labelled protein hit counts. The keyword rule kept for legacy points only counted
+    8 of the 825 protein chunks: "cancer" is in every chunk (the "Cancer Type" line),
+    and the only confirmation term it ever found was "invasif" in the Normal-like
+    PAM50 description ("rare dans les cancers invasifs"), not the diagnosis itself.
+    
     Args:
         cases (List[Dict[str, Any]]): List of search results from Qdrant
         
@@ -39,6 +174,7 @@ def count_cancer_cases(cases: List[Dict[str, Any]]) -> int:
         int: Number of cases with confirmed cancer
         
     Examples:
+        >>> case0 = {"payload": {"cancer_confirmed": True}}  # Typed label
         >>> case1 = {"payload": {"cancer": True}}  # PathologyImage
         >>> case2 = {"payload": {"Text": "Patient with invasive ductal carcinoma confirmed"}}
         >>> case3 = {"payload": {"chunk_text": "Cancer confirmé: carcinome canalaire infiltrant"}}
@@ -49,36 +185,33 @@ def count_cancer_cases(cases: List[Dict[str, Any]]) -> int:
         return 0
         
     count = 0
-    cancer_keywords = [
-        'cancer', 'carcinome', 'tumeur maligne', 'néoplasie', 
-        'malignant', 'infiltrant', 'invasif', 'confirmé', 'confirmed'
-    ]
     
     for case in cases:
         try:
             payload = case.get("payload", {})
             
+            # Typed label computed at ingestion
+            if has_typed_labels(payload):
+                if payload.get("cancer_confirmed") is True:
+                    count += 1
+                continue
+            
             # PathologyImage collection: direct boolean field
             if "cancer" in payload and payload["cancer"] is True:
                 count += 1
                 continue
                 
-            # Genes collection: check 'Text' field
+            # Genes collection: check 'Text' field for cancer terms AND confirmation terms
             if "Text" in payload and isinstance(payload["Text"], str):
-                text_lower = payload["Text"].lower()
-                # Check for cancer keywords AND confirmation terms
-                has_cancer = any(keyword in text_lower for keyword in cancer_keywords[:5])  # cancer-related terms
-                has_confirmation = any(keyword in text_lower for keyword in cancer_keywords[5:])  # confirmation terms
-                if has_cancer and has_confirmation:
+                flags = scan_text(payload["Text"])
+                if "cancer_term" in flags and "cancer_confirmation" in flags:
                     count += 1
                     continue
                     
             # Proteins collection: check 'chunk_text' field (French)
             if "chunk_text" in payload and isinstance(payload["chunk_text"], str):
-                text_lower = payload["chunk_text"].lower()
-                has_cancer = any(keyword in text_lower for keyword in cancer_keywords[:5])
-                has_confirmation = any(keyword in text_lower for keyword in cancer_keywords[5:])
-                if has_cancer and has_confirmation:
+                flags = scan_text(payload["chunk_text"])
+                if "cancer_term" in flags and "cancer_confirmation" in flags:
                     count += 1
                     
         except Exception as e:
@@ -88,6 +221,25 @@ def count_cancer_cases(cases: List[Dict[str, Any]]) -> int:
     logger.info(f"Cancer case count: {count} out of {len(cases)} total cases")
     return count
 
+def risk_level(total_cases: int, cancer_count: int) -> str:
+    """
+    Qualitative risk level shown to patients, from the share of similar cases with confirmed cancer.
+    
+    Args:
+        total_cases (int): Number of similar cases found
+        cancer_count (int): Number of those cases with confirmed cancer
+        
+    Returns:
+        str: "Inconnu" (no similar case), "Faible", "Modéré" or "Élevé" (at least half confirmed)
+    """
+    if total_cases == 0:
+        return "Inconnu"
+    if cancer_count == 0:
+        return "Faible"
+    if cancer_count / total_cases >= 0.5:
+        return "Élevé"
+    return "Modéré"
+
 def extract_protein_biomarkers(protein_cases: List[Dict[str, Any]]) -> Dict[str, int]:
     """
     Extract protein biomarker status from protein_profiles collection.
@@ -109,8 +261,11 @@ def extract_protein_biomarkers(protein_cases: List[Dict[str, Any]]) -> Dict[str,
     Returns:
         Dict[str, int]: Counts of positive biomarker cases
         
+    Typed er_positive / pr_positive / her2_positive / ki67_high labels are used when
+    present; a missing label on a labelled point counts as not positive.
+        
     Example:
-        >>> cases = [{"payload": {"chunk_text": "ER Status: Positive → Récepteur œstrogène présent"}}]
+        >>> cases = [{"payload": {"er_positive": True, "pr_positive": False, "her2_positive": False}}]
         >>> extract_protein_biomarkers(cases)
         {'er_positive': 1, 'pr_positive': 0, 'her2_positive': 0, 'ki67_high': 0}
     """
@@ -120,58 +275,29 @@ def extract_protein_biomarkers(protein_cases: List[Dict[str, Any]]) -> Dict[str,
     # Initialize counters
     er_positive = pr_positive = her2_positive = ki67_high = 0
     
-    # Define comprehensive biomarker patterns
-    er_patterns = [
-        r'er\s*\+', r'er\s*positif', r'er\s*positive',
-        r'récepteur\s*œstrogène\s*positif', r'estrogen\s*receptor\s*positive',
-        r'œstrogène\s*positif', r'oestrogen\s*receptor\s*positive'
-    ]
-    
-    pr_patterns = [
-        r'pr\s*\+', r'pr\s*positif', r'pr\s*positive',
-        r'récepteur\s*progestérone\s*positif', r'progesterone\s*receptor\s*positive',
-        r'progestérone\s*positif'
-    ]
-    
-    her2_patterns = [
-        r'her2\s*\+', r'her-2\s*\+', r'her2\s*positif', r'her-2\s*positif',
-        r'her2\s*positive', r'her-2\s*positive',
-        r'human\s*epidermal\s*growth\s*factor\s*receptor\s*2\s*positive'
-    ]
-    
-    ki67_patterns = [
-        r'ki67', r'ki-67', r'k.i.67'
-    ]
-    ki67_high_indicators = [
-        r'élevé', r'high', r'fort', r'élevée', r'highly', r'grade\s*[23]', r'grade\s*ii', r'grade\s*iii'
-    ]
-    
     for case in protein_cases:
         try:
             payload = case.get("payload", {})
+            
+            # Typed labels computed at ingestion
+            if has_typed_labels(payload):
+                er_positive += payload.get("er_positive") is True
+                pr_positive += payload.get("pr_positive") is True
+                her2_positive += payload.get("her2_positive") is True
+                ki67_high += payload.get("ki67_high") is True
+                continue
+            
+            # Legacy points: parse the French clinical text
             text = payload.get("chunk_text", "")
             if not isinstance(text, str):
                 continue
                 
-            text_lower = text.lower()
-            
-            # ER detection
-            if any(re.search(pattern, text_lower) for pattern in er_patterns):
-                er_positive += 1
-                
-            # PR detection  
-            if any(re.search(pattern, text_lower) for pattern in pr_patterns):
-                pr_positive += 1
-                
-            # HER2 detection
-            if any(re.search(pattern, text_lower) for pattern in her2_patterns):
-                her2_positive += 1
-                
-            # Ki67 detection (requires both Ki67 mention AND high indicator)
-            has_ki67 = any(re.search(pattern, text_lower) for pattern in ki67_patterns)
-            has_high_indicator = any(re.search(pattern, text_lower) for pattern in ki67_high_indicators)
-            if has_ki67 and has_high_indicator:
-                ki67_high += 1
+            flags = scan_text(text)
+            er_positive += "er_positive" in flags
+            pr_positive += "pr_positive" in flags
+            her2_positive += "her2_positive" in flags
+            # Ki67 requires both a Ki67 mention AND a high indicator
+            ki67_high += "ki67" in flags and "ki67_high" in flags
                 
         except Exception as e:
             logger.warning(f"Error extracting protein biomarkers from case: {str(e)}")
@@ -192,7 +318,8 @@ def extract_gene_mutations(gene_cases: List[Dict[str, Any]]) -> Dict[str, int]:
     Extract BRCA1/BRCA2 mutation status from genes_mutation collection.
     
     Handles multiple data sources within the payload:
-    - 'Text' field: Natural language descriptions
+    - Typed 'brca1_mutated' / 'brca2_mutated' labels computed at ingestion
+    - 'Text' field: Natural language descriptions (legacy points)
     - 'DNA' field: Array of gene names/mutations
     
     Args:
@@ -211,43 +338,35 @@ def extract_gene_mutations(gene_cases: List[Dict[str, Any]]) -> Dict[str, int]:
     
     brca1_mutated = brca2_mutated = 0
     
-    # BRCA detection patterns
-    brca1_patterns = [r'brca1', r'breast\s*cancer\s*1']
-    brca2_patterns = [r'brca2', r'breast\s*cancer\s*2']
-    
-    mutation_indicators = [
-        'mutation', 'mutated', 'muté', 'positif', 'positive', 
-        'anormal', 'abnormal', 'défectueux', 'defective'
-    ]
-    
     for case in gene_cases:
         try:
             payload = case.get("payload", {})
             
-            # Check Text field
+            # Typed labels computed at ingestion
+            if has_typed_labels(payload):
+                brca1_mutated += payload.get("brca1_mutated") is True
+                brca2_mutated += payload.get("brca2_mutated") is True
+                continue
+            
+            # Check Text field (gene name AND mutation indicator)
             text = payload.get("Text", "")
             if isinstance(text, str):
-                text_lower = text.lower()
-                
-                # BRCA1 detection
-                has_brca1 = any(re.search(pattern, text_lower) for pattern in brca1_patterns)
-                has_mutation = any(indicator in text_lower for indicator in mutation_indicators)
-                if has_brca1 and has_mutation:
-                    brca1_mutated += 1
-                    
-                # BRCA2 detection  
-                has_brca2 = any(re.search(pattern, text_lower) for pattern in brca2_patterns)
-                if has_brca2 and has_mutation:
-                    brca2_mutated += 1
+                flags = scan_text(text)
+                if "mutation" in flags:
+                    brca1_mutated += "brca1" in flags
+                    brca2_mutated += "brca2" in flags
             
-            # Check DNA array
+            # Check DNA array item by item with the gene-name scanner (no joined copy, no cache:
+            # sequences are long and rarely repeat)
             dna_array = payload.get("DNA", [])
             if isinstance(dna_array, list):
-                dna_str = " ".join(str(item) for item in dna_array).lower()
-                if any(re.search(pattern, dna_str) for pattern in brca1_patterns):
-                    brca1_mutated += 1
-                if any(re.search(pattern, dna_str) for pattern in brca2_patterns):
-                    brca2_mutated += 1
+                dna_flags = set()
+                for item in dna_array:
+                    dna_flags |= _scan(_GENE_SCANNER, _GENE_SCANNER_FLAGS, str(item).lower())
+                    if len(dna_flags) == 2:
+                        break
+                brca1_mutated += "brca1" in dna_flags
+                brca2_mutated += "brca2" in dna_flags
                     
         except Exception as e:
             logger.warning(f"Error extracting gene mutations from case: {str(e)}")
@@ -261,6 +380,7 @@ def extract_gene_mutations(gene_cases: List[Dict[str, Any]]) -> Dict[str, int]:
     logger.info(f"Gene mutation extraction: {result}")
     return result
 
+@STAGE_LATENCY.timed(stage="summarize_patient", modality="all")
 def summarize_for_patient(all_cases: List[Dict[str, Any]]) -> str:
     """
     Generate patient-friendly summary with ethical compliance.
@@ -297,10 +417,12 @@ def summarize_for_patient(all_cases: List[Dict[str, Any]]) -> str:
     else:
         return f"{base_message}, {cancer_count} ont eu un cancer confirmé."
 
+@STAGE_LATENCY.timed(stage="summarize_doctor", modality="all")
 def summarize_for_doctor(
     gene_cases: List[Dict[str, Any]], 
     protein_cases: List[Dict[str, Any]], 
-    image_cases: List[Dict[str, Any]]
+    image_cases: List[Dict[str, Any]],
+    all_cases: Optional[List[Dict[str, Any]]] = None
 ) -> str:
     """
     Generate detailed clinical summary for medical professionals.
@@ -316,6 +438,9 @@ def summarize_for_doctor(
         gene_cases (List[Dict[str, Any]]): Gene collection results
         protein_cases (List[Dict[str, Any]]): Protein collection results  
         image_cases (List[Dict[str, Any]]): Pathology image results
+        all_cases (Optional[List[Dict[str, Any]]]): Distinct cases behind the totals and
+            the cancer count, default the three lists concatenated (the patient
+            collection returns the same patient in several lists)
         
     Returns:
         str: Comprehensive clinical summary with recommendations
@@ -328,7 +453,8 @@ def summarize_for_doctor(
         
         Recommandation clinique : Considérer une IRM mammaire pour évaluation complète..."
     """
-    all_cases = gene_cases + protein_cases + image_cases
+    if all_cases is None:
+        all_cases = gene_cases + protein_cases + image_cases
     total_cases = len(all_cases)
     
     if total_cases == 0:
@@ -0,0 +1,281 @@
+# backend/screening.py
+"""
+Batch screening module for Tawhida RAG system.
+Runs a whole cohort through the /search patient risk assessment in a few large batches.
+
+Patient records use the columns written by the preprocessing scripts, and a record
+may carry either modality or both:
+- Proteine_Mutation/preprocessing.py: patient_id, sample_id, er_status, pr_status,
+  her2_status, rppa_cluster, tumor_stage, pam50_subtype, cancer_type_detailed
+- Gene_Mutation/preprocessing.py: Patient_ID, Sample_ID, Mutations, Mutation_Count,
+  FGA, Pathways
+
+Files are read as JSONL (one patient object per line), a JSON list (e.g.
+patients_cleaned.json) or CSV (one patient per row; Mutations and Pathways as JSON
+strings). Each record is rendered into the same texts that were embedded at
+ingestion (generate_chunk for proteins, chunk_patients for genes), so queries and
+stored chunks share one format. render_queries() renders the whole cohort before
+the response starts streaming, so a malformed record is rejected with its row
+number instead of cutting the stream short.
+
+Records are processed SCREENING_BATCH_SIZE at a time (default 64): one batched
+embedding job per modality on the inference executor, then one search_batch request
+per collection, so throughput grows with the batch size rather than with the number
+of HTTP requests. Screening always searches the modality collections; a collection
+that does not index every filtered field is not searched, and every row reports it
+under "skipped".
+"""
+
+import os
+import csv
+import io
+import json
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from .embedding import embed_texts_384, embed_texts_844
+from .inference import get_inference_executor, InferenceSaturatedError
+from .metrics import ERRORS, SEARCH_HITS, STAGE_LATENCY
+from .qdrant_service import PAYLOAD_PROJECTIONS, search_collection_batch
+from qdrant_common.payload_indexes import UnsupportedFilterError, unsupported_fields
+from .rag import count_cancer_cases, risk_level
+from Gene_Mutation.chunking import chunk_patients
+from Proteine_Mutation.chunking import generate_chunk
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCREENING_BATCH_SIZE = int(os.getenv("SCREENING_BATCH_SIZE", "64"))
+
+# Embedding jobs rejected by a saturated executor are retried with exponential backoff
+SCREENING_MAX_RETRIES = int(os.getenv("SCREENING_MAX_RETRIES", "5"))
+SCREENING_RETRY_DELAY_SECONDS = float(os.getenv("SCREENING_RETRY_DELAY_SECONDS", "0.5"))
+
+# Columns of protein_cleaned.csv used by generate_chunk
+PROTEIN_COLUMNS = [
+    "er_status", "pr_status", "her2_status", "rppa_cluster",
+    "tumor_stage", "pam50_subtype", "cancer_type_detailed"
+]
+
+def read_patient_records(data: bytes, filename: str = "") -> List[Dict[str, Any]]:
+    """
+    Parse an uploaded cohort file into patient records.
+
+    Args:
+        data (bytes): File content (UTF-8)
+        filename (str): Original file name; ".jsonl" / ".json" select JSON parsing,
+            anything else is read as CSV (comma, semicolon or tab separated)
+
+    Returns:
+        List[Dict[str, Any]]: One record per patient
+
+    Raises:
+        ValueError: If the file cannot be decoded or parsed
+    """
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        raise ValueError(f"Patient file must be UTF-8 encoded: {str(e)}")
+
+    name = filename.lower()
+    try:
+        if name.endswith(".jsonl") or name.endswith(".ndjson"):
+            records = [json.loads(line) for line in text.splitlines() if line.strip()]
+        elif name.endswith(".json"):
+            records = json.loads(text)
+        else:
+            sample = text[:4096]
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            records = list(csv.DictReader(io.StringIO(text), dialect=dialect))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in patient file: {str(e)}")
+
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ValueError("Patient file must contain one JSON object or CSV row per patient")
+    return records
+
+def _patient_id(record: Dict[str, Any]) -> Optional[str]:
+    return record.get("patient_id") or record.get("Patient_ID")
+
+def _json_field(value: Any) -> List:
+    """Lists stored as JSON strings in CSV cells."""
+    if isinstance(value, str):
+        return json.loads(value) if value.strip() else []
+    return value or []
+
+def protein_query_text(record: Dict[str, Any]) -> str:
+    """
+    Render the protein chunk of a record, or "" if it has no protein columns.
+
+    Args:
+        record (Dict[str, Any]): Patient record
+
+    Returns:
+        str: Text in the format of the breast_cancer_protein_profiles chunks
+    """
+    if not any(record.get(column) for column in PROTEIN_COLUMNS):
+        return ""
+    row = {column: record.get(column) or "Unknown" for column in PROTEIN_COLUMNS}
+    row["patient_id"] = _patient_id(record)
+    return generate_chunk(row)
+
+def gene_query_text(record: Dict[str, Any]) -> str:
+    """
+    Render the gene chunk text of a record, or "" if it has no mutation data.
+
+    Args:
+        record (Dict[str, Any]): Patient record
+
+    Returns:
+        str: Text in the format of the breast_cancer_genes_mutation chunks
+    """
+    if "Mutations" not in record and "Mutation_Count" not in record:
+        return ""
+    mutations = _json_field(record.get("Mutations"))
+    patient = {
+        "Patient_ID": _patient_id(record),
+        "Mutations": mutations,
+        # CSV cells read back by pandas can hold "3.0"
+        "Mutation_Count": int(float(record.get("Mutation_Count") or len(mutations))),
+        "FGA": float(record.get("FGA") or 0.0),
+        "Pathways": _json_field(record.get("Pathways"))
+    }
+    return chunk_patients([patient])[0]["Text"]
+
+def render_queries(records: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """
+    Render the gene and protein query texts of every record.
+
+    Args:
+        records (List[Dict[str, Any]]): Patient records (see read_patient_records)
+
+    Returns:
+        List[Tuple[str, str]]: (gene text, protein text) per record, "" for a missing modality
+
+    Raises:
+        ValueError: If a record cannot be rendered (e.g. a Mutations cell that is not
+            JSON), with its 1-based row number
+    """
+    queries = []
+    for row, record in enumerate(records, start=1):
+        try:
+            queries.append((gene_query_text(record), protein_query_text(record)))
+        except Exception as e:
+            raise ValueError(f"Invalid patient record at row {row} (patient {_patient_id(record)}): {str(e)}")
+    return queries
+
+async def _embed_batch(embed_func: Callable, texts: List[str]) -> List[Optional[List[float]]]:
+    """Run one batched embedding job, backing off while the inference executor is saturated."""
+    for attempt in range(SCREENING_MAX_RETRIES):
+        try:
+            return await get_inference_executor().run(embed_func, texts)
+        except InferenceSaturatedError:
+            if attempt == SCREENING_MAX_RETRIES - 1:
+                raise
+            await asyncio.sleep(SCREENING_RETRY_DELAY_SECONDS * 2 ** attempt)
+
+async def _screen_modality(
+    modality: str,
+    embed_func: Callable,
+    texts: List[str],
+    collection_name: str,
+    expected_dim: int,
+    filters: Optional[Dict[str, Any]]
+) -> List[List[Dict]]:
+    """Embed and search one modality for a batch of patients (empty results for empty texts)."""
+    if not any(texts):
+        return [[] for _ in texts]
+    vectors = await _embed_batch(embed_func, texts)
+    with STAGE_LATENCY.time(stage="search_batch", modality=modality):
+        hits = await search_collection_batch(
+            collection_name,
+            vectors,
+            expected_dim,
+            filters=filters,
+            projection=PAYLOAD_PROJECTIONS["patient"]
+        )
+    SEARCH_HITS.inc(sum(len(patient_hits) for patient_hits in hits), modality=modality)
+    return hits
+
+async def screen_patients(
+    records: List[Dict[str, Any]],
+    queries: List[Tuple[str, str]],
+    batch_size: int = SCREENING_BATCH_SIZE,
+    filters: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Assess every patient of a cohort, yielding one result row per patient in input order.
+
+    Args:
+        records (List[Dict[str, Any]]): Patient records (see read_patient_records)
+        queries (List[Tuple[str, str]]): Query texts of the records (see render_queries)
+        batch_size (int): Patients embedded and searched together
+        filters (Optional[Dict[str, Any]]): Structured payload filters applied to every search
+
+    Yields:
+        Dict[str, Any]: patient_id, risk_level, similar/cancer-confirmed case counts,
+            per-modality case counts, "errors" (modality → message) when a
+            modality failed for the batch, and "skipped" (modality → reason) for
+            collections that cannot apply the filters
+    """
+    # Modality → (embed function, position of its text in queries, collection, dimension)
+    modalities = {
+        "genes": (embed_texts_844, 0, "breast_cancer_genes_mutation", 844),
+        "proteins": (embed_texts_384, 1, "breast_cancer_protein_profiles", 384)
+    }
+    skipped = {}
+    for modality, (_, _, collection_name, _) in modalities.items():
+        missing = unsupported_fields(collection_name, filters)
+        if missing:
+            skipped[modality] = str(UnsupportedFilterError(collection_name, missing))
+    searched = [modality for modality in modalities if modality not in skipped]
+
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        batch_queries = queries[start:start + batch_size]
+        outcomes = await asyncio.gather(
+            *(
+                _screen_modality(
+                    modality, embed_func, [texts[position] for texts in batch_queries],
+                    collection_name, expected_dim, filters
+                )
+                for modality, (embed_func, position, collection_name, expected_dim) in modalities.items()
+                if modality in searched
+            ),
+            return_exceptions=True
+        )
+
+        hits = {modality: [[] for _ in batch] for modality in skipped}
+        errors = {}
+        for modality, outcome in zip(searched, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Screening failed for {modality} (patients {start}-{start + len(batch) - 1}): "
+                             f"{str(outcome)}", exc_info=outcome)
+                ERRORS.inc(stage="screening", modality=modality)
+                errors[modality] = str(outcome)
+                hits[modality] = [[] for _ in batch]
+            else:
+                hits[modality] = outcome
+
+        for i, record in enumerate(batch):
+            cases = hits["genes"][i] + hits["proteins"][i]
+            cancer_count = count_cancer_cases(cases)
+            row = {
+                "patient_id": _patient_id(record),
+                "risk_level": risk_level(len(cases), cancer_count),
+                "similar_cases_count": len(cases),
+                "cancer_confirmed_count": cancer_count,
+                "gene_cases_count": len(hits["genes"][i]),
+                "protein_cases_count": len(hits["proteins"][i])
+            }
+            if errors:
+                row["errors"] = errors
+            if skipped:
+                row["skipped"] = skipped
+            yield row
+
+        logger.info(f"Screened patients {start + 1}-{start + len(batch)} of {len(records)}")
@@ -10,6 +10,14 @@ METADATA_FILE = DATA_DIR + "/metadata.jsonl"
 CSV_FILE = "/kaggle/input/initinalr/output_clean.csv"
 CSV_COLUMN_NAME = "Patient_ID"
 OUTPUT_METADATA_FILE = "/kaggle/working/metadata_updated.jsonl"
+# Manifeste (ID du point → hash du contenu) pour les mises à jour incrémentales
+MANIFEST_FILE = "/kaggle/working/pathology_manifest.json"
 
 # CLIP
 CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+
+# Ingestion par lots
+EMBED_BATCH_SIZE = 64
+NUM_WORKERS = 4
+PREFETCH_FACTOR = 2
+UPSERT_BATCH_SIZE = 256
@@ -1,18 +1,98 @@
+import os
+import time
 from PIL import Image
 import torch
+from torch.utils.data import DataLoader, Dataset
 from transformers import CLIPProcessor, CLIPModel
 from config import CLIP_MODEL_NAME
 
-# Charger modèle CLIP
-clip_model = CLIPModel.from_pretrained(CLIP_MODEL_NAME)
-clip_processor = CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
-clip_model.eval()
+# Modèle CLIP chargé au premier usage : les workers de décodage n'en ont pas besoin
+clip_model = None
+clip_processor = None
+
+def load_clip():
+    """Charge le modèle et le processeur CLIP une seule fois"""
+    global clip_model, clip_processor
+    if clip_model is None:
+        clip_processor = CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+        clip_model = CLIPModel.from_pretrained(CLIP_MODEL_NAME)
+        clip_model.eval()
+    return clip_model, clip_processor
 
 def embed_image(image_path):
     """Crée l'embedding normalisé pour une image"""
+    model, processor = load_clip()
     image = Image.open(image_path).convert("RGB")
-    inputs = clip_processor(images=image, return_tensors="pt")
+    inputs = processor(images=image, return_tensors="pt")
     with torch.no_grad():
-        emb = clip_model.get_image_features(**inputs)
+        emb = model.get_image_features(**inputs)
         emb = emb / emb.norm(dim=-1, keepdim=True)
     return emb.squeeze().tolist()
+
+class PathologyImageDataset(Dataset):
+    """Décode et prétraite les images dans les workers du DataLoader"""
+
+    def __init__(self, data, data_dir, image_processor):
+        self.items = [item for item in data if item.get("image_path")]
+        self.data_dir = data_dir
+        self.image_processor = image_processor
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        image_path = os.path.join(self.data_dir, self.items[index]["image_path"])
+        try:
+            image = Image.open(image_path).convert("RGB")
+            pixel_values = self.image_processor(images=image, return_tensors="pt")["pixel_values"][0]
+        except (OSError, ValueError) as e:
+            print(f" Image ignorée ({image_path}) : {e}")
+            pixel_values = None
+        return index, pixel_values
+
+def _collate(samples):
+    # Les images illisibles sont écartées du lot
+    samples = [(index, pixels) for index, pixels in samples if pixels is not None]
+    if not samples:
+        return [], None
+    indexes, pixels = zip(*samples)
+    return list(indexes), torch.stack(pixels)
+
+def embed_images_batched(data, data_dir, batch_size=64, num_workers=4, prefetch_factor=2, device=None):
+    """
+    Encode les images de data par lots.
+
+    Des processus workers décodent et prétraitent les images en avance
+    (prefetch_factor lots par worker) pendant que CLIP encode le lot courant.
+    Génère des tuples (items, vecteurs) dans l'ordre de data ; affiche le débit en images/s.
+    """
+    model, processor = load_clip()
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    model.to(device)
+
+    dataset = PathologyImageDataset(data, data_dir, processor.image_processor)
+    loader = DataLoader(
+        dataset,
+        batch_size=batch_size,
+        num_workers=num_workers,
+        prefetch_factor=prefetch_factor if num_workers > 0 else None,
+        collate_fn=_collate,
+        pin_memory=device == "cuda"
+    )
+
+    start = time.perf_counter()
+    encoded = 0
+    for indexes, pixel_values in loader:
+        if not indexes:
+            continue
+        with torch.inference_mode():
+            emb = model.get_image_features(pixel_values=pixel_values.to(device))
+            emb = emb / emb.norm(dim=-1, keepdim=True)
+        encoded += len(indexes)
+        elapsed = time.perf_counter() - start
+        print(f" {encoded}/{len(dataset)} images encodées ({encoded / elapsed:.1f} images/s)")
+        yield [dataset.items[i] for i in indexes], emb.cpu().tolist()
+
+    elapsed = time.perf_counter() - start
+    if encoded:
+        print(f" {encoded} images encodées en {elapsed:.1f}s ({encoded / elapsed:.1f} images/s)")
@@ -1,43 +1,171 @@
-import uuid
+import os
+import sys
+import json
+import argparse
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct, HnswConfigDiff
-from config import QDRANT_URL, QDRANT_API_KEY, COLLECTION_NAME
+from config import (
+    QDRANT_URL, QDRANT_API_KEY, COLLECTION_NAME, DATA_DIR, METADATA_FILE, MANIFEST_FILE, CLIP_MODEL_NAME,
+    EMBED_BATCH_SIZE, NUM_WORKERS, PREFETCH_FACTOR, UPSERT_BATCH_SIZE
+)
 
-def setup_qdrant():
-    client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qdrant_common.collection_profiles import collection_config
+from qdrant_common.bulk_upload import upload_records
+from qdrant_common.incremental import (
+    CONTENT_HASH_FIELD, content_hash, delete_points, diff_manifest, finish_refresh,
+    load_manifest, log_refresh, manifest_from_collection, point_id, prepare_collection, unique_keys
+)
 
-    if client.collection_exists(COLLECTION_NAME):
-        client.delete_collection(COLLECTION_NAME)
+def setup_qdrant(profile=None, full=False):
+    # Profil de stockage : default, scalar_int8, binary ou on_disk_scalar
+    profile = profile or os.getenv("COLLECTION_PROFILE", "default")
+    client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
 
-    client.create_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config=VectorParams(
-            size=512,
-            distance=Distance.COSINE
-        ),
-        hnsw_config=HnswConfigDiff(m=16, ef_construct=200)
+    # Mise à jour en place via l'alias, ou nouvelle génération (premier passage ou full=True),
+    # publiée par alias une fois complète : l'API interroge toujours une collection complète
+    target = prepare_collection(
+        client, COLLECTION_NAME, collection_config(512, profile, m=16, ef_construct=200), full=full
     )
+    if target != COLLECTION_NAME:
+        print(f" Génération Qdrant '{target}' créée (profil {profile})")
+    return client, target
+
+def extract_biomarkers(item):
+    """Labels typés stockés dans le payload, pour éviter l'analyse de texte côté backend"""
+    genes = item.get("gene_mutations") or {}
+    proteins = item.get("protein_expression") or {}
+    return {
+        "cancer_confirmed": item.get("cancer") is True,
+        "er_positive": proteins.get("ER") == "positive",
+        "pr_positive": proteins.get("PR") == "positive",
+        "her2_positive": proteins.get("HER2") == "positive",
+        "ki67_high": proteins.get("Ki67") == "high",
+        "brca1_mutated": genes.get("BRCA1") is True,
+        "brca2_mutated": genes.get("BRCA2") is True
+    }
+
+def item_point_id(item):
+    """ID déterministe (uuid5 du case_id), ou None (uuid4) si l'image n'a pas de case_id"""
+    return point_id(COLLECTION_NAME, item["case_id"]) if item.get("case_id") else None
+
+def item_hash(item, data_dir):
+    """Hash du payload, du fichier image et du modèle CLIP : change dès que le vecteur ou le payload change"""
+    with open(f"{data_dir}/{item['image_path']}", "rb") as f:
+        image_bytes = f.read()
+    return content_hash({**item, **extract_biomarkers(item)}, image_bytes, CLIP_MODEL_NAME)
+
+def add_embeddings(client, data, embed_func, data_dir, collection_name=COLLECTION_NAME):
+    def records():
+        for item in data:
+            image_path_rel = item.get("image_path")
+            if not image_path_rel:
+                continue
+
+            image_path = f"{data_dir}/{image_path_rel}"
+            yield item_point_id(item), embed_func(image_path), {**item, **extract_biomarkers(item)}
+
+    # Envoi par lots parallèles (qdrant_common.bulk_upload) au lieu d'un upsert par image
+    upload_records(client, collection_name, records(), batch_size=UPSERT_BATCH_SIZE)
+    print(" Tous les embeddings ont été ajoutés à Qdrant")
 
-    print(f" Collection Qdrant '{COLLECTION_NAME}' créée")
-    return client
+def add_embeddings_batched(client, data, data_dir, batch_size=EMBED_BATCH_SIZE, num_workers=NUM_WORKERS,
+                           prefetch_factor=PREFETCH_FACTOR, upsert_batch_size=UPSERT_BATCH_SIZE, hashes=None,
+                           collection_name=COLLECTION_NAME):
+    """Encode les images par lots (workers de décodage + CLIP par lots) et les ajoute par gros lots"""
+    from embeddings import embed_images_batched
 
-def add_embeddings(client, data, embed_func, data_dir):
-    for item in data:
-        image_path_rel = item.get("image_path")
-        if not image_path_rel:
+    hashes = hashes or {}
+
+    def records():
+        for items, vectors in embed_images_batched(data, data_dir, batch_size, num_workers, prefetch_factor):
+            for item, vector in zip(items, vectors):
+                pid = item_point_id(item)
+                payload = {**item, **extract_biomarkers(item)}
+                if pid in hashes:
+                    payload[CONTENT_HASH_FIELD] = hashes[pid]
+                yield pid, vector, payload
+
+    # Les lots sont envoyés en parallèle pendant que les workers et CLIP préparent la suite
+    # wait=True : les points doivent être appliqués avant la publication de la génération
+    # et le changement du tampon d'ingestion (finish_refresh)
+    total = upload_records(client, collection_name, records(), batch_size=upsert_batch_size, total=len(data),
+                           wait=True)
+    print(f" {total} embeddings ajoutés à Qdrant")
+    return total
+
+def refresh_embeddings(client, data, data_dir, manifest_file=MANIFEST_FILE, target=COLLECTION_NAME, **batch_options):
+    """
+    Mise à jour incrémentale : seules les images nouvelles ou modifiées sont encodées et envoyées,
+    les cas disparus sont supprimés. Coût proportionnel au nombre de changements.
+    target est la collection renvoyée par setup_qdrant (l'alias, ou une nouvelle génération publiée à la fin).
+    Une nouvelle génération à laquelle il manque des images (illisibles ou non encodées) n'est pas
+    publiée : elle est supprimée et RuntimeError est levée.
+    """
+    data = [item for item in data if item.get("image_path")]
+    ids = unique_keys(COLLECTION_NAME, (item.get("case_id") for item in data))
+    current = {}
+    unreadable = []
+    for pid, item in zip(ids, data):
+        if not pid:
             continue
+        try:
+            current[pid] = item_hash(item, data_dir)
+        except OSError as e:
+            print(f" Image illisible pour {item.get('case_id')}: {e}")
+            unreadable.append(pid)
 
-        image_path = f"{data_dir}/{image_path_rel}"
-        emb = embed_func(image_path)
+    manifest = load_manifest(client, COLLECTION_NAME, target, manifest_file)
+    # Une image illisible ce coup-ci (absente, verrouillée, en cours de copie) garde son point
+    # et son ancien hash : elle n'est ni réencodée ni supprimée, et sera relue au prochain passage
+    for pid in unreadable:
+        if pid in manifest:
+            current[pid] = manifest[pid]
+    changed, removed = diff_manifest(manifest, current)
+    log_refresh(COLLECTION_NAME, len(current), len(changed), len(removed))
 
-        point = PointStruct(
-            id=str(uuid.uuid4()),
-            vector=emb,
-            payload=item
-        )
-        client.upsert(
-            collection_name=COLLECTION_NAME,
-            points=[point]
+    changed_items = [item for pid, item in zip(ids, data) if pid in changed]
+    total = add_embeddings_batched(
+        client, changed_items, data_dir, hashes=current, collection_name=target, **batch_options
+    ) if changed_items else 0
+    delete_points(client, target, removed)
+
+    missing = len(changed_items) - total + (len(unreadable) if target != COLLECTION_NAME else 0)
+    if missing > 0 and target != COLLECTION_NAME:
+        # Une nouvelle génération incomplète n'est jamais publiée : l'alias garde la génération en ligne
+        client.delete_collection(target)
+        raise RuntimeError(
+            f"Génération '{target}' incomplète ({missing} images illisibles ou non encodées), "
+            f"supprimée sans publication"
         )
+    # Mise à jour en place : le manifeste est relu depuis la collection, les changements non encodés
+    # gardent leur ancien hash (ou manquent) et seront réessayés au prochain passage
+    if missing > 0:
+        print(f" {missing} images non encodées, elles seront réessayées au prochain passage")
+        current = manifest_from_collection(client, target)
+    finish_refresh(client, COLLECTION_NAME, target, manifest_file, current)
+    print(f" {total} images ajoutées ou mises à jour, {len(removed)} supprimées")
+    return total
 
-    print(" Tous les embeddings ont été ajoutés à Qdrant")
+def load_metadata(metadata_file):
+    with open(metadata_file, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indexation des images de pathologie dans Qdrant")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--metadata", default=METADATA_FILE)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    parser.add_argument("--prefetch", type=int, default=PREFETCH_FACTOR)
+    parser.add_argument("--upsert-batch-size", type=int, default=UPSERT_BATCH_SIZE)
+    parser.add_argument("--manifest", default=MANIFEST_FILE)
+    parser.add_argument("--full", action="store_true",
+                        help="Reconstruit toute la collection dans une nouvelle génération (blue/green)")
+    args = parser.parse_args()
+
+    client, target = setup_qdrant(full=args.full)
+    refresh_embeddings(
+        client, load_metadata(args.metadata), args.data_dir, args.manifest, target,
+        batch_size=args.batch_size, num_workers=args.workers,
+        prefetch_factor=args.prefetch, upsert_batch_size=args.upsert_batch_size
+    )
@@ -46,6 +46,32 @@ protein_descriptions = {
         "Unknown": "Type histologique inconnu."
     }
 }
+def is_invasive_carcinoma(cancer_type_detailed):
+    """
+    Whether a detailed cancer type is a confirmed invasive carcinoma.
+
+    Any carcinoma / cancer type counts except in situ ones: a DCIS ("Ductal Carcinoma
+    In Situ") is non-invasive (stage 0) and is not counted, nor is "Unknown".
+    """
+    cancer_type = str(cancer_type_detailed or "").lower()
+    if "in situ" in cancer_type:
+        return False
+    return "carcinoma" in cancer_type or "cancer" in cancer_type
+
+def extract_biomarkers(row):
+    """
+    Typed biomarker labels stored in the payload, so the backend does not parse chunk_text.
+
+    cancer_confirmed means a confirmed invasive carcinoma (see is_invasive_carcinoma),
+    the meaning of "Cas avec cancer invasif confirmé" in the doctor summary.
+    """
+    return {
+        "cancer_confirmed": is_invasive_carcinoma(row['cancer_type_detailed']),
+        "er_positive": row['er_status'] == "Positive",
+        "pr_positive": row['pr_status'] == "Positive",
+        "her2_positive": row['her2_status'] == "Positive"
+    }
+
 def generate_chunk(row):
     """
     Takes a row from the DataFrame and returns a readable text chunk.
@@ -89,8 +115,13 @@ if __name__ == "__main__":
 
     # Step 2: Generate chunks for all rows
     df["chunk_text"] = df.apply(generate_chunk, axis=1)
+    labels = df.apply(extract_biomarkers, axis=1, result_type="expand")
+    df = pd.concat([df, labels], axis=1)
 
     # Step 3: Save to new CSV
+    # Keep the structured biomarker columns next to the text (payload filters in Qdrant)
     output_file = "protein_chunks.csv"
-    df[["patient_id", "chunk_text"]].to_csv(output_file, index=False, encoding="utf-8")
+    structured = [c for c in ["er_status", "pr_status", "her2_status", "pam50_subtype"] if c in df.columns]
+    structured += list(labels.columns)
+    df[["patient_id", "chunk_text"] + structured].to_csv(output_file, index=False, encoding="utf-8")
     
\ No newline at end of file
@@ -1,4 +1,5 @@
 # embed_locally.py
+import os
 import pandas as pd
 import numpy as np
 from sentence_transformers import SentenceTransformer
@@ -8,13 +9,27 @@ df = pd.read_csv("protein_chunks.csv", sep=";", encoding="utf-8")
 # Handle missing values
 df.fillna("Unknown", inplace=True)
 
-# Generate embeddings
-model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-embeddings = model.encode(df["chunk_text"].tolist(), show_progress_bar=True)
+# Reuse the vectors of unchanged chunks from the previous run, embed only new or changed texts
+texts = df["chunk_text"].tolist()
+previous = {}
+if os.path.exists("protein_embeddings.npy") and os.path.exists("protein_chunks_FIXED.csv"):
+    previous_texts = pd.read_csv("protein_chunks_FIXED.csv", encoding="utf-8")["chunk_text"].astype(str)
+    previous_embeddings = np.load("protein_embeddings.npy")
+    if len(previous_texts) == len(previous_embeddings):
+        previous = dict(zip(previous_texts, previous_embeddings))
+
+missing = sorted({text for text in texts if text not in previous})
+if missing:
+    model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+    previous.update(zip(missing, model.encode(missing, show_progress_bar=True)))
+print(f" {len(missing)} new or changed chunks embedded, {len(texts) - len(missing)} reused")
+embeddings = np.array([previous[text] for text in texts], dtype=np.float32)
 
 # Save
 np.save("protein_embeddings.npy", embeddings)
-df[["patient_id", "chunk_text"]].to_csv(
+structured = [c for c in ["er_status", "pr_status", "her2_status", "pam50_subtype",
+                          "cancer_confirmed", "er_positive", "pr_positive", "her2_positive"] if c in df.columns]
+df[["patient_id", "chunk_text"] + structured].to_csv(
     "protein_chunks_FIXED.csv", 
     index=False, 
     encoding="utf-8",
@@ -2,10 +2,18 @@
 import numpy as np
 import pandas as pd
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qdrant_common.collection_profiles import collection_config
+from qdrant_common.bulk_upload import upload_records
+from qdrant_common.incremental import (
+    CONTENT_HASH_FIELD, content_hash, delete_points, diff_manifest, finish_refresh,
+    load_manifest, log_refresh, prepare_collection, unique_keys
+)
+
 # Load environment variables
 load_dotenv()
 
@@ -13,46 +21,77 @@ load_dotenv()
 COLLECTION_NAME = "breast_cancer_protein_profiles"
 EMBEDDINGS_FILE = "protein_embeddings.npy"
 METADATA_FILE = "protein_chunks_FIXED.csv"
+# Storage profile: default, scalar_int8, binary or on_disk_scalar
+COLLECTION_PROFILE = os.getenv("COLLECTION_PROFILE", "default")
+# Manifest (point ID → content hash) used for incremental refreshes
+MANIFEST_FILE = os.getenv("MANIFEST_FILE", "proteins_manifest.json")
+# FULL_REFRESH=1 rebuilds everything into a new generation, published through the alias once complete
+FULL_REFRESH = os.getenv("FULL_REFRESH", "0") == "1"
+# Structured biomarker columns stored in the payload for filtered search
+STRUCTURED_COLUMNS = ["er_status", "pr_status", "her2_status", "pam50_subtype"]
+# Typed biomarker labels computed in chunking.py (stored as booleans)
+LABEL_COLUMNS = ["cancer_confirmed", "er_positive", "pr_positive", "her2_positive"]
 
 # Connect to Qdrant Cloud
 print("Connecting to Qdrant Cloud...")
 client = QdrantClient(
     url=os.getenv("QDRANT_URL"),
-    api_key=os.getenv("QDRANT_API_KEY")
+    api_key=os.getenv("QDRANT_API_KEY"),
+    timeout=60.0
 )
 
 # Load data
 
-embeddings = np.load(EMBEDDINGS_FILE)
+# Embeddings are memory-mapped and read one batch at a time during the upload
+embeddings = np.load(EMBEDDINGS_FILE, mmap_mode="r")
 metadata = pd.read_csv(METADATA_FILE, encoding="utf-8")
 
 # Validate
 assert len(embeddings) == len(metadata), "Mismatch between embeddings and metadata!"
 print(f" Loaded {len(embeddings)} items")
 
-# Create collection
-print(" Creating collection in Qdrant Cloud...")
-client.recreate_collection(
-    collection_name=COLLECTION_NAME,
-    vectors_config=VectorParams(size=384, distance=Distance.COSINE)
-)
+# Refresh in place through the alias, or build a new generation (first run or FULL_REFRESH=1)
+# so the collection searched by the API stays complete during the whole ingestion
+target = prepare_collection(client, COLLECTION_NAME, collection_config(384, COLLECTION_PROFILE), full=FULL_REFRESH)
+if target != COLLECTION_NAME:
+    print(f" Created generation '{target}' (profile {COLLECTION_PROFILE})")
+manifest = load_manifest(client, COLLECTION_NAME, target, MANIFEST_FILE)
+
+structured_columns = [col for col in STRUCTURED_COLUMNS if col in metadata.columns]
+label_columns = [col for col in LABEL_COLUMNS if col in metadata.columns]
+
+def build_payload(row):
+    return {
+        "patient_id": str(row["patient_id"]),
+        "chunk_text": str(row["chunk_text"]),
+        "source": "TCGA-BRCA",
+        "modality": "Protein Biomarkers",
+        **{col: str(row[col]) for col in structured_columns},
+        **{col: str(row[col]) == "True" for col in label_columns}
+    }
+
+def rows():
+    for row in metadata.itertuples(index=False):
+        yield row._asdict()
+
+# Deterministic IDs (uuid5 of patient_id) and payload + vector hash of every row
+ids = unique_keys(COLLECTION_NAME, metadata["patient_id"].astype(str))
+current = {
+    pid: content_hash(build_payload(row), np.asarray(embeddings[i]))
+    for i, (pid, row) in enumerate(zip(ids, rows())) if pid
+}
+changed, removed = diff_manifest(manifest, current)
+log_refresh(COLLECTION_NAME, len(current), len(changed), len(removed))
+
+# Upload new or changed rows only, in parallel batches with retries, then delete removed patients
+def records():
+    for i, (pid, row) in enumerate(zip(ids, rows())):
+        if pid in changed:
+            yield pid, embeddings[i], {**build_payload(row), CONTENT_HASH_FIELD: current[pid]}
 
-# Prepare points
-print(" Preparing points for upload...")
-points = []
-for i in range(len(embeddings)):
-    points.append(
-        PointStruct(
-            id=i,
-            vector=embeddings[i].tolist(),
-            payload={
-                "patient_id": str(metadata.iloc[i]["patient_id"]),
-                "chunk_text": str(metadata.iloc[i]["chunk_text"]),
-                "source": "TCGA-BRCA",
-                "modality": "Protein Biomarkers"
-            }
-        )
-    )
-
-# Upload
-client.upsert(collection_name=COLLECTION_NAME, points=points)
+# wait=True: points must be applied before the generation is published and the
+# ingestion stamp is bumped (finish_refresh)
+count = upload_records(client, target, records(), total=len(changed), wait=True)
+delete_points(client, target, removed)
+finish_refresh(client, COLLECTION_NAME, target, MANIFEST_FILE, current)
+print(f" Uploaded {count} points and deleted {len(removed)} from '{COLLECTION_NAME}'")
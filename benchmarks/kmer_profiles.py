@@ -0,0 +1,106 @@
+# benchmarks/kmer_profiles.py
+"""
+Micro-benchmark of the vectorized k-mer engine (Gene_Mutation/kmers.py) against the
+previous MultimodalPatientEmbedder.encode_dna loop.
+
+The previous implementation sliced every window of every sequence in Python, looked
+it up in a dict and allocated one np.zeros(4**k) per sequence. The current one
+counts a whole batch of patients with a translation table, rolling codes and a
+single np.bincount.
+
+No raw mutation contexts are shipped with the repository, so the cohort is
+synthetic and seeded: each patient has 0 to --max-sequences sequences of
+--min-length to --max-length nucleotides, with a small rate of N and lowercase
+bases (windows containing them are not counted by either implementation).
+
+Both implementations must return the same profiles (up to float rounding); the
+benchmark then reports the best time per cohort for each k.
+
+Usage (from the repository root):
+    python -m benchmarks.kmer_profiles [--patients 2000] [--k 3 5] [--repeat 3]
+"""
+
+import time
+import argparse
+import numpy as np
+from Gene_Mutation.kmers import kmer_profiles, kmer_vocabulary
+
+def legacy_encode_dna(dna_lists, k=3):
+    """Pre-vectorization MultimodalPatientEmbedder.encode_dna, kept verbatim for comparison."""
+    kmers = kmer_vocabulary(k)
+    kmer_idx = {kmer: i for i, kmer in enumerate(kmers)}
+    out = []
+
+    for seqs in dna_lists:
+        if not seqs:
+            out.append(np.zeros(len(kmers)))
+            continue
+
+        seq_vecs = []
+        for seq in seqs:
+            v = np.zeros(len(kmers))
+            for i in range(len(seq) - k + 1):
+                kmer = seq[i:i + k]
+                if kmer in kmer_idx:
+                    v[kmer_idx[kmer]] += 1
+            if v.sum() > 0:
+                v /= v.sum()
+            seq_vecs.append(v)
+
+        out.append(np.mean(seq_vecs, axis=0))
+
+    return np.array(out)
+
+def synthetic_cohort(patients, max_sequences, min_length, max_length, seed=0):
+    """Seeded DNA lists: mostly ATGC, with about 1% N and 1% lowercase bases."""
+    rng = np.random.default_rng(seed)
+    alphabet = np.array(list("ATGCNatgc"))
+    weights = np.array([0.245, 0.245, 0.245, 0.245, 0.01, 0.0025, 0.0025, 0.0025, 0.0025])
+    cohort = []
+    for _ in range(patients):
+        cohort.append([
+            "".join(rng.choice(alphabet, size=rng.integers(min_length, max_length + 1), p=weights))
+            for _ in range(rng.integers(0, max_sequences + 1))
+        ])
+    return cohort
+
+def best_time(fn, repeat):
+    """Best wall time of fn() over repeat runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized k-mer profiles")
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--max-sequences", type=int, default=8)
+    parser.add_argument("--min-length", type=int, default=50)
+    parser.add_argument("--max-length", type=int, default=500)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cohort = synthetic_cohort(args.patients, args.max_sequences, args.min_length, args.max_length)
+    n_bases = sum(len(seq) for seqs in cohort for seq in seqs)
+    print(f"{len(cohort)} patients, {sum(len(seqs) for seqs in cohort)} sequences, {n_bases} bases")
+
+    for k in args.k:
+        legacy_result = legacy_encode_dna(cohort, k)
+        vectorized_result = kmer_profiles(cohort, k, args.batch_size)
+        assert legacy_result.shape == vectorized_result.shape, \
+            f"Shapes differ: {legacy_result.shape} != {vectorized_result.shape}"
+        assert np.allclose(legacy_result, vectorized_result, rtol=1e-12, atol=1e-15), \
+            f"Profiles differ for k={k} (max abs diff {np.abs(legacy_result - vectorized_result).max()})"
+
+        legacy = best_time(lambda: legacy_encode_dna(cohort, k), args.repeat)
+        vectorized = best_time(lambda: kmer_profiles(cohort, k, args.batch_size), args.repeat)
+        print(f"k={k} ({4 ** k} dims), identical profiles")
+        for label, seconds in [("loop (previous)", legacy), ("vectorized", vectorized)]:
+            print(f"  {label:<16} {seconds * 1000:9.2f} ms  {n_bases / seconds / 1e6:7.2f} Mbases/s  x{legacy / seconds:6.1f}")
+
+if __name__ == "__main__":
+    main()
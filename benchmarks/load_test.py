@@ -0,0 +1,381 @@
+# benchmarks/load_test.py
+"""
+End-to-end load test of /search against an in-process search backend.
+
+The FastAPI app runs in this process behind an httpx ASGI transport (no network,
+no Qdrant server). The three collections are seeded from the data shipped with the
+repository, embedded with the same models the API uses:
+- PathologyImage: Pathology_Report/data/breast_dataset (images + metadata.jsonl)
+- breast_cancer_protein_profiles: Proteine_Mutation/clinical_data.csv rendered with
+  Proteine_Mutation.chunking.generate_chunk
+- breast_cancer_genes_mutation: the gene_mutations of metadata.jsonl rendered with
+  Gene_Mutation.chunking.chunk_patients (no raw mutation file is shipped)
+
+Backends ("--backend"):
+- local (default): the in-process LocalVectorIndex (SEARCH_BACKEND=local)
+- qdrant: an embedded in-memory Qdrant (qdrant-client local mode)
+
+A mix of patient/doctor, text-only and image queries is replayed at the requested
+concurrency. The report gives throughput and request latency percentiles per
+scenario, plus p50/p95/p99 per pipeline stage, estimated from the /metrics
+histograms (finer buckets are configured for the run). The response and embedding
+caches are disabled unless --cache is given, so every request pays full inference.
+
+The models must be available offline (Hugging Face cache) for a realistic run;
+--synthetic-encoders replaces MiniLM and CLIP with deterministic hash-seeded vectors
+to measure the serving stack alone.
+
+Usage (from the repository root):
+    python -m benchmarks.load_test [--requests 200] [--concurrency 8] [--mix patient_text=4,doctor_multimodal=2]
+                                   [--backend local|qdrant] [--endpoint /search|/search/stream] [--json out.json]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_DIR = os.path.join(REPO_ROOT, "Pathology_Report", "data", "breast_dataset")
+CLINICAL_CSV = os.path.join(REPO_ROOT, "Proteine_Mutation", "clinical_data.csv")
+
+SCENARIOS = {
+    "patient_text": {"role": "patient", "text": True, "image": False},
+    "doctor_text": {"role": "doctor", "text": True, "image": False},
+    "patient_image": {"role": "patient", "text": False, "image": True},
+    "doctor_multimodal": {"role": "doctor", "text": True, "image": True}
+}
+DEFAULT_MIX = "patient_text=4,doctor_text=3,patient_image=1,doctor_multimodal=2"
+
+PROTEIN_COLUMNS = ["patient_id", "sample_id", "er_status", "pr_status", "her2_status",
+                   "rppa_cluster", "tumor_stage", "pam50_subtype", "cancer_type_detailed"]
+
+# Geometric latency buckets from 0.5 ms to about 30 s, so stage percentiles are precise
+FINE_BUCKETS = ",".join(f"{0.0005 * 1.25 ** i:.6g}" for i in range(50))
+
+def load_metadata(limit: int) -> List[Dict[str, Any]]:
+    with open(os.path.join(DATASET_DIR, "metadata.jsonl"), encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return records[:limit] if limit else records
+
+def load_clinical(limit: int) -> pd.DataFrame:
+    """clinical_data.csv normalized as by Proteine_Mutation/preprocessing.py."""
+    df = pd.read_csv(CLINICAL_CSV, sep=None, engine="python")
+    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+    for col in PROTEIN_COLUMNS:
+        if col not in df.columns:
+            df[col] = "Unknown"
+    df = df[PROTEIN_COLUMNS].fillna("Unknown")
+    for col in ["er_status", "pr_status", "her2_status"]:
+        df[col] = df[col].map(lambda x: {"positive": "Positive", "negative": "Negative"}.get(str(x).strip().lower(), "Unknown"))
+    return df.head(limit) if limit else df
+
+def gene_records(metadata: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Mutation records in the Gene_Mutation/preprocessing.py format, from the pathology metadata."""
+    return [
+        {
+            "Patient_ID": item["case_id"],
+            "Mutations": [{"Gene": gene, "Mutation Type": "Missense_Mutation"}
+                          for gene, mutated in (item.get("gene_mutations") or {}).items() if mutated],
+            "Mutation_Count": sum(bool(m) for m in (item.get("gene_mutations") or {}).values()),
+            "FGA": 0.0,
+            "Pathways": []
+        }
+        for item in metadata
+    ]
+
+def use_synthetic_encoders() -> None:
+    """Replace MiniLM and CLIP with deterministic hash-seeded unit vectors."""
+    from Interface.Backend import embedding
+
+    def vector(seed: bytes, dim: int) -> np.ndarray:
+        rng = np.random.default_rng(int.from_bytes(hashlib.sha256(seed).digest()[:8], "little"))
+        v = rng.standard_normal(dim).astype(np.float32)
+        return v / np.linalg.norm(v)
+
+    def encode_texts(texts):
+        return np.stack([vector(text.encode("utf-8"), 384) for text in texts])
+
+    def encode_images(images):
+        return np.stack([vector(image.tobytes(), 512) for image in images])
+
+    embedding._encode_texts_384 = encode_texts
+    embedding._encode_images_512 = encode_images
+    embedding._text_batcher.batch_func = encode_texts
+    embedding._image_batcher.batch_func = encode_images
+
+def build_collections(metadata, clinical) -> Dict[str, Tuple[np.ndarray, List[Any], List[Dict]]]:
+    """Embed the shipped data: collection → (vectors, ids, payloads)."""
+    from Interface.Backend.embedding import embed_image_512, embed_texts_384, embed_texts_844
+    from Gene_Mutation.chunking import chunk_patients
+    from Proteine_Mutation.chunking import generate_chunk, extract_biomarkers as protein_biomarkers
+    sys.path.insert(0, os.path.join(REPO_ROOT, "Pathology_Report"))
+    from qdrant_setup import extract_biomarkers as pathology_biomarkers
+
+    collections = {}
+
+    start = time.perf_counter()
+    image_paths = [os.path.join(DATASET_DIR, item["image_path"]) for item in metadata]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        image_vectors = list(pool.map(embed_image_512, image_paths))
+    collections["PathologyImage"] = (
+        np.asarray(image_vectors, dtype=np.float32),
+        list(range(len(metadata))),
+        [{**item, **pathology_biomarkers(item)} for item in metadata]
+    )
+    print(f"PathologyImage: {len(metadata)} images embedded in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    rows = [row for _, row in clinical.iterrows()]
+    chunks = [generate_chunk(row) for row in rows]
+    collections["breast_cancer_protein_profiles"] = (
+        np.asarray(embed_texts_384(chunks), dtype=np.float32),
+        list(range(len(rows))),
+        [
+            {"patient_id": row["patient_id"], "chunk_text": chunk,
+             **{col: row[col] for col in ["er_status", "pr_status", "her2_status", "pam50_subtype"]},
+             **protein_biomarkers(row)}
+            for row, chunk in zip(rows, chunks)
+        ]
+    )
+    print(f"breast_cancer_protein_profiles: {len(rows)} chunks embedded in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    gene_chunks = chunk_patients(gene_records(metadata))
+    collections["breast_cancer_genes_mutation"] = (
+        np.asarray(embed_texts_844([chunk["Text"] for chunk in gene_chunks]), dtype=np.float32),
+        list(range(len(gene_chunks))),
+        gene_chunks
+    )
+    print(f"breast_cancer_genes_mutation: {len(gene_chunks)} chunks embedded in {time.perf_counter() - start:.1f}s")
+    return collections
+
+def seed_local(collections, directory: str) -> None:
+    from Interface.Backend.local_index import LocalVectorIndex
+    for name, (vectors, ids, payloads) in collections.items():
+        LocalVectorIndex(name, vectors, ids, payloads, kind="numpy").save(directory)
+
+async def seed_qdrant(collections):
+    from qdrant_client import AsyncQdrantClient
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+    from Interface.Backend import qdrant_service
+
+    client = AsyncQdrantClient(location=":memory:")
+    for name, (vectors, ids, payloads) in collections.items():
+        await client.create_collection(name, vectors_config=VectorParams(size=vectors.shape[1], distance=Distance.COSINE))
+        for start in range(0, len(ids), 256):
+            await client.upsert(name, points=[
+                PointStruct(id=point_id, vector=vector.tolist(), payload=payload)
+                for point_id, vector, payload in zip(ids[start:start + 256], vectors[start:start + 256], payloads[start:start + 256])
+            ])
+    qdrant_service._qdrant_client = client
+
+def build_requests(n: int, mix: Dict[str, float], metadata, clinical, rng: random.Random) -> List[Dict[str, Any]]:
+    """Draw n requests from the scenario mix, with query texts and images taken from the dataset."""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    images = {}
+    requests = []
+    for _ in range(n):
+        scenario = rng.choices(names, weights)[0]
+        spec = SCENARIOS[scenario]
+        form = {"role": spec["role"]}
+        files = None
+        if spec["text"]:
+            item = rng.choice(metadata)
+            genes = [gene for gene, mutated in item["gene_mutations"].items() if mutated]
+            form["gene_text"] = f"{', '.join(genes)} mutation" if genes else "No BRCA1, BRCA2, PIK3CA or TP53 mutation"
+            row = clinical.iloc[rng.randrange(len(clinical))]
+            form["protein_text"] = (f"ER {row['er_status']}, PR {row['pr_status']}, HER2 {row['her2_status']}, "
+                                    f"PAM50 {row['pam50_subtype']}, stage {row['tumor_stage']}")
+        if spec["image"]:
+            item = rng.choice(metadata)
+            if item["image_path"] not in images:
+                with open(os.path.join(DATASET_DIR, item["image_path"]), "rb") as f:
+                    images[item["image_path"]] = f.read()
+            files = {"report_image": (os.path.basename(item["image_path"]), images[item["image_path"]], "image/png")}
+        requests.append({"scenario": scenario, "data": form, "files": files})
+    return requests
+
+async def replay(client, endpoint: str, requests: List[Dict[str, Any]], concurrency: int):
+    """Send requests from concurrency workers; return (scenario, seconds, status) samples and wall time."""
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+    samples = []
+
+    async def worker():
+        while True:
+            try:
+                request = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            response = await client.post(endpoint, data=request["data"], files=request["files"])
+            samples.append((request["scenario"], time.perf_counter() - start, response.status_code))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - start
+
+_BUCKET_LINE = re.compile(r'^tawhida_stage_duration_seconds_bucket\{stage="([^"]*)",modality="([^"]*)",le="([^"]*)"\} (\S+)$')
+
+def parse_stage_buckets(metrics_text: str) -> Dict[Tuple[str, str], List[Tuple[float, float]]]:
+    """(stage, modality) → [(upper bound, cumulative count), ...] from /metrics."""
+    series = {}
+    for line in metrics_text.splitlines():
+        match = _BUCKET_LINE.match(line)
+        if match:
+            stage, modality, bound, count = match.groups()
+            upper = float("inf") if bound == "+Inf" else float(bound)
+            series.setdefault((stage, modality), []).append((upper, float(count)))
+    return series
+
+def histogram_quantile(q: float, buckets: List[Tuple[float, float]]) -> float:
+    """Quantile of cumulative buckets, interpolating linearly inside the bucket (as Prometheus does)."""
+    total = buckets[-1][1]
+    if total <= 0:
+        return float("nan")
+    rank = q * total
+    lower_bound, lower_count = 0.0, 0.0
+    for upper, count in buckets:
+        if count >= rank:
+            if upper == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return upper
+            return lower_bound + (upper - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = upper, count
+    return lower_bound
+
+def stage_percentiles(before: str, after: str) -> Dict[str, Dict[str, float]]:
+    """Per-stage count and p50/p95/p99 (seconds) of the observations made between two scrapes."""
+    start = parse_stage_buckets(before)
+    end = parse_stage_buckets(after)
+    report = {}
+    for key, buckets in sorted(end.items()):
+        previous = dict(start.get(key, []))
+        delta = [(bound, count - previous.get(bound, 0.0)) for bound, count in buckets]
+        if delta[-1][1] <= 0:
+            continue
+        report[f"{key[0]}/{key[1]}"] = {
+            "count": int(delta[-1][1]),
+            **{f"p{int(q * 100)}": histogram_quantile(q, delta) for q in (0.5, 0.95, 0.99)}
+        }
+    return report
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"count": len(latencies), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+async def run(args) -> Dict[str, Any]:
+    from Interface.Backend import main as api
+    import httpx
+
+    if args.synthetic_encoders:
+        use_synthetic_encoders()
+
+    rng = random.Random(args.seed)
+    metadata = load_metadata(args.cases)
+    clinical = load_clinical(args.cases)
+    mix = {name: float(weight) for name, weight in (part.split("=") for part in args.mix.split(","))}
+    unknown = set(mix) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios {sorted(unknown)}; available: {sorted(SCENARIOS)}")
+
+    collections = build_collections(metadata, clinical)
+    if args.backend == "local":
+        seed_local(collections, os.environ["LOCAL_INDEX_DIR"])
+    else:
+        await seed_qdrant(collections)
+
+    async with api.lifespan(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=300.0) as client:
+            await replay(client, args.endpoint, build_requests(args.warmup, mix, metadata, clinical, rng), args.concurrency)
+            before = (await client.get("/metrics")).text
+            samples, elapsed = await replay(
+                client, args.endpoint, build_requests(args.requests, mix, metadata, clinical, rng), args.concurrency
+            )
+            after = (await client.get("/metrics")).text
+
+    statuses = {}
+    for _, _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = [(scenario, seconds) for scenario, seconds, status in samples if status == 200]
+    return {
+        "backend": args.backend,
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "requests": len(samples),
+        "elapsed_seconds": elapsed,
+        "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+        "statuses": statuses,
+        "latency": {
+            "all": latency_summary([seconds for _, seconds in ok]) if ok else {},
+            **{
+                scenario: latency_summary([seconds for name, seconds in ok if name == scenario])
+                for scenario in mix if any(name == scenario for name, _ in ok)
+            }
+        },
+        "stages": stage_percentiles(before, after)
+    }
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{report['requests']} requests to {report['endpoint']} ({report['backend']} backend, "
+          f"concurrency {report['concurrency']}) in {report['elapsed_seconds']:.2f}s: "
+          f"{report['throughput_rps']:.1f} req/s, statuses {report['statuses']}")
+    print(f"\n{'scenario':<28} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in report["latency"].items():
+        if stats:
+            print(f"{name:<28} {stats['count']:>6} {stats['p50'] * 1000:9.1f} {stats['p95'] * 1000:9.1f} {stats['p99'] * 1000:9.1f}")
+    print(f"\n{'stage/modality (/metrics)':<28} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in report["stages"].items():
+        print(f"{name:<28} {stats['count']:>6} {stats['p50'] * 1000:9.1f} {stats['p95'] * 1000:9.1f} {stats['p99'] * 1000:9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /search against an in-process search backend")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests sent first")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario=weight list over {sorted(SCENARIOS)}")
+    parser.add_argument("--backend", choices=["local", "qdrant"], default="local")
+    parser.add_argument("--endpoint", choices=["/search", "/search/stream"], default="/search")
+    parser.add_argument("--cases", type=int, default=0, help="seed only the first N cases of each dataset (0: all)")
+    parser.add_argument("--cache", action="store_true", help="keep the response and embedding caches enabled")
+    parser.add_argument("--synthetic-encoders", action="store_true", help="hash-seeded vectors instead of MiniLM/CLIP")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    # The backend reads its configuration at import time
+    index_dir = tempfile.mkdtemp(prefix="tawhida-load-test-")
+    os.environ["LOCAL_INDEX_DIR"] = index_dir
+    os.environ["SEARCH_BACKEND"] = args.backend
+    os.environ["SEARCH_MODE"] = "collections"
+    os.environ.setdefault("METRICS_LATENCY_BUCKETS", FINE_BUCKETS)
+    if not args.cache:
+        os.environ["SEARCH_CACHE_SIZE"] = "0"
+        os.environ["EMBED_CACHE_SIZE"] = "0"
+    logging.basicConfig(level=logging.WARNING)
+    logging.disable(logging.INFO)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+# benchmarks/rag_scanner.py
+"""
+Micro-benchmark of the rag.py text scanner against the previous per-pattern implementation.
+
+The previous count_cancer_cases / extract_protein_biomarkers / extract_gene_mutations
+ran one re.search (or substring test) per pattern over every payload text. The current
+versions scan each text once with a single compiled alternation and memoize the result.
+
+Inputs are the texts shipped with the repository:
+- Pathology_Report/data/breast_dataset/ocr_text/*.txt (pathology reports, used as gene
+  'Text' and protein 'chunk_text' payloads)
+- Proteine_Mutation/clinical_data.csv rendered with Proteine_Mutation.chunking.generate_chunk
+  (French protein chunk texts, as ingested)
+
+Both implementations must return identical counts; the benchmark then reports the time
+per call with a cold scan cache and with a warm one (the steady state of a server that
+keeps returning cases from the same cohort).
+
+Usage (from the repository root):
+    python -m benchmarks.rag_scanner [--repeat 5]
+"""
+
+import os
+import re
+import glob
+import time
+import logging
+import argparse
+from typing import Any, Dict, List
+import pandas as pd
+from Interface.Backend import rag
+from Proteine_Mutation.chunking import generate_chunk
+
+logger = logging.getLogger("benchmarks.legacy_rag")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def legacy_count_cancer_cases(cases: List[Dict[str, Any]]) -> int:
+    """Pre-scanner implementation of rag.count_cancer_cases, kept verbatim for comparison."""
+    if not cases:
+        return 0
+        
+    count = 0
+    cancer_keywords = [
+        'cancer', 'carcinome', 'tumeur maligne', 'néoplasie', 
+        'malignant', 'infiltrant', 'invasif', 'confirmé', 'confirmed'
+    ]
+    
+    for case in cases:
+        try:
+            payload = case.get("payload", {})
+            
+            # PathologyImage collection: direct boolean field
+            if "cancer" in payload and payload["cancer"] is True:
+                count += 1
+                continue
+                
+            # Genes collection: check 'Text' field
+            if "Text" in payload and isinstance(payload["Text"], str):
+                text_lower = payload["Text"].lower()
+                # Check for cancer keywords AND confirmation terms
+                has_cancer = any(keyword in text_lower for keyword in cancer_keywords[:5])  # cancer-related terms
+                has_confirmation = any(keyword in text_lower for keyword in cancer_keywords[5:])  # confirmation terms
+                if has_cancer and has_confirmation:
+                    count += 1
+                    continue
+                    
+            # Proteins collection: check 'chunk_text' field (French)
+            if "chunk_text" in payload and isinstance(payload["chunk_text"], str):
+                text_lower = payload["chunk_text"].lower()
+                has_cancer = any(keyword in text_lower for keyword in cancer_keywords[:5])
+                has_confirmation = any(keyword in text_lower for keyword in cancer_keywords[5:])
+                if has_cancer and has_confirmation:
+                    count += 1
+                    
+        except Exception as e:
+            logger.warning(f"Error processing case for cancer detection: {str(e)}")
+            continue
+            
+    logger.info(f"Cancer case count: {count} out of {len(cases)} total cases")
+    return count
+
+
+def legacy_extract_protein_biomarkers(protein_cases: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Pre-scanner implementation of rag.extract_protein_biomarkers, kept verbatim for comparison."""
+    if not protein_cases:
+        return {"er_positive": 0, "pr_positive": 0, "her2_positive": 0, "ki67_high": 0}
+    
+    # Initialize counters
+    er_positive = pr_positive = her2_positive = ki67_high = 0
+    
+    # Define comprehensive biomarker patterns
+    er_patterns = [
+        r'er\s*\+', r'er\s*positif', r'er\s*positive',
+        r'récepteur\s*œstrogène\s*positif', r'estrogen\s*receptor\s*positive',
+        r'œstrogène\s*positif', r'oestrogen\s*receptor\s*positive'
+    ]
+    
+    pr_patterns = [
+        r'pr\s*\+', r'pr\s*positif', r'pr\s*positive',
+        r'récepteur\s*progestérone\s*positif', r'progesterone\s*receptor\s*positive',
+        r'progestérone\s*positif'
+    ]
+    
+    her2_patterns = [
+        r'her2\s*\+', r'her-2\s*\+', r'her2\s*positif', r'her-2\s*positif',
+        r'her2\s*positive', r'her-2\s*positive',
+        r'human\s*epidermal\s*growth\s*factor\s*receptor\s*2\s*positive'
+    ]
+    
+    ki67_patterns = [
+        r'ki67', r'ki-67', r'k.i.67'
+    ]
+    ki67_high_indicators = [
+        r'élevé', r'high', r'fort', r'élevée', r'highly', r'grade\s*[23]', r'grade\s*ii', r'grade\s*iii'
+    ]
+    
+    for case in protein_cases:
+        try:
+            payload = case.get("payload", {})
+            text = payload.get("chunk_text", "")
+            if not isinstance(text, str):
+                continue
+                
+            text_lower = text.lower()
+            
+            # ER detection
+            if any(re.search(pattern, text_lower) for pattern in er_patterns):
+                er_positive += 1
+                
+            # PR detection  
+            if any(re.search(pattern, text_lower) for pattern in pr_patterns):
+                pr_positive += 1
+                
+            # HER2 detection
+            if any(re.search(pattern, text_lower) for pattern in her2_patterns):
+                her2_positive += 1
+                
+            # Ki67 detection (requires both Ki67 mention AND high indicator)
+            has_ki67 = any(re.search(pattern, text_lower) for pattern in ki67_patterns)
+            has_high_indicator = any(re.search(pattern, text_lower) for pattern in ki67_high_indicators)
+            if has_ki67 and has_high_indicator:
+                ki67_high += 1
+                
+        except Exception as e:
+            logger.warning(f"Error extracting protein biomarkers from case: {str(e)}")
+            continue
+    
+    result = {
+        "er_positive": er_positive,
+        "pr_positive": pr_positive, 
+        "her2_positive": her2_positive,
+        "ki67_high": ki67_high
+    }
+    
+    logger.info(f"Protein biomarker extraction: {result}")
+    return result
+
+
+def legacy_extract_gene_mutations(gene_cases: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Pre-scanner implementation of rag.extract_gene_mutations, kept verbatim for comparison."""
+    if not gene_cases:
+        return {"brca1_mutated": 0, "brca2_mutated": 0}
+    
+    brca1_mutated = brca2_mutated = 0
+    
+    # BRCA detection patterns
+    brca1_patterns = [r'brca1', r'breast\s*cancer\s*1']
+    brca2_patterns = [r'brca2', r'breast\s*cancer\s*2']
+    
+    mutation_indicators = [
+        'mutation', 'mutated', 'muté', 'positif', 'positive', 
+        'anormal', 'abnormal', 'défectueux', 'defective'
+    ]
+    
+    for case in gene_cases:
+        try:
+            payload = case.get("payload", {})
+            
+            # Check Text field
+            text = payload.get("Text", "")
+            if isinstance(text, str):
+                text_lower = text.lower()
+                
+                # BRCA1 detection
+                has_brca1 = any(re.search(pattern, text_lower) for pattern in brca1_patterns)
+                has_mutation = any(indicator in text_lower for indicator in mutation_indicators)
+                if has_brca1 and has_mutation:
+                    brca1_mutated += 1
+                    
+                # BRCA2 detection  
+                has_brca2 = any(re.search(pattern, text_lower) for pattern in brca2_patterns)
+                if has_brca2 and has_mutation:
+                    brca2_mutated += 1
+            
+            # Check DNA array
+            dna_array = payload.get("DNA", [])
+            if isinstance(dna_array, list):
+                dna_str = " ".join(str(item) for item in dna_array).lower()
+                if any(re.search(pattern, dna_str) for pattern in brca1_patterns):
+                    brca1_mutated += 1
+                if any(re.search(pattern, dna_str) for pattern in brca2_patterns):
+                    brca2_mutated += 1
+                    
+        except Exception as e:
+            logger.warning(f"Error extracting gene mutations from case: {str(e)}")
+            continue
+    
+    result = {
+        "brca1_mutated": brca1_mutated,
+        "brca2_mutated": brca2_mutated
+    }
+    
+    logger.info(f"Gene mutation extraction: {result}")
+    return result
+
+
+def load_ocr_texts():
+    """Read the shipped pathology OCR reports."""
+    paths = sorted(glob.glob(os.path.join(REPO_ROOT, "Pathology_Report", "data", "breast_dataset", "ocr_text", "*.txt")))
+    texts = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            texts.append(f.read())
+    return texts
+
+def load_protein_chunks():
+    """Render the shipped clinical data into protein chunk texts, as Proteine_Mutation does."""
+    df = pd.read_csv(os.path.join(REPO_ROOT, "Proteine_Mutation", "clinical_data.csv"), sep="\t")
+    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+    df = df.fillna("Unknown")
+    for col in ["er_status", "pr_status", "her2_status"]:
+        df[col] = df[col].astype(str).str.strip().str.capitalize()
+    for col in ["rppa_cluster", "pam50_subtype", "tumor_stage", "cancer_type_detailed"]:
+        if col not in df.columns:
+            df[col] = "Unknown"
+    return [generate_chunk(row) for _, row in df.iterrows()]
+
+def build_cases():
+    """Build gene and protein result lists shaped like Qdrant hits."""
+    ocr_texts = load_ocr_texts()
+    protein_texts = load_protein_chunks()
+    gene_cases = [{"payload": {"Text": text, "DNA": ["ACGTTGCA" * 8, "TTGACCGA" * 8]}} for text in ocr_texts]
+    protein_cases = [{"payload": {"chunk_text": text}} for text in protein_texts + ocr_texts]
+    return gene_cases, protein_cases
+
+def summarize_legacy(gene_cases, protein_cases):
+    return (
+        legacy_count_cancer_cases(gene_cases + protein_cases),
+        legacy_extract_protein_biomarkers(protein_cases),
+        legacy_extract_gene_mutations(gene_cases)
+    )
+
+def summarize_scanner(gene_cases, protein_cases):
+    return (
+        rag.count_cancer_cases(gene_cases + protein_cases),
+        rag.extract_protein_biomarkers(protein_cases),
+        rag.extract_gene_mutations(gene_cases)
+    )
+
+def best_time(fn, repeat, before=None):
+    """Best wall time of fn() over repeat runs, calling before() ahead of each run."""
+    best = float("inf")
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rag.py single-pass scanner")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger(rag.__name__).setLevel(logging.WARNING)
+    gene_cases, protein_cases = build_cases()
+    n_cases = len(gene_cases) + len(protein_cases)
+
+    legacy_result = summarize_legacy(gene_cases, protein_cases)
+    scanner_result = summarize_scanner(gene_cases, protein_cases)
+    assert legacy_result == scanner_result, f"Results differ: {legacy_result} != {scanner_result}"
+    print(f"{len(gene_cases)} gene cases, {len(protein_cases)} protein cases, identical results: {scanner_result}")
+
+    legacy = best_time(lambda: summarize_legacy(gene_cases, protein_cases), args.repeat)
+    cold = best_time(lambda: summarize_scanner(gene_cases, protein_cases), args.repeat, before=rag.scan_text.cache_clear)
+    warm = best_time(lambda: summarize_scanner(gene_cases, protein_cases), args.repeat)
+
+    for label, seconds in [("per-pattern (previous)", legacy), ("scanner, cold cache", cold), ("scanner, warm cache", warm)]:
+        print(f"{label:<24} {seconds * 1000:8.2f} ms  {seconds / n_cases * 1e6:7.2f} us/case  x{legacy / seconds:5.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+# qdrant_common/aliases.py
+"""
+Blue/green reindexing with Qdrant collection aliases.
+
+The names the backend searches (PathologyImage, breast_cancer_genes_mutation,
+breast_cancer_protein_profiles, breast_cancer_patients) are aliases pointing to
+versioned physical collections, the generations: "<alias>__v<UTC timestamp>", e.g.
+PathologyImage__v20250101T020000.
+
+A full reindex builds a new generation next to the live one, then switches the
+alias in a single update_collection_aliases request, so searches go from the old
+generation to the complete new one without ever seeing an empty or half-built
+collection. Incremental refreshes (see incremental.py) write through the alias
+into the live generation.
+
+Before switching, publish_generation() waits until Qdrant has applied every upsert
+and finished indexing the new generation (status green, HNSW index caught up) and
+checks that it holds the expected number of points; a generation that is short of
+points, or not ready after PUBLISH_TIMEOUT_SECONDS, is never made live.
+
+The previous generations are kept (GENERATIONS_TO_KEEP, default 2, the live one
+included) so a bad reindex can be rolled back by switching the alias back; older
+generations are deleted by garbage_collect(), never the one the alias points to.
+
+A deployment created before aliases has a physical collection with the alias name.
+The first switch deletes it and creates the alias right after; this is the only
+moment a search can fail, and it happens once.
+
+Command line:
+    python -m qdrant_common.aliases status [ALIAS ...]
+    python -m qdrant_common.aliases rollback ALIAS [--to GENERATION]
+    python -m qdrant_common.aliases gc [ALIAS ...] [--keep N]
+"""
+
+import os
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from qdrant_client.models import (
+    CollectionStatus,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation
+)
+from .payload_indexes import create_payload_indexes
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GENERATION_SEPARATOR = "__v"
+GENERATIONS_TO_KEEP = int(os.getenv("GENERATIONS_TO_KEEP", "2"))
+PUBLISH_TIMEOUT_SECONDS = float(os.getenv("PUBLISH_TIMEOUT_SECONDS", "1800"))
+PUBLISH_POLL_SECONDS = float(os.getenv("PUBLISH_POLL_SECONDS", "2"))
+
+# Aliases managed by the ingestion scripts (the collections searched by the backend)
+ALIASES = (
+    "breast_cancer_genes_mutation",
+    "breast_cancer_protein_profiles",
+    "PathologyImage",
+    "breast_cancer_patients"
+)
+
+def _collection_names(client) -> List[str]:
+    return [collection.name for collection in client.get_collections().collections]
+
+def alias_target(client, alias: str) -> Optional[str]:
+    """Physical collection an alias points to, or None if the alias does not exist."""
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+def resolve_collection(client, name: str) -> Optional[str]:
+    """
+    Physical collection behind a name: the alias target, the collection itself, or None.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        name (str): Alias or collection name
+
+    Returns:
+        Optional[str]: Physical collection name, None if nothing has this name
+    """
+    target = alias_target(client, name)
+    if target is not None:
+        return target
+    return name if name in _collection_names(client) else None
+
+def list_generations(client, alias: str) -> List[str]:
+    """Generations of an alias, oldest first."""
+    prefix = alias + GENERATION_SEPARATOR
+    return sorted(name for name in _collection_names(client) if name.startswith(prefix))
+
+def create_generation(client, alias: str, config: Dict[str, Any]) -> str:
+    """
+    Create an empty generation of an alias (with its payload indexes), not yet live.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        alias (str): Alias the generation will be published under
+        config (Dict[str, Any]): create_collection keyword arguments (see collection_profiles)
+
+    Returns:
+        str: Name of the new generation
+    """
+    name = f"{alias}{GENERATION_SEPARATOR}{datetime.now(timezone.utc):%Y%m%dT%H%M%S}"
+    if name in _collection_names(client):
+        raise ValueError(f"Generation '{name}' already exists")
+    client.create_collection(collection_name=name, **config)
+    create_payload_indexes(client, name, index_set=alias)
+    logger.info(f"Generation '{name}' created for alias '{alias}'")
+    return name
+
+def switch_alias(client, alias: str, collection_name: str) -> Optional[str]:
+    """
+    Atomically point an alias at a collection.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        alias (str): Alias name
+        collection_name (str): Collection the alias must point to
+
+    Returns:
+        Optional[str]: Collection the alias pointed to before, if any
+    """
+    previous = alias_target(client, alias)
+    operations = []
+    if previous is not None:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+    elif alias in _collection_names(client):
+        # Pre-alias deployment: the live data is a physical collection with the alias name
+        logger.warning(f"Replacing the physical collection '{alias}' by an alias (one-time migration)")
+        client.delete_collection(alias)
+    operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=collection_name, alias_name=alias)))
+
+    # Delete and create are applied together, so searches never see the alias missing
+    client.update_collection_aliases(change_aliases_operations=operations)
+    logger.info(f"Alias '{alias}' switched from '{previous}' to '{collection_name}'")
+    return previous
+
+def _vector_dims(params) -> int:
+    """Total dimension of a collection's vectors (single or named vectors)."""
+    vectors = params.vectors
+    if isinstance(vectors, dict):
+        return sum(vector.size for vector in vectors.values())
+    return vectors.size
+
+def _index_caught_up(info) -> bool:
+    """
+    Whether every vector that Qdrant will index is indexed.
+
+    Segments smaller than the optimizer's indexing_threshold (in KB) are searched
+    without an index and never show up in indexed_vectors_count, so a collection
+    whose segments are below it is complete as soon as the points are applied.
+    """
+    if (info.indexed_vectors_count or 0) >= (info.vectors_count or 0):
+        return True
+    threshold = info.config.optimizer_config.indexing_threshold
+    if not threshold or info.config.hnsw_config.m == 0:
+        return True
+    segment_kb = (info.points_count or 0) * _vector_dims(info.config.params) * 4 / 1024 / max(1, info.segments_count)
+    return segment_kb < threshold
+
+def wait_until_ready(
+    client,
+    collection_name: str,
+    expected_count: int,
+    timeout: float = PUBLISH_TIMEOUT_SECONDS,
+    poll_interval: float = PUBLISH_POLL_SECONDS
+) -> None:
+    """
+    Wait until a collection is fully applied and indexed.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        collection_name (str): Collection name
+        expected_count (int): Number of points the collection must hold
+        timeout (float): Maximum wait, in seconds
+        poll_interval (float): Delay between two get_collection calls, in seconds
+
+    Raises:
+        ValueError: If the collection does not hold expected_count points once
+            optimizations are done
+        TimeoutError: If the collection is still being optimized or indexed after timeout
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        info = client.get_collection(collection_name)
+        if info.status == CollectionStatus.GREEN and _index_caught_up(info):
+            count = client.count(collection_name=collection_name, exact=True).count
+            if count != expected_count:
+                raise ValueError(f"'{collection_name}' holds {count} points, {expected_count} expected")
+            return
+        if time.monotonic() >= deadline:
+            raise TimeoutError(
+                f"'{collection_name}' not ready after {timeout:.0f}s (status {info.status}, "
+                f"{info.indexed_vectors_count}/{info.vectors_count} vectors indexed)"
+            )
+        logger.info(
+            f"Waiting for '{collection_name}' (status {info.status}, "
+            f"{info.indexed_vectors_count}/{info.vectors_count} vectors indexed)"
+        )
+        time.sleep(poll_interval)
+
+def garbage_collect(client, alias: str, keep: int = GENERATIONS_TO_KEEP) -> List[str]:
+    """
+    Delete the oldest generations of an alias, keeping the newest `keep` and the live one.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        alias (str): Alias name
+        keep (int): Generations kept, the live one included
+
+    Returns:
+        List[str]: Deleted generations
+    """
+    live = alias_target(client, alias)
+    generations = list_generations(client, alias)
+    kept = set(generations[-keep:]) if keep > 0 else set()
+    deleted = [name for name in generations if name not in kept and name != live]
+    for name in deleted:
+        client.delete_collection(name)
+        logger.info(f"Generation '{name}' of alias '{alias}' deleted")
+    return deleted
+
+def publish_generation(
+    client,
+    alias: str,
+    collection_name: str,
+    expected_count: int,
+    keep: int = GENERATIONS_TO_KEEP
+) -> Optional[str]:
+    """
+    Make a generation live once it is complete, then garbage-collect old generations.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        alias (str): Alias name
+        collection_name (str): Generation to publish
+        expected_count (int): Number of points the generation must hold
+        keep (int): Generations kept, the live one included
+
+    Returns:
+        Optional[str]: Collection the alias pointed to before, if any
+
+    Raises:
+        ValueError, TimeoutError: See wait_until_ready; the alias is left unchanged
+    """
+    wait_until_ready(client, collection_name, expected_count)
+    previous = switch_alias(client, alias, collection_name)
+    garbage_collect(client, alias, keep)
+    return previous
+
+def rollback(client, alias: str, to: Optional[str] = None) -> str:
+    """
+    Point an alias back at an earlier generation.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        alias (str): Alias name
+        to (Optional[str]): Generation to restore, default the one before the live one
+
+    Returns:
+        str: Generation the alias now points to
+
+    Raises:
+        ValueError: If there is no earlier generation, or `to` is not a generation of the alias
+    """
+    generations = list_generations(client, alias)
+    live = alias_target(client, alias)
+    if to is None:
+        earlier = [name for name in generations if live is None or name < live]
+        if not earlier:
+            raise ValueError(f"No generation of '{alias}' older than '{live}' to roll back to")
+        to = earlier[-1]
+    elif to not in generations:
+        raise ValueError(f"'{to}' is not a generation of '{alias}'. Available: {generations}")
+
+    switch_alias(client, alias, to)
+    return to
+
+def status(client, alias: str) -> Dict[str, Any]:
+    """Live generation and all generations of an alias, with their point counts."""
+    live = alias_target(client, alias)
+    return {
+        "alias": alias,
+        "live": live,
+        "generations": {
+            name: client.count(collection_name=name, exact=False).count
+            for name in list_generations(client, alias)
+        }
+    }
+
+if __name__ == "__main__":
+    from qdrant_client import QdrantClient
+
+    parser = argparse.ArgumentParser(description="Manage the blue/green generations of the Qdrant collections")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    status_parser = subparsers.add_parser("status", help="Show the live and stored generations")
+    status_parser.add_argument("aliases", nargs="*", default=list(ALIASES))
+    rollback_parser = subparsers.add_parser("rollback", help="Switch an alias back to an earlier generation")
+    rollback_parser.add_argument("alias")
+    rollback_parser.add_argument("--to", help="Generation to restore (default: the previous one)")
+    gc_parser = subparsers.add_parser("gc", help="Delete old generations")
+    gc_parser.add_argument("aliases", nargs="*", default=list(ALIASES))
+    gc_parser.add_argument("--keep", type=int, default=GENERATIONS_TO_KEEP)
+    args = parser.parse_args()
+
+    client = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"), timeout=60.0)
+    if args.command == "status":
+        for alias in args.aliases:
+            info = status(client, alias)
+            print(f"{alias} → {info['live'] or '(no alias)'}")
+            for name, count in info["generations"].items():
+                print(f"  {'*' if name == info['live'] else ' '} {name} ({count} points)")
+    elif args.command == "rollback":
+        print(f"{args.alias} → {rollback(client, args.alias, args.to)}")
+    else:
+        for alias in args.aliases:
+            deleted = garbage_collect(client, alias, args.keep)
+            print(f"{alias}: {len(deleted)} generations deleted")
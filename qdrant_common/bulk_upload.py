@@ -0,0 +1,183 @@
+# qdrant_common/bulk_upload.py
+"""
+Parallel bulk upload shared by the ingestion scripts.
+
+Points are streamed into a collection without building the full list of
+PointStruct objects first:
+- vectors and payloads are consumed lazily (a NumPy array, possibly memory-mapped
+  with np.load(..., mmap_mode="r"), a generator, or any iterable) and grouped into
+  batches of UPLOAD_BATCH_SIZE points
+- up to UPLOAD_PARALLEL batches are in flight at once, each sent as one columnar
+  upsert with wait=False (Qdrant acknowledges once the update is written to its
+  WAL, indexing continues in the background)
+- a failed batch is retried UPLOAD_MAX_RETRIES times with exponential backoff
+  (UPLOAD_RETRY_DELAY_SECONDS, doubled after each attempt) before the upload fails
+- progress (points sent, points/s) is logged every UPLOAD_LOG_EVERY batches
+
+At most 2 × parallel batches are held in memory, so memory use does not depend on
+the cohort size. wait=True makes every request wait until its points are applied
+(visible to searches and counts), at the cost of throughput; it does not wait for
+the HNSW index, see aliases.wait_until_ready for that. Fill a new generation with
+wait=True so it can be checked before it is published, and refresh with wait=True
+before bumping the ingestion stamp (see incremental.finish_refresh).
+
+Example:
+    >>> vectors = np.load("patient_embeddings.npy", mmap_mode="r")
+    >>> upload_points(client, "breast_cancer_genes_mutation", vectors, payloads)
+"""
+
+import os
+import time
+import uuid
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as wait_futures
+from itertools import islice, repeat
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
+import numpy as np
+from qdrant_client.models import Batch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+UPLOAD_BATCH_SIZE = int(os.getenv("UPLOAD_BATCH_SIZE", "256"))
+UPLOAD_PARALLEL = int(os.getenv("UPLOAD_PARALLEL", "4"))
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", "5"))
+UPLOAD_RETRY_DELAY_SECONDS = float(os.getenv("UPLOAD_RETRY_DELAY_SECONDS", "1.0"))
+UPLOAD_LOG_EVERY = int(os.getenv("UPLOAD_LOG_EVERY", "10"))
+
+PointId = Union[int, str]
+Record = Tuple[Optional[PointId], Any, Dict[str, Any]]
+
+def _batches(records: Iterable[Record], batch_size: int) -> Iterator[Batch]:
+    """Group (id, vector, payload) records into columnar Batch objects."""
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, batch_size))
+        if not chunk:
+            return
+        ids, vectors, payloads = zip(*chunk)
+        yield Batch(
+            ids=[point_id if point_id is not None else str(uuid.uuid4()) for point_id in ids],
+            vectors=np.asarray(vectors, dtype=np.float32).tolist(),
+            payloads=list(payloads)
+        )
+
+def _upsert_with_retry(
+    client,
+    collection_name: str,
+    batch: Batch,
+    wait: bool,
+    max_retries: int,
+    retry_delay: float
+) -> int:
+    """Upsert one batch, retrying with exponential backoff. Returns the number of points."""
+    for attempt in range(max_retries + 1):
+        try:
+            client.upsert(collection_name=collection_name, points=batch, wait=wait)
+            return len(batch.ids)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = retry_delay * 2 ** attempt
+            logger.warning(
+                f"Upsert of {len(batch.ids)} points into '{collection_name}' failed "
+                f"(attempt {attempt + 1}/{max_retries + 1}), retrying in {delay:.1f}s: {str(e)}"
+            )
+            time.sleep(delay)
+
+def upload_records(
+    client,
+    collection_name: str,
+    records: Iterable[Record],
+    batch_size: int = UPLOAD_BATCH_SIZE,
+    parallel: int = UPLOAD_PARALLEL,
+    max_retries: int = UPLOAD_MAX_RETRIES,
+    retry_delay: float = UPLOAD_RETRY_DELAY_SECONDS,
+    wait: bool = False,
+    total: Optional[int] = None
+) -> int:
+    """
+    Stream (id, vector, payload) records into a collection in parallel batches.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        collection_name (str): Target collection (must exist)
+        records (Iterable[Record]): (id, vector, payload) tuples; a None id gets a uuid4
+        batch_size (int): Points per upsert request
+        parallel (int): Upsert requests in flight at once (1 for sequential uploads,
+            e.g. with an in-memory client)
+        max_retries (int): Retries of a failed batch before the upload fails
+        retry_delay (float): Delay before the first retry, in seconds (then doubled)
+        wait (bool): Wait for every batch to be applied before it is acknowledged
+        total (Optional[int]): Expected number of points, only used in progress logs
+
+    Returns:
+        int: Number of points uploaded
+
+    Raises:
+        Exception: The last error of a batch that failed after all retries
+    """
+    start = time.perf_counter()
+    uploaded = 0
+    batches_done = 0
+    expected = f"/{total}" if total is not None else ""
+
+    def log_progress():
+        elapsed = time.perf_counter() - start
+        rate = uploaded / elapsed if elapsed > 0 else 0.0
+        logger.info(f"'{collection_name}': {uploaded}{expected} points uploaded ({rate:.0f} points/s)")
+
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        pending = set()
+        try:
+            for batch in _batches(records, batch_size):
+                # Bound the batches held in memory: wait for a slot before reading more input
+                while len(pending) >= 2 * max(1, parallel):
+                    done, pending = wait_futures(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        uploaded += future.result()
+                        batches_done += 1
+                        if batches_done % UPLOAD_LOG_EVERY == 0:
+                            log_progress()
+                pending.add(executor.submit(
+                    _upsert_with_retry, client, collection_name, batch, wait, max_retries, retry_delay
+                ))
+
+            for future in pending:
+                uploaded += future.result()
+            pending = set()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    log_progress()
+    return uploaded
+
+def upload_points(
+    client,
+    collection_name: str,
+    vectors: Union[np.ndarray, Iterable[Sequence[float]]],
+    payloads: Iterable[Dict[str, Any]],
+    ids: Optional[Iterable[PointId]] = None,
+    **kwargs
+) -> int:
+    """
+    Stream vectors and their payloads into a collection (see upload_records).
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        collection_name (str): Target collection (must exist)
+        vectors (Union[np.ndarray, Iterable]): One vector per point; a memory-mapped
+            array is read batch by batch
+        payloads (Iterable[Dict[str, Any]]): One payload per point, in the same order
+        ids (Optional[Iterable[PointId]]): Point IDs, uuid4 if omitted
+        **kwargs: batch_size, parallel, max_retries, retry_delay, wait, total
+
+    Returns:
+        int: Number of points uploaded
+    """
+    if "total" not in kwargs and isinstance(vectors, np.ndarray):
+        kwargs["total"] = len(vectors)
+    ids = ids if ids is not None else repeat(None)
+    return upload_records(client, collection_name, zip(ids, vectors, payloads), **kwargs)
@@ -0,0 +1,144 @@
+# qdrant_common/collection_profiles.py
+"""
+Collection storage profiles shared by ingestion scripts and the backend.
+
+A profile fixes how a collection stores its vectors and how it is searched:
+- "default": fp32 vectors in RAM, no quantization (the original setup)
+- "scalar_int8": int8 scalar quantization kept in RAM next to the fp32 vectors
+  (about 4x less memory for the search structure)
+- "binary": 1-bit binary quantization kept in RAM (about 32x less memory);
+  best suited to high-dimensional embeddings such as the 844D gene vectors
+- "on_disk_scalar": fp32 originals memory-mapped on disk, int8 quantized copies
+  in RAM, so RAM grows with the quantized size only
+
+Quantized profiles search the quantized vectors first, fetch limit × oversampling
+candidates, and rescore them with the original vectors, which recovers most of the
+fp32 ranking quality.
+
+The ingestion scripts read COLLECTION_PROFILE (default "default") when creating a
+collection; the backend reads SEARCH_PROFILE, or SEARCH_PROFILE_<COLLECTION> for a
+single collection, to build matching search parameters.
+"""
+
+import os
+from typing import Any, Dict, Optional
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    HnswConfigDiff,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams
+)
+
+COLLECTION_PROFILES = {
+    "default": {
+        "on_disk": False,
+        "quantization": None,
+        "oversampling": 1.0
+    },
+    "scalar_int8": {
+        "on_disk": False,
+        "quantization": "scalar",
+        "oversampling": 2.0
+    },
+    "binary": {
+        "on_disk": False,
+        "quantization": "binary",
+        "oversampling": 3.0
+    },
+    "on_disk_scalar": {
+        "on_disk": True,
+        "quantization": "scalar",
+        "oversampling": 2.0
+    }
+}
+
+def get_profile(name: str) -> Dict[str, Any]:
+    """
+    Look up a collection profile by name.
+
+    Args:
+        name (str): Profile name
+
+    Returns:
+        Dict[str, Any]: Profile settings
+
+    Raises:
+        ValueError: If the profile does not exist
+    """
+    if name not in COLLECTION_PROFILES:
+        raise ValueError(f"Unknown collection profile '{name}'. Available: {sorted(COLLECTION_PROFILES)}")
+    return COLLECTION_PROFILES[name]
+
+def collection_config(size: int, profile: str = "default", m: int = 16, ef_construct: int = 200) -> Dict[str, Any]:
+    """
+    Build create_collection / recreate_collection keyword arguments for a profile.
+
+    Args:
+        size (int): Vector dimension
+        profile (str): Profile name
+        m (int): HNSW graph degree
+        ef_construct (int): HNSW construction beam width
+
+    Returns:
+        Dict[str, Any]: vectors_config, hnsw_config and quantization_config
+
+    Example:
+        >>> client.create_collection(collection_name="PathologyImage", **collection_config(512, "scalar_int8"))
+    """
+    settings = get_profile(profile)
+
+    quantization_config = None
+    if settings["quantization"] == "scalar":
+        quantization_config = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    elif settings["quantization"] == "binary":
+        quantization_config = BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+
+    return {
+        "vectors_config": VectorParams(size=size, distance=Distance.COSINE, on_disk=settings["on_disk"]),
+        "hnsw_config": HnswConfigDiff(m=m, ef_construct=ef_construct, on_disk=False),
+        "quantization_config": quantization_config
+    }
+
+def search_params(profile: str = "default", oversampling: Optional[float] = None) -> Optional[SearchParams]:
+    """
+    Build search parameters matching a profile (rescoring with oversampling when quantized).
+
+    Args:
+        profile (str): Profile the collection was created with
+        oversampling (Optional[float]): Candidates fetched per result before rescoring,
+            overriding the profile default
+
+    Returns:
+        Optional[SearchParams]: Search parameters, or None for unquantized profiles
+    """
+    settings = get_profile(profile)
+    if settings["quantization"] is None:
+        return None
+
+    return SearchParams(
+        quantization=QuantizationSearchParams(
+            ignore=False,
+            rescore=True,
+            oversampling=oversampling if oversampling is not None else settings["oversampling"]
+        )
+    )
+
+def profile_for(collection_name: str) -> str:
+    """
+    Profile a collection is searched with: SEARCH_PROFILE_<COLLECTION>, else SEARCH_PROFILE, else "default".
+
+    Args:
+        collection_name (str): Collection name
+
+    Returns:
+        str: Profile name
+    """
+    return os.getenv(f"SEARCH_PROFILE_{collection_name.upper()}") or os.getenv("SEARCH_PROFILE", "default")
@@ -0,0 +1,240 @@
+# qdrant_common/incremental.py
+"""
+Incremental, idempotent re-ingestion shared by the upload scripts.
+
+Every point gets a deterministic uuid5 ID derived from its collection and its
+record key (case_id for pathology images, Patient_ID for genes, patient_id for
+proteins), so uploading the same record twice overwrites one point instead of
+creating a duplicate.
+
+Each pipeline keeps a manifest, a JSON file mapping point IDs to a content hash
+(SHA-256 of the payload and of whatever the vector is computed from). A refresh:
+1. hashes the current records and compares them with the manifest
+2. embeds (when the pipeline embeds at upload time) and upserts only new or
+   changed records; unchanged records are not touched
+3. deletes the points of records that disappeared
+4. bumps the collection's ingestion stamp (see ingestion_stamps.py), so the
+   backend drops cached search responses, and writes the new manifest once every
+   upsert and delete succeeded
+
+Refreshes write through the collection alias into the live generation, which stays
+searchable meanwhile. A first run, or a full rebuild, fills a new generation
+instead and publishes it once complete (blue/green, see aliases.py). The hash is
+also stored in the "content_hash" payload field: when the manifest file is missing
+(first run, other machine) or was written for another generation (after a rollback),
+it is rebuilt by scrolling the collection, and points without a hash (e.g. uploaded
+with random IDs by an older version) are treated as removed.
+
+A refresh therefore costs O(changes) in embedding and upload, plus one hashing
+pass over the cohort.
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from qdrant_client.models import PointIdsList
+from .aliases import create_generation, publish_generation, resolve_collection
+from .ingestion_stamps import bump_stamp
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONTENT_HASH_FIELD = "content_hash"
+DELETE_BATCH_SIZE = 1000
+
+def point_id(collection_name: str, key: Any) -> str:
+    """Deterministic point ID of a record key in a collection (same key → same ID across refreshes)."""
+    namespace = uuid.uuid5(uuid.NAMESPACE_URL, f"tawhida/{collection_name}")
+    return str(uuid.uuid5(namespace, str(key)))
+
+def content_hash(*parts: Any) -> str:
+    """
+    SHA-256 of the parts a point is built from.
+
+    Args:
+        *parts: JSON-serializable values (payloads), bytes (file contents) or
+            NumPy arrays (vectors)
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            data = part
+        elif hasattr(part, "tobytes"):
+            data = part.tobytes()
+        else:
+            data = json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.hexdigest()
+
+def prepare_collection(client, collection_name: str, config: Dict[str, Any], full: bool = False) -> str:
+    """
+    Choose the collection a refresh writes into.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        collection_name (str): Alias searched by the backend
+        config (Dict[str, Any]): create_collection keyword arguments (see collection_profiles)
+        full (bool): Rebuild everything into a new generation, even if the collection exists
+
+    Returns:
+        str: collection_name for an in-place refresh, or the name of a new empty
+            generation to publish with finish_refresh() once filled
+    """
+    if not full and resolve_collection(client, collection_name) is not None:
+        return collection_name
+    return create_generation(client, collection_name, config)
+
+def finish_refresh(
+    client,
+    collection_name: str,
+    target: str,
+    manifest_path: str,
+    manifest: Dict[str, str]
+) -> None:
+    """
+    Publish the target generation if the refresh built one, bump the ingestion stamp,
+    then save the manifest. Call it once every upsert (with wait=True) and delete is applied.
+
+    A new generation is only published once it holds exactly the manifest's points
+    (see publish_generation); otherwise the error propagates, the alias and the
+    manifest are left unchanged.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        collection_name (str): Alias searched by the backend
+        target (str): Collection returned by prepare_collection
+        manifest_path (str): Manifest file
+        manifest (Dict[str, str]): Point ID → hash of the collection content
+    """
+    if target != collection_name:
+        publish_generation(client, collection_name, target, expected_count=len(manifest))
+    bump_stamp(client, collection_name)
+    save_manifest(manifest_path, collection_name, resolve_collection(client, collection_name), manifest)
+
+def manifest_from_collection(client, collection_name: str, batch_size: int = 1000) -> Dict[str, str]:
+    """
+    Rebuild a manifest from the content_hash payload field of a collection.
+
+    Points without a hash get an empty one, so the next refresh deletes or replaces them.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        collection_name (str): Collection name
+        batch_size (int): Points per scroll request
+
+    Returns:
+        Dict[str, str]: Point ID → content hash
+    """
+    manifest = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=[CONTENT_HASH_FIELD],
+            with_vectors=False
+        )
+        for point in points:
+            manifest[str(point.id)] = (point.payload or {}).get(CONTENT_HASH_FIELD, "")
+        if offset is None:
+            break
+    return manifest
+
+def load_manifest(client, collection_name: str, target: str, manifest_path: str) -> Dict[str, str]:
+    """
+    Load the manifest of the collection a refresh writes into.
+
+    A new generation is empty. Otherwise the manifest file is used if it was written
+    for the generation currently behind the alias, and rebuilt from the collection
+    if not.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        collection_name (str): Alias searched by the backend
+        target (str): Collection returned by prepare_collection
+        manifest_path (str): Manifest file
+
+    Returns:
+        Dict[str, str]: Point ID → content hash
+    """
+    if target != collection_name:
+        return {}
+
+    generation = resolve_collection(client, collection_name)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("collection") == collection_name and manifest.get("generation") == generation:
+            return manifest["points"]
+        logger.warning(f"Manifest {manifest_path} was written for '{manifest.get('generation')}', "
+                       f"not '{generation}', ignoring it")
+
+    logger.info(f"No manifest for '{generation}', rebuilding it from the collection")
+    return manifest_from_collection(client, collection_name)
+
+def save_manifest(manifest_path: str, collection_name: str, generation: str, manifest: Dict[str, str]) -> None:
+    """Write a manifest atomically (a failed write leaves the previous one intact)."""
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"collection": collection_name, "generation": generation, "points": manifest}, f)
+    os.replace(tmp_path, manifest_path)
+
+def diff_manifest(manifest: Dict[str, str], current: Dict[str, str]) -> Tuple[Set[str], List[str]]:
+    """
+    Compare the stored manifest with the current records.
+
+    Args:
+        manifest (Dict[str, str]): Point ID → hash of the collection content
+        current (Dict[str, str]): Point ID → hash of the current records
+
+    Returns:
+        Tuple[Set[str], List[str]]: IDs to upsert (new or changed), IDs to delete
+    """
+    changed = {pid for pid, digest in current.items() if manifest.get(pid) != digest}
+    removed = [pid for pid in manifest if pid not in current]
+    return changed, removed
+
+def unique_keys(collection_name: str, keys: Iterable[Any]) -> List[str]:
+    """
+    Point IDs of record keys, in order; "" for a missing or repeated key.
+
+    Only the first record of a key is ingested (as when merging patients), so a key
+    is never written twice in one refresh.
+    """
+    seen = set()
+    ids = []
+    skipped = 0
+    for key in keys:
+        pid = point_id(collection_name, key) if key not in (None, "") else ""
+        if not pid or pid in seen:
+            skipped += 1
+            ids.append("")
+            continue
+        seen.add(pid)
+        ids.append(pid)
+    if skipped:
+        logger.warning(f"'{collection_name}': {skipped} records without a key or with a repeated key were skipped")
+    return ids
+
+def delete_points(client, collection_name: str, ids: List[str], batch_size: int = DELETE_BATCH_SIZE) -> int:
+    """Delete points by ID in batches. Returns the number of IDs deleted."""
+    for i in range(0, len(ids), batch_size):
+        client.delete(collection_name=collection_name, points_selector=PointIdsList(points=ids[i:i + batch_size]))
+    return len(ids)
+
+def log_refresh(collection_name: str, total: int, changed: int, removed: int) -> None:
+    logger.info(
+        f"'{collection_name}': {total} records, {changed} new or changed, "
+        f"{total - changed} unchanged, {removed} removed"
+    )
@@ -0,0 +1,67 @@
+# qdrant_common/ingestion_stamps.py
+"""
+Ingestion stamps: a token per searched collection that changes on every ingestion.
+
+The backend folds collection versions into the keys of its search response cache
+(see Interface/Backend/qdrant_service.get_collection_versions). Point and index
+counters are not a version: an in-place refresh (incremental.py) overwrites vectors
+and payloads under the same IDs, and a re-ingested cohort of the same size has the
+same counts. Instead, every ingestion that changes a collection bumps its stamp, a
+random token stored in the small STAMP_COLLECTION collection (one point per
+collection, with a dummy 1D vector).
+
+Stamps are bumped by incremental.finish_refresh() once a refresh's writes are
+applied, and by patient_collection.build_patient_collection() after a rebuild.
+"""
+
+import os
+import uuid
+import logging
+from datetime import datetime, timezone
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STAMP_COLLECTION = os.getenv("INGESTION_STAMP_COLLECTION", "ingestion_stamps")
+
+# Namespace of the stamp point IDs
+STAMP_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "tawhida/ingestion_stamps")
+
+def stamp_point_id(collection_name: str) -> str:
+    """Point ID of the stamp of a collection (alias name) in STAMP_COLLECTION."""
+    return str(uuid.uuid5(STAMP_NAMESPACE, collection_name))
+
+def bump_stamp(client, collection_name: str) -> str:
+    """
+    Give a collection a new ingestion stamp.
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        collection_name (str): Alias searched by the backend
+
+    Returns:
+        str: New stamp
+    """
+    if STAMP_COLLECTION not in [collection.name for collection in client.get_collections().collections]:
+        client.create_collection(
+            collection_name=STAMP_COLLECTION,
+            vectors_config=VectorParams(size=1, distance=Distance.DOT)
+        )
+    stamp = uuid.uuid4().hex
+    client.upsert(
+        collection_name=STAMP_COLLECTION,
+        points=[PointStruct(
+            id=stamp_point_id(collection_name),
+            vector=[1.0],
+            payload={
+                "collection": collection_name,
+                "stamp": stamp,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }
+        )],
+        wait=True
+    )
+    logger.info(f"Ingestion stamp of '{collection_name}' bumped to {stamp}")
+    return stamp
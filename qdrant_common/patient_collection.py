@@ -0,0 +1,183 @@
+# qdrant_common/patient_collection.py
+"""
+Consolidated patient collection with one named vector per modality.
+
+The three modality collections are keyed by unrelated IDs (uuid5 of each
+collection's own record key, see incremental.py), so a /search needs three queries
+and results can only be concatenated. The patient collection stores each patient once:
+- named vectors "genes" (844D), "proteins" (384D) and "images" (512D); a patient
+  without data for a modality simply has no vector of that name
+- a merged payload: the modality payloads combined, plus "patient_id" and the list
+  of available "modalities"; typed biomarker labels are true if any modality sets them
+
+Points are joined on the patient identifier of each source collection (Patient_ID
+for genes, patient_id for proteins, Patient_ID when present for pathology images,
+otherwise their case_id) and get a deterministic uuid5 ID derived from it.
+
+The backend queries several named vectors in one search_batch request when
+SEARCH_MODE=patients (see Interface/Backend/qdrant_service.py).
+
+The collection is rebuilt into a new generation and published through the
+breast_cancer_patients alias once complete (see aliases.py), so patient-mode
+searches keep using the previous build meanwhile.
+
+Command line (rebuilds the collection from the three modality collections):
+    python -m qdrant_common.patient_collection
+"""
+
+import os
+import uuid
+import logging
+from typing import Any, Dict, Iterable, List, Tuple
+from qdrant_client.models import PointStruct
+from .aliases import create_generation, publish_generation
+from .ingestion_stamps import bump_stamp
+from .collection_profiles import collection_config
+from .payload_indexes import BIOMARKER_FIELDS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PATIENT_COLLECTION = "breast_cancer_patients"
+
+# Named vectors of the patient collection and the modality collections they come from
+PATIENT_VECTORS = {
+    "genes": ("breast_cancer_genes_mutation", 844),
+    "proteins": ("breast_cancer_protein_profiles", 384),
+    "images": ("PathologyImage", 512)
+}
+
+# Namespace of the deterministic patient point IDs
+PATIENT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "tawhida/breast_cancer_patients")
+
+def patient_point_id(patient_id: str) -> str:
+    """Deterministic point ID of a patient (same patient → same ID across rebuilds)."""
+    return str(uuid.uuid5(PATIENT_NAMESPACE, str(patient_id)))
+
+def patient_key(modality: str, payload: Dict[str, Any]) -> str:
+    """
+    Patient identifier of a modality payload, used to join the modalities.
+
+    Args:
+        modality (str): "genes", "proteins" or "images"
+        payload (Dict[str, Any]): Payload of the modality point
+
+    Returns:
+        str: Patient identifier, or "" if the payload carries none
+    """
+    if modality == "genes":
+        return str(payload.get("Patient_ID") or "")
+    if modality == "proteins":
+        return str(payload.get("patient_id") or "")
+    return str(payload.get("Patient_ID") or payload.get("patient_id") or payload.get("case_id") or "")
+
+def patient_collection_config(profile: str = "default") -> Dict[str, Any]:
+    """
+    Build create_collection keyword arguments with one named vector per modality.
+
+    Args:
+        profile (str): Storage profile (see collection_profiles)
+
+    Returns:
+        Dict[str, Any]: vectors_config (named), hnsw_config and quantization_config
+    """
+    configs = {name: collection_config(size, profile) for name, (_, size) in PATIENT_VECTORS.items()}
+    return {
+        "vectors_config": {name: config["vectors_config"] for name, config in configs.items()},
+        "hnsw_config": configs["genes"]["hnsw_config"],
+        "quantization_config": configs["genes"]["quantization_config"]
+    }
+
+def merge_patients(records: Iterable[Tuple[str, List[float], Dict[str, Any]]]) -> List[PointStruct]:
+    """
+    Merge modality records into one point per patient.
+
+    Args:
+        records: (modality, vector, payload) tuples from any of the modality collections
+
+    Returns:
+        List[PointStruct]: Patient points with named vectors and merged payloads
+    """
+    patients = {}
+    skipped = 0
+    for modality, vector, payload in records:
+        key = patient_key(modality, payload)
+        if not key:
+            skipped += 1
+            continue
+
+        patient = patients.setdefault(key, {"vectors": {}, "payloads": {}})
+        if modality in patient["vectors"]:
+            # Several samples for one patient: keep the first one, as /search shows one case per point
+            continue
+        patient["vectors"][modality] = vector
+        patient["payloads"][modality] = payload
+
+    if skipped:
+        logger.warning(f"{skipped} records without a patient identifier were skipped")
+
+    points = []
+    for key, patient in patients.items():
+        payload = {}
+        for modality in ("images", "proteins", "genes"):
+            payload.update(patient["payloads"].get(modality, {}))
+        for field in BIOMARKER_FIELDS:
+            labels = [p[field] for p in patient["payloads"].values() if isinstance(p.get(field), bool)]
+            if labels:
+                payload[field] = any(labels)
+        payload["patient_id"] = key
+        payload["modalities"] = sorted(patient["vectors"])
+        points.append(PointStruct(id=patient_point_id(key), vector=patient["vectors"], payload=payload))
+    return points
+
+def _scroll_modality(client, modality: str, batch_size: int = 256):
+    """Yield (modality, vector, payload) for every point of a modality collection."""
+    collection_name = PATIENT_VECTORS[modality][0]
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        for point in points:
+            yield modality, point.vector, point.payload or {}
+        if offset is None:
+            break
+
+def build_patient_collection(client, profile: str = "default", batch_size: int = 256) -> int:
+    """
+    Rebuild the patient collection from the three modality collections (blue/green).
+
+    Args:
+        client (QdrantClient): Connected synchronous Qdrant client
+        profile (str): Storage profile of the patient collection
+        batch_size (int): Points per upsert request
+
+    Returns:
+        int: Number of patient points written
+    """
+    records = []
+    for modality in PATIENT_VECTORS:
+        records.extend(_scroll_modality(client, modality, batch_size))
+    points = merge_patients(records)
+
+    target = create_generation(client, PATIENT_COLLECTION, patient_collection_config(profile))
+    for i in range(0, len(points), batch_size):
+        client.upsert(collection_name=target, points=points[i:i + batch_size], wait=True)
+    publish_generation(client, PATIENT_COLLECTION, target, expected_count=len(points))
+    bump_stamp(client, PATIENT_COLLECTION)
+
+    logger.info(f"Collection '{PATIENT_COLLECTION}' built with {len(points)} patients (profile {profile})")
+    return len(points)
+
+if __name__ == "__main__":
+    from qdrant_client import QdrantClient
+
+    build_patient_collection(
+        QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"), timeout=60.0),
+        profile=os.getenv("COLLECTION_PROFILE", "default")
+    )
@@ -0,0 +1,261 @@
+# qdrant_common/payload_indexes.py
+"""
+Payload indexes and structured filters shared by ingestion scripts and the backend.
+
+PAYLOAD_INDEXES lists, for each collection, the structured payload fields that are
+indexed at ingestion time and can therefore be used in /search filters. Nested
+fields use Qdrant's dotted key syntax (e.g. "gene_mutations.BRCA1").
+
+Filters are plain JSON objects mapping a field to a condition:
+- a scalar value: exact match, e.g. {"pam50_subtype": "Luminal A"}
+- a list of values: match any, e.g. {"her2_status": ["Positive", "Equivocal"]}
+- a dict with gt/gte/lt/lte: numeric range, e.g. {"Mutation_Count": {"gte": 10}}
+All conditions are combined with AND.
+
+A collection that does not index every filtered field cannot honour the filter:
+searching it without the missing conditions would mix unfiltered neighbours into
+the results, so conditions_for() raises UnsupportedFilterError and the backend
+skips that collection (reported in the response under "skipped").
+
+BIOMARKER_FIELDS are the typed labels computed once at ingestion (cancer confirmed,
+receptor status, Ki67, BRCA mutations) so that rag.py reads booleans instead of
+parsing text at query time. They are indexed in every collection that carries them.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    MatchAny,
+    MatchValue,
+    PayloadSchemaType,
+    Range
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BIOMARKER_FIELDS = (
+    "cancer_confirmed",
+    "er_positive",
+    "pr_positive",
+    "her2_positive",
+    "ki67_high",
+    "brca1_mutated",
+    "brca2_mutated"
+)
+
+PAYLOAD_INDEXES = {
+    "breast_cancer_genes_mutation": {
+        "Mutation_Count": PayloadSchemaType.INTEGER,
+        "cancer_confirmed": PayloadSchemaType.BOOL,
+        "brca1_mutated": PayloadSchemaType.BOOL,
+        "brca2_mutated": PayloadSchemaType.BOOL
+    },
+    "breast_cancer_protein_profiles": {
+        "er_status": PayloadSchemaType.KEYWORD,
+        "pr_status": PayloadSchemaType.KEYWORD,
+        "her2_status": PayloadSchemaType.KEYWORD,
+        "pam50_subtype": PayloadSchemaType.KEYWORD,
+        "cancer_confirmed": PayloadSchemaType.BOOL,
+        "er_positive": PayloadSchemaType.BOOL,
+        "pr_positive": PayloadSchemaType.BOOL,
+        "her2_positive": PayloadSchemaType.BOOL
+    },
+    "PathologyImage": {
+        **{field: PayloadSchemaType.BOOL for field in BIOMARKER_FIELDS},
+        "cancer": PayloadSchemaType.BOOL,
+        "gene_mutations.BRCA1": PayloadSchemaType.BOOL,
+        "gene_mutations.BRCA2": PayloadSchemaType.BOOL,
+        "gene_mutations.PIK3CA": PayloadSchemaType.BOOL,
+        "gene_mutations.TP53": PayloadSchemaType.BOOL,
+        "protein_expression.ER": PayloadSchemaType.KEYWORD,
+        "protein_expression.PR": PayloadSchemaType.KEYWORD,
+        "protein_expression.HER2": PayloadSchemaType.KEYWORD,
+        "protein_expression.Ki67": PayloadSchemaType.KEYWORD
+    }
+}
+
+# The consolidated patient collection merges the modality payloads, so it indexes all
+# of their fields (see patient_collection.py)
+PAYLOAD_INDEXES["breast_cancer_patients"] = {
+    "patient_id": PayloadSchemaType.KEYWORD,
+    **{field: schema for fields in list(PAYLOAD_INDEXES.values()) for field, schema in fields.items()}
+}
+
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+
+class UnsupportedFilterError(ValueError):
+    """A collection does not index some of the filtered fields."""
+
+    def __init__(self, collection_name: str, fields: List[str]):
+        self.collection_name = collection_name
+        self.fields = fields
+        super().__init__(f"Collection '{collection_name}' does not index filter fields {fields}, skipped")
+
+def create_payload_indexes(client, collection_name: str, index_set: Optional[str] = None) -> None:
+    """
+    Create the payload indexes of a collection (synchronous QdrantClient).
+
+    Args:
+        client (QdrantClient): Connected Qdrant client
+        collection_name (str): Collection to index
+        index_set (Optional[str]): PAYLOAD_INDEXES entry to apply, default collection_name
+            (a generation is indexed like the alias it is published under)
+    """
+    fields = PAYLOAD_INDEXES.get(index_set or collection_name, {})
+    for field_name, schema in fields.items():
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=schema
+        )
+    logger.info(f"Payload indexes created for '{collection_name}': {list(fields)}")
+
+def filterable_fields() -> set:
+    """Return every field that can be used in a filter, across all collections."""
+    return {field for fields in PAYLOAD_INDEXES.values() for field in fields}
+
+def field_schema(field: str) -> Optional[PayloadSchemaType]:
+    """Index type of a filterable field (the same in every collection that indexes it)."""
+    for fields in PAYLOAD_INDEXES.values():
+        if field in fields:
+            return fields[field]
+    return None
+
+def _matches_schema(value: Any, schema: PayloadSchemaType) -> bool:
+    """Whether a match value has the type of the field's index (bool is not an integer)."""
+    if schema == PayloadSchemaType.BOOL:
+        return isinstance(value, bool)
+    if schema == PayloadSchemaType.INTEGER:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, str)
+
+def validate_filters(filters: Dict[str, Any]) -> None:
+    """
+    Check that a filter only uses indexed fields and well-formed conditions.
+
+    Values must match the index type of their field: true/false for BOOL fields (a
+    single value, Qdrant cannot match any of several booleans), integers for INTEGER
+    fields, strings for KEYWORD fields; ranges only apply to INTEGER fields.
+
+    Args:
+        filters (Dict[str, Any]): Field → condition
+
+    Raises:
+        ValueError: If a field is not indexed or a condition is malformed
+    """
+    if not isinstance(filters, dict):
+        raise ValueError("Filters must be a JSON object mapping fields to conditions")
+
+    unknown = sorted(set(filters) - filterable_fields())
+    if unknown:
+        raise ValueError(f"Unsupported filter fields: {unknown}. Supported: {sorted(filterable_fields())}")
+
+    for field, condition in filters.items():
+        schema = field_schema(field)
+        expected = {
+            PayloadSchemaType.BOOL: "true or false",
+            PayloadSchemaType.INTEGER: "an integer, a list of integers or a range"
+        }.get(schema, "a string or a list of strings")
+        if isinstance(condition, dict):
+            if schema != PayloadSchemaType.INTEGER:
+                raise ValueError(f"Range filter on '{field}' is only supported on integer fields")
+            if not condition or set(condition) - set(RANGE_OPERATORS):
+                raise ValueError(f"Range filter on '{field}' must use {list(RANGE_OPERATORS)}")
+            if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in condition.values()):
+                raise ValueError(f"Range filter on '{field}' must use numeric bounds")
+        elif isinstance(condition, list):
+            if schema == PayloadSchemaType.BOOL:
+                raise ValueError(f"Filter on '{field}' must be a single true or false, not a list")
+            if not condition or not all(_matches_schema(v, schema) for v in condition):
+                kind = "integers" if schema == PayloadSchemaType.INTEGER else "strings"
+                raise ValueError(f"List filter on '{field}' must be a non-empty list of {kind}")
+        elif not _matches_schema(condition, schema):
+            raise ValueError(f"Filter on '{field}' must be {expected}")
+
+def unsupported_fields(collection_name: str, filters: Optional[Dict[str, Any]]) -> List[str]:
+    """Filtered fields a collection does not index (empty when it can honour the whole filter)."""
+    fields = PAYLOAD_INDEXES.get(collection_name, {})
+    return sorted(field for field in (filters or {}) if field not in fields)
+
+def conditions_for(collection_name: str, filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Get the filter conditions of a collection, which must index every filtered field.
+
+    Args:
+        collection_name (str): Collection name
+        filters (Optional[Dict[str, Any]]): Field → condition
+
+    Returns:
+        Dict[str, Any]: Field → condition for this collection
+
+    Raises:
+        UnsupportedFilterError: If the collection does not index some of the fields
+    """
+    missing = unsupported_fields(collection_name, filters)
+    if missing:
+        raise UnsupportedFilterError(collection_name, missing)
+    return dict(filters or {})
+
+def build_filter(conditions: Dict[str, Any]) -> Optional[Filter]:
+    """
+    Translate filter conditions into a Qdrant Filter.
+
+    Args:
+        conditions (Dict[str, Any]): Field → condition for one collection
+
+    Returns:
+        Optional[Filter]: Qdrant filter, or None when there are no conditions
+    """
+    if not conditions:
+        return None
+
+    must = []
+    for field, condition in conditions.items():
+        if isinstance(condition, dict):
+            must.append(FieldCondition(key=field, range=Range(**condition)))
+        elif isinstance(condition, list):
+            must.append(FieldCondition(key=field, match=MatchAny(any=condition)))
+        else:
+            must.append(FieldCondition(key=field, match=MatchValue(value=condition)))
+    return Filter(must=must)
+
+def _payload_value(payload: Dict[str, Any], field: str) -> Any:
+    value = payload
+    for part in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def payload_matches(payload: Dict[str, Any], conditions: Dict[str, Any]) -> bool:
+    """
+    Evaluate filter conditions against a payload, with the same semantics as build_filter.
+    Used by the in-process search backend.
+
+    Args:
+        payload (Dict[str, Any]): Point payload
+        conditions (Dict[str, Any]): Field → condition
+
+    Returns:
+        bool: True if every condition holds
+    """
+    for field, condition in conditions.items():
+        value = _payload_value(payload, field)
+        if isinstance(condition, dict):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return False
+            if ("gt" in condition and not value > condition["gt"]) or \
+               ("gte" in condition and not value >= condition["gte"]) or \
+               ("lt" in condition and not value < condition["lt"]) or \
+               ("lte" in condition and not value <= condition["lte"]):
+                return False
+        elif isinstance(condition, list):
+            if value not in condition:
+                return False
+        elif value != condition or type(value) is not type(condition):
+            return False
+    return True